@@ -0,0 +1,276 @@
+"""
+Asyncio-native LLM client.
+
+Mirrors LLMClient (same payloads and error messages) but never blocks the
+event loop, so several prompts can be in flight against one server at once.
+"""
+
+import asyncio
+import os
+import time
+from typing import AsyncIterator, List, Sequence, Tuple
+
+import httpx
+
+from anchor.llm import ConnectionLost, LLMClient, POOL_SIZE, RequestTimeout, _raise_for_ollama_error
+
+# Ollama serves this many requests per loaded model concurrently; anything
+# beyond that just queues on the server, so it is also our default bound.
+NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", str(POOL_SIZE)))
+
+
+class AsyncLLMClient(LLMClient):
+    """
+    Async counterpart of LLMClient.
+    At most `concurrency` requests are sent at a time; the rest wait on a
+    semaphore client-side instead of piling up in Ollama's queue.
+    """
+
+    def __init__(self, model="codellama", concurrency: int = NUM_PARALLEL, client: httpx.AsyncClient = None, **kwargs):
+        super().__init__(model=model, **kwargs)
+        self.concurrency = concurrency
+        self._client = client
+        self._semaphore = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=None,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
+            )
+        return self._client
+
+    async def warm(self, keep_alive=None, num_ctx: int = None) -> float:
+        """
+        Async counterpart of LLMClient.warm.
+        """
+        payload = self._warm_payload(keep_alive, num_ctx)
+        if payload is None:
+            return 0.0
+        return (await self._post("generate", payload)).get("load_duration", 0) / 1e9
+
+    def warm_in_background(self, num_ctx: int = None) -> asyncio.Task:
+        """
+        Starts loading the model as a task on the running event loop.
+        Failures are ignored here; the real request will report them.
+        """
+        async def run():
+            try:
+                await self.warm(num_ctx=num_ctx)
+            except RuntimeError:
+                pass
+
+        return asyncio.ensure_future(run())
+
+    async def unload(self):
+        await self.warm(keep_alive=0)
+
+    async def aclose(self):
+        """
+        Applies the unload policy, then closes the connection pool.
+        """
+        if self.unload_on_close:
+            await self.unload()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def close(self):
+        raise TypeError("AsyncLLMClient is closed with 'await aclose()' or 'async with'.")
+
+    def __enter__(self):
+        raise TypeError("AsyncLLMClient is used with 'async with'.")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _send(self, endpoint: str, payload: dict, stream: bool = False, deadline=None):
+        """
+        Async counterpart of LLMClient._send: picks a host, fails over on
+        connection errors, returns (host, response, latency_ms).
+        """
+        path, body = self.backend.request(endpoint, payload)
+        tried = []
+        while True:
+            host = await self.hosts.aacquire(self.model, exclude=tried)
+            started = time.monotonic()
+            read_timeout = self._read_timeout(stream, deadline)
+            timeout = httpx.Timeout(self.connect_timeout, read=read_timeout, pool=None)
+            try:
+                request = self.client.build_request("POST", f"{host.url}{path}", json=body, timeout=timeout)
+                response = await self.client.send(request, stream=stream)
+                return host, response, (time.monotonic() - started) * 1000
+            except httpx.HTTPError as e:
+                self.hosts.release(host, ok=False)
+                if isinstance(e, httpx.ReadTimeout):
+                    raise self._timeout_error(host, read_timeout) from e
+                tried.append(host)
+                if len(tried) >= len(self.hosts):
+                    raise ConnectionLost(f"Failed to connect to {self.backend.label} at {host.url}. Is it running?") from e
+
+    async def _post(self, endpoint: str, payload: dict) -> dict:
+        async with self.semaphore:
+            host, response, latency_ms = await self._send(endpoint, payload, deadline=self._deadline())
+        self.hosts.release(host, ok=response.status_code < 500, latency_ms=latency_ms, model=self.model)
+        _raise_for_ollama_error(response, self.backend.label)
+        return self.backend.parse(endpoint, response.json())
+
+    async def _iter_chunks(self, endpoint: str, payload: dict) -> AsyncIterator[dict]:
+        """
+        Streams normalized chunks. The slot is held until the stream is
+        exhausted or the consumer stops (which closes the connection).
+        """
+        async with self.semaphore:
+            deadline = self._deadline()
+            host, response, latency_ms = await self._send(endpoint, payload, stream=True, deadline=deadline)
+            parser = self.backend.stream_parser(endpoint)
+            dropped = False
+
+            async def chunks():
+                async for line in response.aiter_lines():
+                    for chunk in parser.feed(line):
+                        yield chunk
+                for chunk in parser.close():
+                    yield chunk
+
+            try:
+                if response.status_code != 200:
+                    await response.aread()
+                    _raise_for_ollama_error(response, self.backend.label)
+                async for chunk in chunks():
+                    yield chunk
+                    if chunk.get("done"):
+                        break
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise RequestTimeout(f"Request to {host.url} exceeded its {self.timeout:.0f}s deadline.")
+            except httpx.HTTPError as e:
+                dropped = True
+                if isinstance(e, httpx.ReadTimeout):
+                    raise self._timeout_error(host, self.idle_timeout) from e
+                raise ConnectionLost(f"Failed to connect to {self.backend.label} at {host.url}. Is it running?") from e
+            finally:
+                await response.aclose()
+                ok = not dropped and response.status_code < 500
+                self.hosts.release(host, ok=ok, latency_ms=latency_ms, model=self.model)
+
+    async def _cached_stream(self, key, deltas) -> AsyncIterator[str]:
+        if key is None:
+            async for delta in deltas:
+                yield delta
+            return
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        async for delta in deltas:
+            parts.append(delta)
+            yield delta
+        self.cache.put(key, "".join(parts))
+
+    async def _collect(self, endpoint: str, payload: dict, until):
+        """
+        Async counterpart of LLMClient._collect.
+        """
+        parts = []
+        started = time.monotonic()
+        chunks = self._iter_chunks(endpoint, dict(payload, stream=True))
+        try:
+            async for chunk in chunks:
+                delta = chunk.get("response") if endpoint == "generate" else chunk.get("message", {}).get("content")
+                if delta:
+                    parts.append(delta)
+                if chunk.get("done"):
+                    return "".join(parts), chunk
+                if delta and "\n" in delta and until("".join(parts)):
+                    return "".join(parts), {
+                        "done": True,
+                        "done_reason": "until",
+                        "eval_count": len(parts),
+                        "total_duration": int((time.monotonic() - started) * 1e9),
+                    }
+        finally:
+            await chunks.aclose()
+        return "".join(parts), {}
+
+    async def generate(
+        self, system_prompt: str, user_prompt: str, options: dict = None, format: dict = None, until=None, cache_if=None
+    ) -> str:
+        payload = self._generate_payload(system_prompt, user_prompt, stream=False, options=options, format=format)
+
+        async def compute():
+            if until is not None:
+                text, data = await self._collect("generate", payload, until)
+            else:
+                data = await self._post("generate", payload)
+                text = data.get("response", "")
+            self._record_metrics(data)
+            return text
+
+        key = self._cache_key("generate", payload)
+        return await (compute() if key is None else self.cache.aget_or_compute(key, compute, cache_if))
+
+    async def stream_generate(self, system_prompt: str, user_prompt: str, options: dict = None, format: dict = None) -> AsyncIterator[str]:
+        payload = self._generate_payload(system_prompt, user_prompt, stream=True, options=options, format=format)
+
+        async def deltas():
+            async for chunk in self._iter_chunks("generate", payload):
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    self._record_metrics(chunk)
+
+        async for delta in self._cached_stream(self._cache_key("generate", payload), deltas()):
+            yield delta
+
+    async def chat(self, messages: list, options: dict = None, format: dict = None, until=None, cache_if=None) -> str:
+        payload = self._chat_payload(messages, stream=False, options=options, format=format)
+
+        async def compute():
+            if until is not None:
+                text, data = await self._collect("chat", payload, until)
+            else:
+                data = await self._post("chat", payload)
+                text = data.get("message", {}).get("content", "")
+            self._record_metrics(data)
+            return text
+
+        key = self._cache_key("chat", payload)
+        return await (compute() if key is None else self.cache.aget_or_compute(key, compute, cache_if))
+
+    async def stream_chat(self, messages: list, options: dict = None, format: dict = None) -> AsyncIterator[str]:
+        payload = self._chat_payload(messages, stream=True, options=options, format=format)
+
+        async def deltas():
+            async for chunk in self._iter_chunks("chat", payload):
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    self._record_metrics(chunk)
+
+        async for delta in self._cached_stream(self._cache_key("chat", payload), deltas()):
+            yield delta
+
+    async def generate_many(self, prompts: Sequence[Tuple[str, str]]) -> List[str]:
+        """
+        Fans out several (system_prompt, user_prompt) pairs concurrently.
+        Results are returned in input order.
+        """
+        return await asyncio.gather(*(self.generate(s, u) for s, u in prompts))
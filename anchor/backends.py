@@ -0,0 +1,265 @@
+"""
+Inference server APIs.
+
+LLMClient builds Ollama-shaped requests ({"model", "prompt" or "messages",
+"options", "format", "stream"}) and consumes Ollama-shaped results ({"response"}
+or {"message": {"content"}}, plus "done", "done_reason" and the eval counts
+and durations in nanoseconds). A backend translates both directions for one
+server API, so streaming, cancellation (closing the connection) and metrics
+behave the same whichever server answers.
+
+The backend is chosen with ANCHOR_BACKEND, or from the scheme of the first
+OLLAMA_HOST entry: 'openai+http://localhost:8080' selects the
+OpenAI-compatible API (llama.cpp server, vLLM, ...).
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+ANCHOR_BACKEND = os.getenv("ANCHOR_BACKEND", "")
+
+
+def _error_text(data) -> Optional[str]:
+    error = data.get("error") if isinstance(data, dict) else None
+    if isinstance(error, dict):
+        error = error.get("message")
+    return error
+
+
+class StreamParser:
+    """
+    Turns the lines of a streamed response into normalized chunks.
+    feed() may return any number of chunks; close() flushes at EOF.
+    """
+
+    def feed(self, line) -> List[dict]:
+        raise NotImplementedError
+
+    def close(self) -> List[dict]:
+        return []
+
+
+class Backend:
+    """Request/response translation for one server API."""
+
+    name = ""
+    label = ""  # Used in error messages
+    health_path = ""
+    models_path = ""
+    supports_context = False  # Ollama KV `context` arrays and raw prefill
+    manages_models = False  # Loads/unloads models on demand (keep_alive, warm)
+    # Finishes a trailing assistant message instead of starting a new reply,
+    # so cut-off or dropped answers can be continued through the chat API
+    continues_messages = False
+
+    def request(self, endpoint: str, payload: dict) -> Tuple[str, dict]:
+        """
+        (path, body) for a "generate" or "chat" payload.
+        """
+        raise NotImplementedError
+
+    def parse(self, endpoint: str, data: dict) -> dict:
+        """
+        Normalizes a complete (non-streaming) response body.
+        """
+        raise NotImplementedError
+
+    def stream_parser(self, endpoint: str) -> StreamParser:
+        raise NotImplementedError
+
+    def parse_models(self, data: dict) -> Dict[str, dict]:
+        """
+        Loaded models (name -> info) from the body of models_path.
+        """
+        raise NotImplementedError
+
+
+# --- Ollama -----------------------------------------------------------------
+
+class _OllamaStreamParser(StreamParser):
+    def feed(self, line) -> List[dict]:
+        return [json.loads(line)] if line else []
+
+
+class OllamaBackend(Backend):
+    name = "ollama"
+    label = "Ollama"
+    health_path = "/api/version"
+    models_path = "/api/ps"
+    supports_context = True
+    manages_models = True
+    continues_messages = True
+
+    def request(self, endpoint: str, payload: dict) -> Tuple[str, dict]:
+        return f"/api/{endpoint}", payload
+
+    def parse(self, endpoint: str, data: dict) -> dict:
+        return data
+
+    def stream_parser(self, endpoint: str) -> StreamParser:
+        return _OllamaStreamParser()
+
+    def parse_models(self, data: dict) -> Dict[str, dict]:
+        return {m.get("name", ""): m for m in data.get("models", [])}
+
+
+# --- OpenAI-compatible (llama.cpp server, vLLM, ...) -----------------------
+
+# Ollama option -> OpenAI request field. Runner options such as num_ctx,
+# num_thread or num_batch are fixed when these servers start, so they are dropped.
+_OPENAI_FIELDS = {
+    "temperature": "temperature",
+    "num_predict": "max_tokens",
+    "top_p": "top_p",
+    "stop": "stop",
+    "seed": "seed",
+}
+
+
+def _openai_metrics(data: dict, finish_reason: Optional[str]) -> dict:
+    """
+    Ollama-style metrics from OpenAI `usage` and, when the server sends
+    them, llama.cpp `timings` (milliseconds).
+    """
+    usage = data.get("usage") or {}
+    timings = data.get("timings") or {}
+    metrics = {
+        "done": True,
+        "done_reason": finish_reason or "stop",
+        "prompt_eval_count": usage.get("prompt_tokens", timings.get("prompt_n", 0)),
+        "eval_count": usage.get("completion_tokens", timings.get("predicted_n", 0)),
+        "load_duration": 0,
+    }
+    if timings:
+        metrics["prompt_eval_duration"] = int(timings.get("prompt_ms", 0) * 1e6)
+        metrics["eval_duration"] = int(timings.get("predicted_ms", 0) * 1e6)
+    return metrics
+
+
+class _OpenAIStreamParser(StreamParser):
+    """
+    Server-sent events: 'data: {...}' lines, then 'data: [DONE]'. Usage
+    arrives in a chunk after the one carrying finish_reason, so the final
+    Ollama-style 'done' chunk is only emitted at [DONE] or EOF.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.finish_reason = None
+        self.last = {}
+        self.finished = False
+
+    def _delta(self, text: str) -> dict:
+        if self.endpoint == "chat":
+            return {"message": {"role": "assistant", "content": text}, "done": False}
+        return {"response": text, "done": False}
+
+    def feed(self, line) -> List[dict]:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            return []
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return self.close()
+        event = json.loads(data)
+        if _error_text(event):
+            raise RuntimeError(f"Server Error: {_error_text(event)}")
+        if event.get("usage") or event.get("timings"):
+            self.last = event
+        chunks = []
+        for choice in event.get("choices", []):
+            text = (choice.get("delta") or {}).get("content") or choice.get("text")
+            if text:
+                chunks.append(self._delta(text))
+            self.finish_reason = choice.get("finish_reason") or self.finish_reason
+        return chunks
+
+    def close(self) -> List[dict]:
+        if self.finished or self.finish_reason is None:
+            return []  # Dropped before the server finished: no 'done' chunk
+        self.finished = True
+        final = self._delta("")
+        final.update(_openai_metrics(self.last, self.finish_reason))
+        return [final]
+
+
+class OpenAIBackend(Backend):
+    name = "openai"
+    label = "Server"
+    health_path = "/v1/models"
+    models_path = "/v1/models"
+
+    def request(self, endpoint: str, payload: dict) -> Tuple[str, dict]:
+        body = {"model": payload["model"], "stream": payload.get("stream", False)}
+        for option, value in (payload.get("options") or {}).items():
+            if option in _OPENAI_FIELDS:
+                body[_OPENAI_FIELDS[option]] = value
+        if body["stream"]:
+            body["stream_options"] = {"include_usage": True}
+        if payload.get("format") is not None:
+            body["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": payload["format"]},
+            }
+
+        if endpoint == "chat":
+            body["messages"] = payload["messages"]
+            return "/v1/chat/completions", body
+        if payload.get("raw"):
+            # Raw prompts must not be wrapped in the chat template
+            body["prompt"] = payload["prompt"]
+            return "/v1/completions", body
+        body["messages"] = [{"role": "user", "content": payload["prompt"]}]
+        return "/v1/chat/completions", body
+
+    def parse(self, endpoint: str, data: dict) -> dict:
+        choice = (data.get("choices") or [{}])[0]
+        text = (choice.get("message") or {}).get("content") or choice.get("text") or ""
+        result = {"message": {"role": "assistant", "content": text}} if endpoint == "chat" else {"response": text}
+        result.update(_openai_metrics(data, choice.get("finish_reason")))
+        return result
+
+    def stream_parser(self, endpoint: str) -> StreamParser:
+        return _OpenAIStreamParser(endpoint)
+
+    def parse_models(self, data: dict) -> Dict[str, dict]:
+        # Everything the server lists is already loaded
+        return {m.get("id", ""): m for m in data.get("data", [])}
+
+
+BACKENDS = {backend.name: backend for backend in (OllamaBackend, OpenAIBackend)}
+
+
+def split_scheme(url: str) -> Tuple[Optional[str], str]:
+    """
+    'openai+http://host' -> ('openai', 'http://host'); plain URLs -> (None, url).
+    """
+    scheme, sep, rest = url.partition("://")
+    if sep and "+" in scheme:
+        name, _, transport = scheme.partition("+")
+        return name, f"{transport}://{rest}"
+    return None, url
+
+
+def get_backend(name: str = None) -> Backend:
+    """
+    The backend called `name`, defaulting to Ollama.
+    """
+    name = (name or "ollama").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+def select_backend(hosts_value: str, name: str = None) -> Backend:
+    """
+    The configured backend: an explicit name (ANCHOR_BACKEND) wins over the
+    scheme of the first host.
+    """
+    name = name if name is not None else ANCHOR_BACKEND
+    if not name:
+        first_host = hosts_value.split(",")[0].strip()
+        name = split_scheme(first_host)[0]
+    return get_backend(name)
@@ -0,0 +1,183 @@
+"""
+Token budgeting for prompts.
+
+Ollama silently truncates prompts that exceed the model's context window,
+so every prompt is measured section by section and the least important
+sections are shrunk until the whole prompt fits.
+"""
+
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+# Upper bound for num_ctx. Larger windows cost RAM and prefill time.
+MAX_CONTEXT = int(os.getenv("ANCHOR_MAX_CTX", "8192"))
+# num_ctx is rounded up to one of these so consecutive requests usually
+# agree on the value; changing num_ctx forces Ollama to reload the model.
+CONTEXT_BUCKETS = (2048, 4096, 8192, 16384, 32768, 65536, 131072)
+# Room kept for the repo map when num_ctx is chosen before the map is built;
+# the map is then shrunk to fit what the window leaves.
+REPO_MAP_TOKENS = int(os.getenv("ANCHOR_REPO_MAP_TOKENS", "1024"))
+
+_PIECES = re.compile(r"\w+|[^\w\s]|\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximates the token count of `text` without a tokenizer.
+    BPE vocabularies split long identifiers into ~4 character pieces and
+    emit punctuation and newlines mostly as single tokens.
+    """
+    count = 0
+    for piece in _PIECES.findall(text):
+        count += math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+    return count
+
+
+def context_window_for(tokens: int, max_context: int = MAX_CONTEXT) -> int:
+    """
+    Smallest context bucket that holds `tokens`, capped at max_context.
+    """
+    for bucket in CONTEXT_BUCKETS:
+        if bucket >= tokens:
+            return min(bucket, max_context)
+    return max_context
+
+
+def shrink_repo_map(text: str, max_tokens: int) -> str:
+    """
+    Shrinks a repo map by first dropping class/def listings, then files.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    files = [line for line in text.splitlines() if line.startswith("- ")]
+    summary = "\n".join(files)
+    if estimate_tokens(summary) <= max_tokens:
+        return summary
+
+    kept = []
+    budget = max_tokens - 16
+    for line in files:
+        cost = estimate_tokens(line) + 1
+        if cost > budget:
+            break
+        kept.append(line)
+        budget -= cost
+    kept.append(f"- ... ({len(files) - len(kept)} more files)")
+    return "\n".join(kept)
+
+
+def shrink_middle(text: str, max_tokens: int) -> str:
+    """
+    Keeps the head and tail of `text`, eliding lines from the middle.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    budget = max_tokens - 16  # Room for the elision marker
+    head, tail = [], []
+    i, j = 0, len(lines) - 1
+    from_head = True
+    while i <= j:
+        line = lines[i] if from_head else lines[j]
+        cost = estimate_tokens(line) + 1
+        if cost > budget:
+            break
+        budget -= cost
+        if from_head:
+            head.append(line)
+            i += 1
+        else:
+            tail.insert(0, line)
+            j -= 1
+        from_head = not from_head
+    marker = f"... ({j - i + 1} lines omitted) ..."
+    return "\n".join(head + [marker] + tail)
+
+
+def shrink_tail(text: str, max_tokens: int) -> str:
+    """
+    Keeps the most recent lines of `text` (e.g. a conversation log).
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    kept = []
+    budget = max_tokens - 16
+    while lines:
+        cost = estimate_tokens(lines[-1]) + 1
+        if cost > budget:
+            break
+        kept.insert(0, lines.pop())
+        budget -= cost
+    return "\n".join([f"... ({len(lines)} earlier lines omitted) ..."] + kept)
+
+
+@dataclass
+class PromptSection:
+    """
+    A named part of a prompt. Sections with a lower priority are shrunk
+    first; sections without a `shrink` function are never changed.
+    """
+
+    name: str
+    text: str
+    priority: int = 0
+    shrink: Optional[Callable[[str, int], str]] = None
+    original_tokens: int = 0
+
+    def __post_init__(self):
+        self.original_tokens = self.original_tokens or estimate_tokens(self.text)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+@dataclass
+class TokenBudget:
+    """
+    Fits prompt sections into a context window, leaving room for the reply.
+    """
+
+    num_predict: int = 4096
+    max_context: int = MAX_CONTEXT
+    sections: List[PromptSection] = field(default_factory=list)
+
+    @property
+    def prompt_budget(self) -> int:
+        return max(self.max_context - self.num_predict, 0)
+
+    def fit(self, sections: List[PromptSection]) -> List[PromptSection]:
+        """
+        Shrinks low-priority sections until the total fits prompt_budget.
+        Sections are modified in place and also kept for report().
+        """
+        self.sections = sections
+        overflow = sum(s.tokens for s in sections) - self.prompt_budget
+        for section in sorted((s for s in sections if s.shrink), key=lambda s: s.priority):
+            if overflow <= 0:
+                break
+            before = section.tokens
+            section.text = section.shrink(section.text, max(before - overflow, 0))
+            overflow -= before - section.tokens
+        return sections
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(s.tokens for s in self.sections)
+
+    @property
+    def num_ctx(self) -> int:
+        return context_window_for(self.prompt_tokens + self.num_predict, self.max_context)
+
+    def report(self) -> List[tuple]:
+        """
+        (section name, tokens before fitting, tokens after fitting) rows.
+        """
+        return [(s.name, s.original_tokens, s.tokens) for s in self.sections]
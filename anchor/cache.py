@@ -0,0 +1,176 @@
+"""
+Content-addressed cache for LLM responses.
+
+Entries are keyed by the endpoint plus everything in the request that can
+change the output (model, options, prompt or messages), so rerunning the
+same task over the same file content skips generation entirely.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+CACHE_DIR = Path(".anchor/cache")
+CACHE_MAX_BYTES = int(float(os.getenv("ANCHOR_CACHE_MAX_MB", "256")) * 1024 * 1024)
+CACHE_TTL = float(os.getenv("ANCHOR_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Request fields that do not affect the generated text.
+_IGNORED_FIELDS = {"stream", "keep_alive"}
+
+
+class ResponseCache:
+    """
+    On-disk LRU cache with a size bound and a TTL.
+    Recency is tracked through file mtimes, which are bumped on every hit.
+    Concurrent lookups for the same key collapse into one computation.
+    """
+
+    suffix = ".json"
+
+    # Shared by every instance so single-flight works across clients.
+    _lock = threading.Lock()
+    _inflight = {}
+    _async_inflight = {}
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(endpoint: str, payload: dict) -> str:
+        """
+        Hashes the request into a stable cache key.
+        """
+        relevant = {k: v for k, v in payload.items() if k not in _IGNORED_FIELDS}
+        blob = json.dumps({"endpoint": endpoint, "request": relevant}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    def get(self, key: str, cache_if: Callable[[str], bool] = None) -> Optional[str]:
+        """
+        The cached response, if any. An entry `cache_if` rejects (stored
+        before it could be checked) is dropped.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+
+        response = entry.get("response")
+        if cache_if is not None and not cache_if(response):
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)  # Mark as most recently used
+        except OSError:
+            pass
+        return response
+
+    def put(self, key: str, response: str):
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "response": response}, f)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        """
+        Drops expired entries, then least recently used ones until the
+        cache fits in max_bytes.
+        """
+        now = time.time()
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def get_or_compute(self, key: str, compute: Callable[[], str], cache_if: Callable[[str], bool] = None) -> str:
+        """
+        Returns the cached response or computes and stores it.
+        If another thread is already computing the same key, waits for its
+        result instead of sending a duplicate request.
+        With `cache_if`, only responses it accepts are stored or served
+        from the cache (e.g. edits that apply), so a failure is not replayed.
+        """
+        while True:
+            cached = self.get(key, cache_if)
+            if cached is not None:
+                return cached
+
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+
+            if not owner:
+                event.wait()
+                # The owner may have failed; loop to retry or compute ourselves.
+                continue
+
+            try:
+                response = compute()
+                if cache_if is None or cache_if(response):
+                    self.put(key, response)
+                return response
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                event.set()
+
+    async def aget_or_compute(self, key: str, compute, cache_if: Callable[[str], bool] = None) -> str:
+        """
+        Async variant of get_or_compute. `compute` is a coroutine function.
+        """
+        while True:
+            cached = self.get(key, cache_if)
+            if cached is not None:
+                return cached
+
+            event = self._async_inflight.get(key)
+            if event is None:
+                break
+            await event.wait()
+
+        event = self._async_inflight[key] = asyncio.Event()
+        try:
+            response = await compute()
+            if cache_if is None or cache_if(response):
+                self.put(key, response)
+            return response
+        finally:
+            del self._async_inflight[key]
+            event.set()
@@ -0,0 +1,151 @@
+"""
+Parallel candidate generation for edits.
+
+Small local models produce an unusable diff often enough that a single
+attempt makes `anchor edit` flaky. Instead, several candidates are
+requested at once (different temperatures and/or models); each one is
+dry-run applied and syntax-checked as soon as it arrives, the first valid
+one wins and the remaining requests are cancelled.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from anchor.async_llm import AsyncLLMClient
+from anchor.edits import DIFF, EditFormat, edit_token_limit
+from anchor.llm import REQUEST_TIMEOUT
+from anchor.patch import PatchError, extract_patch_text, fenced_block_closed, validate_syntax
+
+BASE_TEMPERATURE = 0.2
+TEMPERATURE_STEP = 0.25
+
+
+@dataclass
+class Candidate:
+    """One requested edit and what became of it."""
+
+    model: str
+    temperature: float
+    response: str = ""
+    new_content: Optional[str] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def valid(self) -> bool:
+        return self.new_content is not None
+
+
+def candidate_specs(count: int, models: Sequence[str]) -> List[Tuple[str, float]]:
+    """
+    (model, temperature) for each candidate. Models are used round-robin;
+    each repeat of a model gets a higher temperature for more diversity.
+    """
+    specs = []
+    for i in range(count):
+        model = models[i % len(models)]
+        round_ = i // len(models)
+        specs.append((model, min(BASE_TEMPERATURE + TEMPERATURE_STEP * round_, 1.0)))
+    return specs
+
+
+def apply_candidate(
+    content: str, raw_response: str, filename: str, is_new_file: bool = False, edit_format: EditFormat = DIFF
+) -> str:
+    """
+    Extracts, applies and validates one candidate.
+    Raises PatchError if it cannot be used.
+    """
+    new_content = extract_patch_text(raw_response) if is_new_file else edit_format.apply(content, raw_response)
+    if not new_content or new_content == content:
+        raise PatchError("No changes in response.")
+    if not validate_syntax(new_content, filename):
+        raise PatchError("Generated code has syntax errors.")
+    return new_content
+
+
+def applies(
+    content: str, raw_response: str, filename: str, is_new_file: bool = False, edit_format: EditFormat = DIFF
+) -> bool:
+    """
+    Whether apply_candidate accepts the response. Used as `cache_if`, so
+    an edit that fails is not replayed from the cache on the next run.
+    """
+    try:
+        apply_candidate(content, raw_response, filename, is_new_file, edit_format)
+    except PatchError:
+        return False
+    return True
+
+
+async def race_candidates(
+    system_prompt: str,
+    task: str,
+    content: str,
+    filename: str,
+    specs: Sequence[Tuple[str, float]],
+    is_new_file: bool = False,
+    cache=None,
+    edit_format: EditFormat = DIFF,
+    timeout: float = REQUEST_TIMEOUT,
+    num_ctx: int = None,
+) -> Tuple[Optional[Candidate], List[Candidate]]:
+    """
+    Requests all candidates concurrently and returns (winner, candidates).
+    The winner is None if no candidate applied and validated.
+    """
+    clients = {
+        model: AsyncLLMClient(model=model, concurrency=len(specs), cache=cache, timeout=timeout)
+        for model in {model for model, _ in specs}
+    }
+    if is_new_file:
+        schema, until, limit = None, fenced_block_closed, {}
+    else:
+        schema, until = edit_format.schema, edit_format.complete
+        limit = {"num_predict": edit_token_limit(edit_format, content)}
+    if num_ctx:
+        limit["num_ctx"] = num_ctx
+    started = time.monotonic()
+
+    async def attempt(candidate: Candidate) -> Candidate:
+        client = clients[candidate.model]
+        try:
+            candidate.response = await client.generate(
+                system_prompt, task, options={"temperature": candidate.temperature, **limit}, format=schema, until=until,
+                cache_if=lambda text: applies(content, text, filename, is_new_file, edit_format),
+            )
+            candidate.new_content = apply_candidate(
+                content, candidate.response, filename, is_new_file, edit_format
+            )
+        except Exception as e:  # One broken candidate must not end the race
+            candidate.error = str(e) or type(e).__name__
+        candidate.seconds = time.monotonic() - started
+        return candidate
+
+    candidates = [Candidate(model=model, temperature=temperature) for model, temperature in specs]
+    tasks = [asyncio.create_task(attempt(c)) for c in candidates]
+    winner = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            candidate = await next_done
+            if candidate.valid:
+                winner = candidate
+                break
+    finally:
+        # Cancelling closes the HTTP connections, so Ollama stops decoding
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for client in clients.values():
+            await client.aclose()
+
+    return winner, candidates
+
+
+def generate_first_valid(*args, **kwargs) -> Tuple[Optional[Candidate], List[Candidate]]:
+    """
+    Blocking wrapper around race_candidates.
+    """
+    return asyncio.run(race_candidates(*args, **kwargs))
@@ -0,0 +1,75 @@
+"""
+Checkpoints of partial generations.
+
+While `anchor write` streams a file, the text received so far is saved to
+.anchor/checkpoints every second and whenever the stream stops early
+(dropped connection, error, Ctrl-C). `anchor write --resume` sends that text
+back as the start of the answer, so the model only generates the rest.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from anchor.streaming import close_stream
+
+CHECKPOINT_DIR = Path(".anchor/checkpoints")
+CHECKPOINT_INTERVAL = 1.0  # Seconds between saves while streaming
+
+
+class CheckpointStore:
+    """Partial output per target file, as JSON."""
+
+    def __init__(self, directory: Path = CHECKPOINT_DIR):
+        self.directory = Path(directory)
+
+    def _path(self, target: Path) -> Path:
+        digest = hashlib.sha256(str(Path(target).resolve()).encode("utf-8")).hexdigest()[:16]
+        return self.directory / f"{digest}.json"
+
+    def save(self, target: Path, task: str, model: str, text: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(target)
+        tmp_path = path.with_suffix(".tmp")
+        entry = {"file": str(target), "task": task, "model": model, "text": text, "saved_at": time.time()}
+        tmp_path.write_text(json.dumps(entry), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def load(self, target: Path) -> Optional[dict]:
+        try:
+            return json.loads(self._path(target).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def clear(self, target: Path):
+        self._path(target).unlink(missing_ok=True)
+
+
+def checkpointed(
+    token_stream: Iterable[str],
+    save: Callable[[str], None],
+    interval: float = CHECKPOINT_INTERVAL,
+) -> Iterator[str]:
+    """
+    Passes tokens through, calling save(text so far) every `interval`
+    seconds and once more if the stream stops before it is exhausted.
+    """
+    parts = []
+    last_save = time.monotonic()
+    try:
+        for token in token_stream:
+            parts.append(token)
+            yield token
+            if time.monotonic() - last_save >= interval:
+                save("".join(parts))
+                last_save = time.monotonic()
+    except BaseException:
+        # Includes the consumer giving up (GeneratorExit) and Ctrl-C
+        if parts:
+            save("".join(parts))
+        raise
+    finally:
+        close_stream(token_stream)
@@ -1,16 +1,36 @@
 import typer
 import os
+import time
 from typing import Optional
 from pathlib import Path
 from rich.console import Console
 from rich.panel import Panel
-from rich.markdown import Markdown
 from rich.prompt import Prompt, Confirm
 
 from anchor.context import generate_repo_map
-from anchor.llm import LLMClient
-from anchor.patch import apply_patch_dry_run, validate_syntax, PatchError
+from anchor.hosts import get_host_pool
+from anchor.llm import MAX_OUTPUT_TOKENS, REQUEST_TIMEOUT, LLMClient
+from anchor.local_llm import create_client, is_gguf
+from anchor.models import SLOW_LOAD_SECONDS, load_aliases, model_cascade, plan_model
+from anchor.patch import extract_patch_text, validate_syntax, PatchError
 from anchor.backup import BackupManager
+from anchor.budget import (
+    MAX_CONTEXT,
+    REPO_MAP_TOKENS,
+    PromptSection,
+    TokenBudget,
+    context_window_for,
+    estimate_tokens,
+    shrink_middle,
+    shrink_repo_map,
+    shrink_tail,
+)
+from anchor.cache import ResponseCache
+from anchor.candidates import BASE_TEMPERATURE, TEMPERATURE_STEP, applies, candidate_specs, generate_first_valid
+from anchor.checkpoints import CheckpointStore, checkpointed
+from anchor.edits import DIFF, EDIT_FORMATS, EditFormat, available_formats, edit_token_limit, get_edit_format
+from anchor.edit_stats import EditStats
+from anchor.kv_context import ContextStore
 from anchor.conversation import (
     ConversationBuffer,
     ConversationPhase,
@@ -18,50 +38,33 @@ from anchor.conversation import (
     create_discussion_prompt,
     create_planning_prompt,
 )
-from anchor.streaming import LiveCodeWriter
+from anchor.prompts import NEW_FILE_INSTRUCTIONS, build_prefix, build_system_prompt, prefixed_messages
+from anchor.streaming import LiveCodeWriter, stream_to_buffer
+from anchor.syntax_watch import GenerationAborted, SyntaxWatch
+from anchor.profiles import ProfileStore
+from anchor.tuning import candidate_settings, profile_from, total_ram, tune
+from anchor.ui import print_edit_stats, print_host_report, print_token_report, print_tuning_report, stream_panel
 
 def process_and_apply_diff(
     content: str, 
     raw_response: str, 
     file_path: Path, 
     console: Console,
-    is_new_file: bool = False
+    is_new_file: bool = False,
+    edit_format: EditFormat = DIFF,
 ) -> Optional[str]:
     """
-    Shared helper to extract, apply, and validate a diff from LLM response.
+    Shared helper to extract, apply, and validate an edit from LLM response.
     Returns the new content if successful, otherwise raises typer.Exit or returns None.
     """
     try:
-        clean_text = raw_response
-        if "```" in clean_text:
-            import re
-            # Priority 1: Look for explicit diff/patch/python block
-            match = re.search(r"```(?:diff|patch|python|txt)?\n(.*?)(?:```|$)", clean_text, re.DOTALL)
-            if match:
-                clean_text = match.group(1)
-            else:
-                # Priority 2: Look for first generic block
-                match = re.search(r"```(?:\w+)?\n(.*?)(?:```|$)", clean_text, re.DOTALL)
-                if match:
-                    clean_text = match.group(1)
-        
-        # FINAL CLEANUP: If it looks like a diff, try to find the start and end of it
-        if "--- " in clean_text and "+++ " in clean_text:
-             import re
-             # Extract from first --- to end of last hunk
-             match = re.search(r"(--- .*?@@.*?\n.*)", clean_text, re.DOTALL)
-             if match:
-                 clean_text = match.group(1)
-
-        clean_text = clean_text.strip()
-
         if is_new_file:
-            new_content = clean_text
+            new_content = extract_patch_text(raw_response)
         else:
-            if not clean_text:
+            new_content = edit_format.apply(content, raw_response)
+            if new_content == content:
                 console.print("[yellow]No changes suggested by LLM.[/yellow]")
                 return None
-            new_content = apply_patch_dry_run(content, clean_text)
 
         # Validation
         if not validate_syntax(new_content, str(file_path)):
@@ -75,15 +78,92 @@ def process_and_apply_diff(
 
     except PatchError as e:
         console.print(f"[bold red]Patch Error:[/bold red] {e}")
-        console.print(Panel(clean_text, title="Raw Output from LLM (Patch Error)"))
+        console.print(Panel(raw_response, title="Raw Output from LLM (Patch Error)"))
         raise typer.Exit(code=1)
     except Exception as e:
         console.print(f"[bold red]Error applying changes:[/bold red] {e}")
         raise typer.Exit(code=1)
 
+def prepare_model(client: LLMClient):
+    """
+    Checks what Ollama has in memory before the first request. Switches to
+    an already-loaded alias of the model, or warns that a swap is coming.
+    """
+    plan = plan_model(client.model, client.loaded_models(), load_aliases())
+    if plan.substituted:
+        console.print(f"[dim]Using {plan.model} (already loaded) instead of {plan.requested}.[/dim]")
+        client.model = plan.model
+    elif plan.needs_load and plan.loaded:
+        resident = ", ".join(sorted(plan.loaded))
+        console.print(
+            f"[yellow]{plan.model} is not loaded; Ollama holds {resident} "
+            f"({plan.resident_bytes / 1e9:.1f} GB). Switching models takes a while and may evict them.[/yellow]"
+        )
+
+
+def report_load_time(client: LLMClient):
+    if client.last_load_seconds >= SLOW_LOAD_SECONDS:
+        console.print(f"[dim]Waited {client.last_load_seconds:.1f}s for Ollama to load {client.model}.[/dim]")
+
+
+def warn_if_truncated(client: LLMClient):
+    continuations = client.last_metrics.get("continuations", 0)
+    if client.truncated:
+        console.print(
+            f"[bold yellow]Warning:[/bold yellow] the output reached the {MAX_OUTPUT_TOKENS}-token budget "
+            "and is probably incomplete (raise ANCHOR_MAX_OUTPUT_TOKENS)."
+        )
+    elif continuations:
+        console.print(f"[dim]Output hit the token limit; continued {continuations} time(s).[/dim]")
+
+
+def check_edit_format_name(name: str):
+    if name != "auto" and name not in EDIT_FORMATS:
+        console.print(f"[bold red]Error:[/bold red] Unknown edit format '{name}'. Choose from: auto, {', '.join(EDIT_FORMATS)}")
+        raise typer.Exit(code=1)
+
+
+def resolve_edit_format(name: str, model: str, content: str, file_path: Path, stats: EditStats) -> EditFormat:
+    """
+    Returns the requested format, or for 'auto' the one with the lowest
+    expected time to a valid edit for this model and file size.
+    """
+    if name == "auto":
+        name = stats.choose(model, content, available_formats(str(file_path)))
+        console.print(f"[dim]Edit format: {name} (auto)[/dim]")
+    return get_edit_format(name)
+
+
+def apply_and_record(
+    stats: EditStats,
+    client: LLMClient,
+    content: str,
+    response: str,
+    file_path: Path,
+    edit_format: EditFormat,
+    started: float,
+) -> Optional[str]:
+    """
+    process_and_apply_diff for an existing file, recording whether the
+    format produced a valid edit. Cached answers are not recorded.
+    """
+    fresh = bool(client.last_metrics)
+    ok = False
+    try:
+        new_content = process_and_apply_diff(content, response, file_path, console, edit_format=edit_format)
+        ok = new_content is not None
+        return new_content
+    finally:
+        if fresh:
+            stats.record(client.model, content, edit_format.name, ok, time.monotonic() - started)
+
 app = typer.Typer(help="Anchor: Safe, local AI code editing.")
 console = Console()
 
+WRITE_ATTEMPTS = 2  # `write` retries once when an attempt is stopped as hopeless
+DISCUSSION_TOKENS = 2048  # Room in `modify`'s window for the discussion turns after the prefix
+CHAT_REPLY_TOKENS = 2048  # Room left for each reply in `chat`
+
 
 @app.callback(invoke_without_command=True)
 def main(ctx: typer.Context):
@@ -100,12 +180,21 @@ def main(ctx: typer.Context):
 def edit(
     file: str,
     task: str,
-    model: str = typer.Option("codellama", help="Ollama model to use"),
+    model: str = typer.Option("codellama", help="Ollama model to use, or a .gguf file to run in-process"),
     show_tokens: bool = typer.Option(False, "--show-tokens", help="Show code as it is written in the terminal"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always query the model, bypassing the response and KV context caches"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Show the prompt's per-section token breakdown"),
+    candidates: int = typer.Option(1, "--candidates", "-n", help="Request N edits in parallel and keep the first one that applies"),
+    models: Optional[str] = typer.Option(None, "--models", help="Comma-separated models to draw candidates from (default: --model)"),
+    edit_format_name: str = typer.Option("auto", "--edit-format", help=f"How the model expresses the edit: auto, {', '.join(EDIT_FORMATS)}"),
+    timeout: float = typer.Option(REQUEST_TIMEOUT, "--timeout", help="Seconds before a request to the model is abandoned (0: no deadline)"),
+    reuse_prefix: bool = typer.Option(False, "--reuse-prefix", help="Send the instructions and file as a saved Ollama KV context (raw prompt: skips the model's chat template)"),
 ):
     """
     Edit a file based on a task description using local AI.
     """
+    check_edit_format_name(edit_format_name)
+
     file_path = Path(file).resolve()
     new_file_mode = False
 
@@ -123,57 +212,123 @@ def edit(
         )
     )
 
+    # Load the model while we build the context
+    client = create_client(
+        model=model,
+        cache=None if no_cache else ResponseCache(),
+        context_store=ContextStore() if reuse_prefix and not no_cache else None,
+        timeout=timeout,
+    )
+    prepare_model(client)
+    content = file_path.read_text(encoding="utf-8")
+    stats = EditStats()
+    edit_format = DIFF if new_file_mode else resolve_edit_format(edit_format_name, client.model, content, file_path, stats)
+
+    # One num_ctx for the warm-up and every request, since a different one
+    # would make Ollama reload the model. It is sized before the repo map
+    # exists: the file, the task, the reply and room for the map.
+    num_predict = MAX_OUTPUT_TOKENS if new_file_mode else edit_token_limit(edit_format, content)
+    num_ctx = context_window_for(
+        estimate_tokens(edit_format.view(content)) + estimate_tokens(task) + REPO_MAP_TOKENS + num_predict
+    )
+    client.warm_in_background(num_ctx=num_ctx)
+
     # 1. Context
     with console.status("[bold green]Generating context...[/bold green]"):
         repo_map = generate_repo_map(str(file_path.parent))
-        content = file_path.read_text(encoding="utf-8")
+
+    # Keep the prompt inside the context window: the repo map goes first,
+    # the file itself is only elided as a last resort.
+    if new_file_mode:
+        budget = TokenBudget(max_context=num_ctx)
+    else:
+        budget = TokenBudget(num_predict=num_predict, max_context=num_ctx)
+    repo_section, file_section, _ = budget.fit([
+        PromptSection("repo map", repo_map, priority=0, shrink=shrink_repo_map),
+        PromptSection("file", edit_format.view(content), priority=1, shrink=shrink_middle),
+        PromptSection("task", task),
+    ])
+    repo_map, prompt_content = repo_section.text, file_section.text
+    if verbose:
+        print_token_report(console, budget, num_ctx)
 
     # 2. LLM Call
+    # Stable context first, the task last (see anchor.prompts)
     if new_file_mode:
-        system_prompt = (
-            "You are an expert coding assistant.\n"
-            "The user wants to create a NEW file.\n"
-            "You must output the FULL CONTENT of the file, starting with all necessary IMPORTS.\n"
-            "The code must be complete and runnable. Do NOT output snippets.\n"
-            "Do NOT use diffs. Output the raw code inside a single code block.\n"
-            "Here is the project context:\n"
-            f"{repo_map}\n"
-        )
+        system_prompt = build_system_prompt(build_prefix(repo_map), NEW_FILE_INSTRUCTIONS)
     else:
-        system_prompt = (
-            "You are an expert coding assistant. You are strictly forbidden from outputting conversational text.\n"
-            "You must ONLY output a valid UNIFIED DIFF to solve the user task.\n"
-            "CRITICAL: Do NOT include any commentary, headers like 'This file is generated', or terminal UI characters.\n"
-            "CRITICAL: The context lines in your diff MUST EXACTLY MATCH the file content provided below.\n"
-            "Here is the repository structure:\n"
-            f"{repo_map}\n\n"
-            "Here is the content of the file you need to edit:\n"
-            f"File: {file}\n"
-            "```python\n"
-            f"{content}\n"
-            "```\n"
-            "Output ONLY the unified diff."
+        system_prompt = build_system_prompt(
+            build_prefix(repo_map, file, prompt_content), edit_format.instructions, edit_format.reminder
         )
 
-    client = LLMClient(model=model)
-    with console.status("[bold blue]Thinking (Ollama)...[/bold blue]"):
+    racing = candidates > 1 or models is not None
+    if racing and is_gguf(client.model):
+        console.print("[yellow]Candidate racing needs a server; generating one edit in-process.[/yellow]")
+        racing = False
+    if racing:
+        model_list = [m.strip() for m in models.split(",")] if models else [client.model]
+        specs = candidate_specs(max(candidates, len(model_list)), model_list)
+        with console.status(f"[bold blue]Generating {len(specs)} candidates (Ollama)...[/bold blue]"):
+            winner, tried = generate_first_valid(
+                system_prompt, task, content, str(file_path), specs,
+                is_new_file=new_file_mode, cache=client.cache, edit_format=edit_format, timeout=timeout,
+                num_ctx=num_ctx,
+            )
+        for candidate in tried:
+            if candidate.valid or candidate.error:  # Cancelled candidates say nothing about the format
+                if not new_file_mode:
+                    stats.record(candidate.model, content, edit_format.name, candidate.valid, candidate.seconds)
+            status = "[green]won[/green]" if candidate is winner else (candidate.error or "cancelled")
+            console.print(f"[dim]  {candidate.model} @ T={candidate.temperature:.2f}: {status}[/dim]")
+        if winner is None:
+            console.print("[bold red]No candidate produced a valid edit.[/bold red]")
+            raise typer.Exit(code=1)
+        new_content = winner.new_content
+    elif new_file_mode:
+        # One streamed generation, kept in memory until it has been validated
         try:
-            response = client.generate(system_prompt, task)
+            token_stream = client.stream_generate(
+                system_prompt, task, options={"num_ctx": num_ctx}, max_total_tokens=MAX_OUTPUT_TOKENS,
+                cache_if=lambda text: applies(content, text, str(file_path), is_new_file=True),
+            )
+            if show_tokens:
+                console.print(f"[bold blue]Generating {file}...[/bold blue]")
+                response = stream_to_buffer(token_stream, quiet=False)
+            else:
+                with console.status("[bold blue]Thinking (Ollama)...[/bold blue]"):
+                    response = stream_to_buffer(token_stream)
         except RuntimeError as e:
             console.print(f"[bold red]LLM Error:[/bold red] {e}")
             raise typer.Exit(code=1)
-
-    # 3. Diff & Dry Run & Validation
-    with console.status("[bold yellow]Processing & Validating...[/bold yellow]"):
-        new_content = process_and_apply_diff(
-            content, 
-            response, 
-            file_path, 
-            console, 
-            is_new_file=new_file_mode
-        )
-        if new_content is None:
-            raise typer.Exit(code=0)
+        warn_if_truncated(client)
+    else:
+        started = time.monotonic()
+        with console.status("[bold blue]Thinking (Ollama)...[/bold blue]"):
+            try:
+                response = client.generate(
+                    system_prompt, task,
+                    options={"num_predict": budget.num_predict, "num_ctx": num_ctx},
+                    format=edit_format.schema,
+                    until=edit_format.complete,
+                    # Only edits that apply are cached, or a rerun would replay the failure
+                    cache_if=lambda text: applies(content, text, str(file_path), edit_format=edit_format),
+                )
+            except RuntimeError as e:
+                console.print(f"[bold red]LLM Error:[/bold red] {e}")
+                raise typer.Exit(code=1)
+    if not racing:
+        report_load_time(client)
+        if verbose and client.prefill_saved_ms:
+            console.print(f"[dim]Reused cached KV context: skipped ~{client.prefill_saved_ms:.0f} ms of prompt prefill[/dim]")
+
+        # 3. Apply (dry run) & Validation
+        with console.status("[bold yellow]Processing & Validating...[/bold yellow]"):
+            if new_file_mode:
+                new_content = process_and_apply_diff(content, response, file_path, console, is_new_file=True)
+            else:
+                new_content = apply_and_record(stats, client, content, response, file_path, edit_format, started)
+            if new_content is None:
+                raise typer.Exit(code=0)
 
     # 4. Backup & Apply (Steps 4 & 5 merged or renumbered)
     console.print("[bold green]Change verified.[/bold green] Creating backup...")
@@ -181,54 +336,98 @@ def edit(
     backup_path = backup_mgr.create_backup(str(file_path))
     console.print(f"Backup saved to: {backup_path}")
 
-    if new_file_mode:
-        # Stream the new file content for the "LiveCode" experience
-        console.print(f"[bold blue]Streaming content to {file}...[/bold blue]")
-        writer = LiveCodeWriter(str(file_path), quiet=not show_tokens)
-        token_stream = client.stream_generate(system_prompt, task)
-        writer.write_stream(token_stream)
-    else:
-        file_path.write_text(new_content, encoding="utf-8")
-        console.print(f"[bold green]Success![/bold green] Edited {file}.")
+    file_path.write_text(new_content, encoding="utf-8")
+    console.print(f"[bold green]Success![/bold green] {'Created' if new_file_mode else 'Edited'} {file}.")
 
 
 @app.command()
 def modify(
     feature: str = typer.Argument(..., help="Feature description to implement"),
     file: str = typer.Option(None, "--file", "-f", help="Specific file to focus on (optional)"),
-    model: str = typer.Option("codellama", "--model", "-m", help="Ollama model to use"),
+    model: str = typer.Option("codellama", "--model", "-m", help="Ollama model to use, or a .gguf file to run in-process"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always query the model, bypassing the response cache"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Show the prompt's per-section token breakdown"),
+    edit_format_name: str = typer.Option("auto", "--edit-format", help=f"How the model expresses the edit: auto, {', '.join(EDIT_FORMATS)}"),
+    discuss_model: str = typer.Option(None, "--discuss-model", help="Model for the analysis and discussion (default: --model)"),
+    plan_model_name: str = typer.Option(None, "--plan-model", help="Model for the implementation plan (default: --model)"),
+    edit_model: str = typer.Option(None, "--edit-model", help="Comma-separated models to try for the edit, escalating to --model if none produces a valid one"),
+    timeout: float = typer.Option(REQUEST_TIMEOUT, "--timeout", help="Seconds before a request to the model is abandoned (0: no deadline)"),
 ):
     """
     Modify code with a discussion phase first.
     Flow: Prompt -> Discuss (Loop) -> Plan -> Confirmation -> Edit -> Save
     """
+    check_edit_format_name(edit_format_name)
+
+    clients = {}
+
+    def client_for(name: str) -> LLMClient:
+        if name not in clients:
+            clients[name] = create_client(model=name, cache=None if no_cache else ResponseCache(), timeout=timeout)
+            prepare_model(clients[name])
+        return clients[name]
+
+    edit_models = model_cascade(edit_model, model)
+
+    focus_content = ""
+    edit_format = None
+    if file:
+        file_path = Path(file).resolve()
+        if file_path.exists():
+            focus_content = file_path.read_text(encoding='utf-8')
+            # The edit format decides how the file is shown, and the file
+            # is part of the prefix every phase shares
+            edit_format = resolve_edit_format(
+                edit_format_name, client_for(edit_models[0]).model, focus_content, file_path, EditStats()
+            )
+    focus_view = edit_format.view(focus_content) if edit_format else ""
+
+    # One num_ctx for the warm-ups and every phase: changing it would make
+    # Ollama reload the model and drop the cached prefix. It is sized before
+    # the repo map exists, from the focused file, the edit reply (the
+    # largest one, plus the plan and format instructions after the prefix)
+    # and room for the map and the discussion. Without a focused file the
+    # file to edit is not known yet, so it is the largest window.
+    reply_tokens = 4096 + 512
+    if edit_format:
+        num_ctx = context_window_for(estimate_tokens(focus_view) + REPO_MAP_TOKENS + DISCUSSION_TOKENS + reply_tokens)
+    else:
+        num_ctx = MAX_CONTEXT
+
+    # Load the discussion model while we build the context
+    client = client_for(discuss_model or model)
+    client.warm_in_background(num_ctx=num_ctx)
+
     # 1. Context
     with console.status("[bold green]Analyzing project context...[/bold green]"):
         repo_map = generate_repo_map(".")
-        focus_file_content = ""
-        if file:
-            file_path = Path(file).resolve()
-            if file_path.exists():
-                focus_file_content = f"\nFocused File ({file}):\n{file_path.read_text(encoding='utf-8')}"
-        
-        repo_context = f"{repo_map}\n{focus_file_content}"
-        buffer = ConversationBuffer(feature_request=feature, context_summary=repo_context)
-        client = LLMClient(model=model)
+
+    def build_context(file_name: Optional[str], file_view: str):
+        budget = TokenBudget(num_predict=reply_tokens, max_context=num_ctx)
+        repo_section, focus_section = budget.fit([
+            PromptSection("repo map", repo_map, priority=0, shrink=shrink_repo_map),
+            PromptSection("focused file", file_view, priority=1, shrink=shrink_middle),
+        ])
+        if verbose:
+            print_token_report(console, budget, num_ctx)
+        return build_prefix(repo_section.text, file_name, focus_section.text)
+
+    prefix = build_context(file, focus_view)
+    phase_options = {"num_ctx": num_ctx}
+    buffer = ConversationBuffer(feature_request=feature, context_summary=prefix)
 
     # 2. Initial Analysis
-    with console.status("[bold blue]Initial Analysis...[/bold blue]"):
-        system_prompt = "You are a helpful coding assistant. Engage in a discussion to clarify the task before providing code."
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": create_analysis_prompt(feature, repo_context)}
-        ]
-        response = client.chat(messages)
-        buffer.add_message("assistant", response, ConversationPhase.DISCUSS)
+    analysis_request = {"role": "user", "content": create_analysis_prompt(feature)}
+    response = stream_panel(
+        console,
+        client.stream_chat(prefixed_messages(prefix, [analysis_request]), options=phase_options),
+        title="[bold blue]Anchor's Analysis[/bold blue]",
+    )
+    report_load_time(client)
+    buffer.add_message("assistant", response, ConversationPhase.DISCUSS)
 
     # 3. Discussion Loop
     while buffer.current_phase == ConversationPhase.DISCUSS:
-        console.print(Panel(Markdown(response), title="[bold blue]Anchor's Analysis[/bold blue]"))
-        
         user_input = Prompt.ask("\n[bold yellow]Your feedback (or type 'plan' to move to implementation)[/bold yellow]")
         
         if user_input.lower() == "plan":
@@ -237,27 +436,42 @@ def modify(
             
         buffer.add_message("user", user_input)
         
-        with console.status("[bold blue]Thinking...[/bold blue]"):
-            discussion_history = buffer.get_discussion_history()
-            chat_messages = [
-                {"role": "system", "content": system_prompt},
-                *([{"role": m.role, "content": m.content} for m in buffer.messages[-5:]]) # Last 5 messages for context
-            ]
-            response = client.chat(chat_messages)
-            buffer.add_message("assistant", response)
+        chat_messages = prefixed_messages(prefix, [
+            analysis_request,
+            *([{"role": m.role, "content": m.content} for m in buffer.messages[-5:]]) # Last 5 messages for context
+        ])
+        response = stream_panel(
+            console,
+            client.stream_chat(chat_messages, options=phase_options),
+            title="[bold blue]Anchor's Analysis[/bold blue]",
+        )
+        buffer.add_message("assistant", response)
 
     # 4. Planning
     if buffer.current_phase == ConversationPhase.PLAN:
-        with console.status("[bold magenta]Creating implementation plan...[/bold magenta]"):
-            discussion_history = "\n".join([f"{m.role}: {m.content}" for m in buffer.messages])
-            plan_prompt = create_planning_prompt(feature, discussion_history, repo_context)
-            plan_response = client.chat([{"role": "user", "content": plan_prompt}])
-            buffer.implementation_plan = plan_response
-            buffer.transition_to(ConversationPhase.CONFIRM)
+        discussion_history = "\n".join([f"{m.role}: {m.content}" for m in buffer.messages])
+        budget = TokenBudget(num_predict=2048, max_context=num_ctx)
+        history_section, _ = budget.fit([
+            PromptSection("discussion", discussion_history, shrink=shrink_tail),
+            PromptSection("context", prefix),
+        ])
+        if verbose:
+            print_token_report(console, budget, num_ctx)
+        plan_request = {"role": "user", "content": create_planning_prompt(feature, history_section.text)}
+        plan_client = client_for(plan_model_name or model)
+        plan_response = stream_panel(
+            console,
+            plan_client.stream_chat(prefixed_messages(prefix, [plan_request]), options=phase_options),
+            title="[bold magenta]Implementation Plan[/bold magenta]",
+            border_style="magenta",
+        )
+        report_load_time(plan_client)
+        buffer.implementation_plan = plan_response
+        buffer.transition_to(ConversationPhase.CONFIRM)
 
     if buffer.current_phase == ConversationPhase.CONFIRM:
-        console.print(Panel(Markdown(buffer.implementation_plan), title="[bold magenta]Implementation Plan[/bold magenta]"))
-        
+        # Load the edit model while the user reads the plan
+        client_for(edit_models[0]).warm_in_background(num_ctx=num_ctx)
         if not Confirm.ask("[bold green]Do you want to proceed with this plan?[/bold green]"):
             console.print("[yellow]Modification cancelled.[/yellow]")
             raise typer.Exit()
@@ -272,52 +486,93 @@ def modify(
         
         file_path = Path(file).resolve()
         content = file_path.read_text(encoding="utf-8")
-        # Removing line numbers from content passed to LLM for diff generation
-        # numbered_content = "\n".join([f"{i+1:4} | {line}" for i, line in enumerate(content.splitlines())])
-
-        with console.status(f"[bold blue]Generating changes for {file}...[/bold blue]"):
-            edit_prompt = (
-                f"Based on the following plan, generate a UNIFIED DIFF for {file}.\n"
-                f"Plan:\n{buffer.implementation_plan}\n\n"
-                f"Current File Content:\n```python\n{content}\n```\n"
-                "Output ONLY the unified diff. DO NOT hallucinate file headers or UI characters."
-            )
-            response = client.generate("You are an expert coder. Output ONLY a valid UNIFIED DIFF. Do NOT hallucinate headers.", edit_prompt)
+        stats = EditStats()
+        if edit_format is None or content != focus_content:
+            # The file was not part of the discussion prefix (or has changed since)
+            edit_format = resolve_edit_format(edit_format_name, client_for(edit_models[0]).model, content, file_path, stats)
+            prefix = build_context(file, edit_format.view(content))
+
+        edit_request = (
+            f"{edit_format.instructions}"
+            f"{edit_format.reminder}\n\n"
+            f"Implement this plan in {file}:\n{buffer.implementation_plan}"
+        )
+        edit_messages = prefixed_messages(prefix, [{"role": "user", "content": edit_request}])
+
+        # Cheaper models first; escalate when the edit does not apply or validate
+        new_content = None
+        for attempt, edit_model_name in enumerate(edit_models):
+            edit_client = client_for(edit_model_name)
+            started = time.monotonic()
+            edit_client.last_metrics = {}
+            with console.status(f"[bold blue]Generating changes for {file} ({edit_client.model})...[/bold blue]"):
+                response = edit_client.chat(
+                    edit_messages,
+                    options={"num_ctx": num_ctx, "temperature": 0.2, "num_predict": edit_token_limit(edit_format, content)},
+                    format=edit_format.schema,
+                    until=edit_format.complete,
+                    cache_if=lambda text: applies(content, text, str(file_path), edit_format=edit_format),
+                )
+            report_load_time(edit_client)
+
+            # Apply against the file as it is now: line-addressed edits detect
+            # changes made while the model was generating
+            content = file_path.read_text(encoding="utf-8")
 
-        # Use shared helper
-        with console.status("[bold yellow]Processing & Validating...[/bold yellow]"):
-            new_content = process_and_apply_diff(content, response, file_path, console)
-            
-            if new_content:
-                # Backup & Apply
-                backup_mgr = BackupManager()
-                backup_path = backup_mgr.create_backup(str(file_path))
-                
-                # For consistency, just write. If we wanted streaming here,
-                # we'd have to stream the resulting content.
-                file_path.write_text(new_content, encoding="utf-8")
-                console.print(f"[bold green]Success![/bold green] Applied changes to {file}.")
-                console.print(f"Backup saved to: {backup_path}")
-            else:
-                console.print("[yellow]No changes applied.[/yellow]")
+            try:
+                with console.status("[bold yellow]Processing & Validating...[/bold yellow]"):
+                    new_content = apply_and_record(stats, edit_client, content, response, file_path, edit_format, started)
+            except typer.Exit as e:
+                if e.exit_code != 1 or attempt == len(edit_models) - 1:
+                    raise
+                console.print(f"[yellow]Escalating to {edit_models[attempt + 1]}...[/yellow]")
+                continue
+            break
+
+        if new_content:
+            # Backup & Apply
+            backup_mgr = BackupManager()
+            backup_path = backup_mgr.create_backup(str(file_path))
+
+            # For consistency, just write. If we wanted streaming here,
+            # we'd have to stream the resulting content.
+            file_path.write_text(new_content, encoding="utf-8")
+            console.print(f"[bold green]Success![/bold green] Applied changes to {file}.")
+            console.print(f"Backup saved to: {backup_path}")
+        else:
+            console.print("[yellow]No changes applied.[/yellow]")
 
 @app.command()
 def write(
     file: str = typer.Argument(..., help="Target file to write code into"),
     task: str = typer.Argument(..., help="Task description for the LLM"),
-    model: str = typer.Option("codellama", help="Ollama model to use"),
+    model: str = typer.Option("codellama", help="Ollama model to use, or a .gguf file to run in-process"),
     show_tokens: bool = typer.Option(False, "--show-tokens", help="Show code as it is written in the terminal"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always query the model, bypassing the response cache"),
+    timeout: float = typer.Option(REQUEST_TIMEOUT, "--timeout", help="Seconds before a request to the model is abandoned (0: no deadline)"),
+    resume: bool = typer.Option(False, "--resume", help="Continue an interrupted generation of this file instead of starting over"),
 ):
     """
     Generate code and write it to a file token-by-token in real-time.
     Exactly like human typing.
     """
     file_path = Path(file).resolve()
-    if file_path.exists():
-        if not Confirm.ask(f"[yellow]File {file} already exists. Overwrite?[/yellow]"):
-            raise typer.Exit()
-        backup_mgr = BackupManager()
-        backup_mgr.create_backup(str(file_path))
+    checkpoints = CheckpointStore()
+    partial = ""
+    if resume:
+        checkpoint = checkpoints.load(file_path)
+        if checkpoint is None or checkpoint.get("task") != task:
+            console.print(f"[bold red]Error:[/bold red] No interrupted generation of {file} for this task.")
+            raise typer.Exit(code=1)
+        partial = checkpoint["text"]
+        console.print(f"[dim]Resuming after {len(partial)} characters.[/dim]")
+    else:
+        if file_path.exists():
+            if not Confirm.ask(f"[yellow]File {file} already exists. Overwrite?[/yellow]"):
+                raise typer.Exit()
+            backup_mgr = BackupManager()
+            backup_mgr.create_backup(str(file_path))
+        checkpoints.clear(file_path)  # Starting over
 
     console.print(
         Panel(
@@ -327,7 +582,8 @@ def write(
         )
     )
 
-    client = LLMClient(model=model)
+    client = create_client(model=model, cache=None if no_cache else ResponseCache(), timeout=timeout)
+    prepare_model(client)
     writer = LiveCodeWriter(str(file_path), quiet=not show_tokens)
 
     system_prompt = (
@@ -336,25 +592,68 @@ def write(
         "The code must be complete and runnable."
     )
 
-    try:
-        token_stream = client.stream_generate(system_prompt, task)
-        writer.write_stream(token_stream)
-    except Exception as e:
-        console.print(f"\n[bold red]Error:[/bold red] {e}")
+    def save(text: str):
+        checkpoints.save(file_path, task, client.model, partial + text)
+
+    def file_stream(options: dict):
+        # The file is rewritten from the start, saved text first
+        if partial:
+            yield partial
+        new_tokens = client.stream_generate(
+            system_prompt, task, options=options, max_total_tokens=MAX_OUTPUT_TOKENS, resume_from=partial
+        )
+        yield from checkpointed(new_tokens, save)
+
+    aborted = []  # Tokens received by attempts stopped as hopeless
+    for attempt in range(WRITE_ATTEMPTS):
+        watch = SyntaxWatch() if file_path.suffix == ".py" else None
+        options = {"temperature": BASE_TEMPERATURE + attempt * TEMPERATURE_STEP}
+        try:
+            writer.write_stream(file_stream(options), watch=watch)
+            break
+        except GenerationAborted as e:
+            console.print(f"\n[yellow]Stopped after {e.tokens} tokens: {e}[/yellow]")
+            aborted.append(e.tokens)
+            partial = ""  # Retry from scratch; the saved text is part of the problem
+            checkpoints.clear(file_path)
+        except Exception as e:
+            console.print(f"\n[bold red]Error:[/bold red] {e}")
+            if checkpoints.load(file_path) and client.backend.continues_messages:
+                console.print("[yellow]Progress saved. Run the same command with --resume to continue.[/yellow]")
+            raise typer.Exit(code=1)
+    else:
+        console.print(f"[bold red]Error:[/bold red] No valid code after {WRITE_ATTEMPTS} attempts.")
         raise typer.Exit(code=1)
+    checkpoints.clear(file_path)
+    warn_if_truncated(client)
+    if aborted and watch is not None:
+        # An abandoned attempt would have run about as long as the one that succeeded
+        saved = sum(max(watch.tokens - tokens, 0) for tokens in aborted)
+        console.print(f"[dim]Stopped {len(aborted)} hopeless attempt(s) early, saving ~{saved} tokens.[/dim]")
+
 @app.command()
 def chat(
-    model: str = typer.Option("codellama", help="Ollama model to use"),
+    model: str = typer.Option("codellama", help="Ollama model to use, or a .gguf file to run in-process"),
+    timeout: float = typer.Option(REQUEST_TIMEOUT, "--timeout", help="Seconds before a request to the model is abandoned (0: no deadline)"),
 ):
     """
     Start a general conversation with Anchor.
     """
-    client = LLMClient(model=model)
-    console.print(Panel("Welcome to Anchor Chat! Type [bold cyan]'exit'[/bold cyan] or [bold cyan]'quit'[/bold cyan] to end the session.", title="[bold cyan]Anchor Chat[/bold cyan]"))
-    
+    client = create_client(model=model, timeout=timeout)
+    prepare_model(client)
     messages = [
         {"role": "system", "content": "You are Anchor, a helpful and friendly AI coding assistant. You can chat about anything, but you're especially good at programming."}
     ]
+
+    def context_window() -> int:
+        return context_window_for(sum(estimate_tokens(m["content"]) for m in messages) + CHAT_REPLY_TOKENS)
+
+    # Overlaps model loading with the user typing. The window only grows,
+    # a bucket at a time as the conversation does, so the model is reloaded
+    # (num_ctx changed) only at those steps.
+    num_ctx = context_window()
+    client.warm_in_background(num_ctx=num_ctx)
+    console.print(Panel("Welcome to Anchor Chat! Type [bold cyan]'exit'[/bold cyan] or [bold cyan]'quit'[/bold cyan] to end the session.", title="[bold cyan]Anchor Chat[/bold cyan]"))
     
     while True:
         user_input = Prompt.ask("\n[bold yellow]You[/bold yellow]")
@@ -364,15 +663,112 @@ def chat(
             break
             
         messages.append({"role": "user", "content": user_input})
-        
-        with console.status("[bold blue]Anchor is typing...[/bold blue]"):
-            try:
-                response = client.chat(messages)
-                console.print(f"\n[bold cyan]Anchor[/bold cyan]: {response}")
-                messages.append({"role": "assistant", "content": response})
-            except Exception as e:
-                console.print(f"[bold red]Error:[/bold red] {e}")
-                break
+        num_ctx = max(num_ctx, context_window())
+
+        try:
+            response = stream_panel(
+                console,
+                client.stream_chat(messages, options={"num_ctx": num_ctx, "num_predict": CHAT_REPLY_TOKENS}),
+                title="[bold cyan]Anchor[/bold cyan]",
+                border_style="cyan",
+            )
+            report_load_time(client)
+            messages.append({"role": "assistant", "content": response})
+        except KeyboardInterrupt:
+            # The stream is already closed; drop the unanswered question
+            messages.pop()
+            console.print("[yellow]Interrupted.[/yellow]")
+        except Exception as e:
+            console.print(f"[bold red]Error:[/bold red] {e}")
+            break
+
+@app.command()
+def warm(
+    model: str = typer.Option("codellama", help="Ollama model to use, or a .gguf file to run in-process"),
+    keep_alive: str = typer.Option("30m", "--keep-alive", help="How long to keep the model loaded ('10m', '1h', '-1' to pin)"),
+    unload: bool = typer.Option(False, "--unload", help="Unload the model and free its memory instead"),
+):
+    """
+    Pre-load a model so the next command starts generating immediately.
+    """
+    client = create_client(model=model)
+    try:
+        if unload:
+            with console.status(f"[bold blue]Unloading {model}...[/bold blue]"):
+                client.unload()
+            console.print(f"[bold green]Unloaded[/bold green] {model}.")
+        else:
+            with console.status(f"[bold blue]Loading {model}...[/bold blue]"):
+                # With the num_ctx edit, modify and chat use, so they find it loaded as is
+                load_time = client.warm(keep_alive=keep_alive, num_ctx=MAX_CONTEXT)
+            console.print(f"[bold green]Ready![/bold green] {model} loaded in {load_time:.1f}s (keep-alive: {keep_alive}).")
+    except RuntimeError as e:
+        console.print(f"[bold red]LLM Error:[/bold red] {e}")
+        raise typer.Exit(code=1)
+
+@app.command()
+def hosts():
+    """
+    Health-check the configured Ollama hosts (OLLAMA_HOST, comma-separated).
+    """
+    pool = get_host_pool()
+    with console.status("[bold blue]Checking hosts...[/bold blue]"):
+        for host in pool.hosts:
+            if pool.check_health(host):
+                pool.refresh_loaded_models(host)
+    print_host_report(console, pool.report())
+
+@app.command("tune")
+def tune_command(
+    model: str = typer.Option("codellama", help="Ollama model to tune"),
+    runs: int = typer.Option(2, min=1, help="Measured generations per setting"),
+    reset: bool = typer.Option(False, "--reset", help="Delete the saved profile and use Ollama's defaults again"),
+):
+    """
+    Benchmark inference settings on this machine and save the fastest for the model.
+    """
+    store = ProfileStore()
+    if reset:
+        removed = store.remove(model)
+        console.print(f"[bold green]Removed[/bold green] the profile for {model}." if removed else f"[yellow]No profile saved for {model}.[/yellow]")
+        return
+
+    ram = total_ram()
+    settings = candidate_settings(os.cpu_count(), ram)
+    ram_text = f"{ram / 1024 ** 3:.0f} GB RAM" if ram else "unknown RAM"
+    console.print(f"Tuning [bold]{model}[/bold] on {os.cpu_count()} cores, {ram_text}: {len(settings)} settings x {runs} runs.")
+
+    def progress(result):
+        options = ", ".join(f"{k}={v}" for k, v in result.options.items()) or "Ollama defaults"
+        console.print(f"[dim]  {options}: {result.error or f'{result.edit_seconds:.1f} s per typical edit'}[/dim]")
+
+    with console.status("[bold blue]Benchmarking (each setting reloads the model)...[/bold blue]"):
+        results = tune(model, settings, runs=runs, on_result=progress)
+    print_tuning_report(console, results)
+
+    best = results[0]
+    if best.error or best.edit_seconds == float("inf"):
+        console.print("[bold red]Tuning failed:[/bold red] no setting produced usable timings.")
+        raise typer.Exit(code=1)
+    if not best.options:
+        store.remove(model)
+        console.print(f"[bold green]Ollama's defaults are fastest[/bold green] for {model}; no profile needed.")
+        return
+    store.save(model, profile_from(best))
+    console.print(f"[bold green]Saved[/bold green] profile for {model}: {best.options}. Anchor now applies it automatically.")
+
+@app.command("stats")
+def show_stats(
+    model: Optional[str] = typer.Option(None, help="Only show this model"),
+):
+    """
+    Show how well each edit format has worked per model and file size.
+    """
+    rows = EditStats().report(model)
+    if not rows:
+        console.print("[yellow]No edits recorded yet.[/yellow]")
+        return
+    print_edit_stats(console, rows)
 
 @app.command()
 def undo():
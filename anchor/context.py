@@ -1,29 +1,60 @@
 import os
 import ast
 from pathlib import Path
-from typing import List, Set
+from typing import Dict, List, NamedTuple, Set
 
 IGNORE_DIRS = {'.git', '__pycache__', 'venv', '.env', '.idea', '.vscode', 'node_modules', 'dist', 'build'}
 IGNORE_FILES = {'.DS_Store', 'poetry.lock', 'package-lock.json'}
 
+
+class SymbolRange(NamedTuple):
+    """Where a class or function sits in a file (1-based, inclusive lines)."""
+
+    kind: str  # "class" or "def"
+    start: int  # First decorator line, or the def/class line
+    end: int
+    indent: int  # Column of the def/class keyword
+
+
+def get_symbol_ranges(tree: ast.Module) -> Dict[str, SymbolRange]:
+    """
+    Maps top-level functions and classes, and the methods and nested
+    classes inside classes, to their line ranges. Names are qualified
+    with their classes ('ClassName.method') and kept in source order.
+    """
+    symbols = {}
+
+    def visit(body, prefix):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = f"{prefix}{node.name}"
+                start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                kind = "class" if isinstance(node, ast.ClassDef) else "def"
+                symbols[name] = SymbolRange(kind, start, node.end_lineno, node.col_offset)
+                if kind == "class":
+                    visit(node.body, f"{name}.")
+
+    visit(tree.body, "")
+    return symbols
+
+
 def get_definitions(file_path: Path) -> List[str]:
     """Extract class and function definitions from a Python file."""
     definitions = []
     try:
         with open(file_path, "r", encoding="utf-8") as f:
             tree = ast.parse(f.read(), filename=str(file_path))
-        
-        for node in tree.body:
-            if isinstance(node, ast.ClassDef):
-                definitions.append(f"class {node.name}")
-                for item in node.body:
-                    if isinstance(item, ast.FunctionDef):
-                        definitions.append(f"  def {item.name}")
-            elif isinstance(node, ast.FunctionDef):
-                definitions.append(f"def {node.name}")
     except Exception:
         # If AST parsing fails (e.g. syntax error or non-python file masked as .py), skip
         return []
+
+    symbols = get_symbol_ranges(tree)
+    for name, symbol in symbols.items():
+        parent, _, short_name = name.rpartition(".")
+        if not parent:
+            definitions.append(f"{symbol.kind} {short_name}")
+        elif "." not in parent and symbol.kind == "def":
+            definitions.append(f"  def {short_name}")
     return definitions
 
 def generate_repo_map(root_dir: str = ".") -> str:
@@ -81,16 +81,15 @@ class ConversationBuffer:
         }
 
 
-def create_analysis_prompt(feature: str, repo_context: str) -> str:
+def create_analysis_prompt(feature: str) -> str:
     """
     Create the initial prompt for analyzing a feature request.
+    The repository context is supplied separately as the shared prompt prefix.
     """
-    return f"""Analyze this request EXTREMELY concisely (max 50 words):
+    return f"""Engage in a discussion to clarify the task before providing code.
+Analyze this request EXTREMELY concisely (max 50 words):
 Feature Request: {feature}
 
-Context:
-{repo_context}
-
 Respond ONLY with:
 1. One-sentence summary.
 2. 2-3 essential questions MAX.
@@ -111,20 +110,18 @@ User said: {user_response}
 Respond in max 30 words. If you have enough info, say exactly "I have enough information to create a plan."."""
 
 
-def create_planning_prompt(
-    feature: str, full_conversation: str, repo_context: str
-) -> str:
+def create_planning_prompt(feature: str, full_conversation: str) -> str:
     """
     Create a prompt for generating the plan.
+    The repository context is supplied separately as the shared prompt prefix.
     """
     return f"""Create a TINY implementation plan (max 100 tokens).
  
-Task: {feature}
-Discussion: {full_conversation}
-Context: {repo_context}
- 
 Rules:
 1. List ONLY changed lines/functions.
 2. No new modules/files.
 3. Steps should be a short bulleted list.
-4. Keep the summary under 1 line."""
+4. Keep the summary under 1 line.
+
+Discussion: {full_conversation}
+Task: {feature}"""
@@ -0,0 +1,125 @@
+"""
+Measured edit-format performance, used to pick a format automatically.
+
+For every model and file-size bucket Anchor records how often each edit
+format produced an edit that applied and validated, and how long that took.
+`--edit-format auto` picks the format with the lowest expected time to a
+valid edit: mean seconds per attempt divided by the success rate, i.e. the
+expected time including retries. Formats without much history fall back on
+priors, so tiny files start out with whole-file rewrites and large files with
+targeted formats.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from anchor.budget import estimate_tokens
+
+STATS_FILE = Path(".anchor/edit_stats.json")
+
+# Upper bounds (in lines) of the file-size buckets
+SIZE_BUCKETS = ((50, "tiny"), (200, "small"), (1000, "medium"))
+LARGEST_BUCKET = "large"
+
+# Priors count as this many attempts, so a handful of real measurements
+# outweigh them.
+PRIOR_WEIGHT = 2.0
+PRIOR_TOKENS_PER_SECOND = 20.0
+# (success rate, output tokens; None means the whole file is rewritten)
+PRIORS = {
+    "whole": (0.95, None),
+    "diff": (0.5, 250),
+    "search-replace": (0.6, 150),
+    "lines": (0.6, 120),
+    "symbol": (0.65, 300),
+}
+DEFAULT_PRIOR = (0.5, 250)
+
+
+def size_bucket(content: str) -> str:
+    lines = content.count("\n") + 1
+    for limit, name in SIZE_BUCKETS:
+        if lines <= limit:
+            return name
+    return LARGEST_BUCKET
+
+
+class EditStats:
+    """
+    Attempt/success/seconds counters per model, size bucket and format,
+    persisted as JSON.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, path: Path = STATS_FILE):
+        self.path = Path(path)
+        self.data: Dict[str, Dict[str, Dict[str, Dict[str, float]]]] = {}
+        if self.path.exists():
+            try:
+                self.data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                self.data = {}
+
+    def _entry(self, model: str, bucket: str, edit_format: str) -> Dict[str, float]:
+        formats = self.data.setdefault(model, {}).setdefault(bucket, {})
+        return formats.setdefault(edit_format, {"attempts": 0, "successes": 0, "seconds": 0.0})
+
+    def record(self, model: str, content: str, edit_format: str, ok: bool, seconds: float):
+        """
+        Counts one attempt and saves the stats file.
+        """
+        with self._lock:
+            entry = self._entry(model, size_bucket(content), edit_format)
+            entry["attempts"] += 1
+            entry["successes"] += int(ok)
+            entry["seconds"] += seconds
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.data, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def expected_seconds(self, model: str, content: str, edit_format: str) -> float:
+        """
+        Expected time until a valid edit, blending measurements with priors.
+        """
+        prior_rate, prior_tokens = PRIORS.get(edit_format, DEFAULT_PRIOR)
+        file_tokens = estimate_tokens(content)
+        tokens = file_tokens if prior_tokens is None else min(prior_tokens, file_tokens)
+        prior_seconds = tokens / PRIOR_TOKENS_PER_SECOND
+
+        entry = self.data.get(model, {}).get(size_bucket(content), {}).get(edit_format, {})
+        attempts = entry.get("attempts", 0)
+        rate = (entry.get("successes", 0) + PRIOR_WEIGHT * prior_rate) / (attempts + PRIOR_WEIGHT)
+        seconds = (entry.get("seconds", 0.0) + PRIOR_WEIGHT * prior_seconds) / (attempts + PRIOR_WEIGHT)
+        return seconds / max(rate, 0.01)
+
+    def choose(self, model: str, content: str, formats: Iterable[str]) -> str:
+        return min(formats, key=lambda name: self.expected_seconds(model, content, name))
+
+    def report(self, model: Optional[str] = None) -> List[Dict]:
+        """
+        One row per model, bucket and format that has been tried.
+        """
+        rows = []
+        for model_name, buckets in sorted(self.data.items()):
+            if model and model_name != model:
+                continue
+            for bucket, formats in buckets.items():
+                for edit_format, entry in sorted(formats.items()):
+                    attempts = entry["attempts"]
+                    rows.append({
+                        "model": model_name,
+                        "bucket": bucket,
+                        "format": edit_format,
+                        "attempts": attempts,
+                        "success_rate": entry["successes"] / attempts if attempts else 0.0,
+                        "avg_seconds": entry["seconds"] / attempts if attempts else 0.0,
+                    })
+        return rows
@@ -0,0 +1,469 @@
+"""
+Edit formats: how the model is asked to express a change and how that
+answer is turned back into new file content.
+
+Every format provides the prompt instructions, an optional JSON schema for
+Ollama's `format` parameter (which constrains decoding to valid JSON), and
+an `apply` function that raises PatchError when the answer cannot be used.
+An answer without any changes returns the original content unchanged.
+"""
+
+import ast
+import hashlib
+import json
+import re
+import textwrap
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from anchor.budget import estimate_tokens
+from anchor.context import get_symbol_ranges
+from anchor.patch import PatchError, apply_patch_dry_run, extract_patch_text, fenced_block_closed
+
+# Output token limits for an edit (num_predict)
+MIN_EDIT_TOKENS = 512
+MAX_TARGETED_EDIT_TOKENS = 4096
+
+
+@dataclass(frozen=True)
+class EditFormat:
+    """A way of asking for, and applying, an edit to an existing file."""
+
+    name: str
+    instructions: str  # Placed after the repository context and file
+    reminder: str  # Last line before the task
+    apply: Callable[[str, str], str]  # (original content, raw response) -> new content
+    schema: Optional[dict] = None  # Ollama structured-output schema
+    view: Callable[[str], str] = lambda content: content  # How the file is shown to the model
+    python_only: bool = False  # Needs the file to parse as Python
+    rewrites_file: bool = False  # The answer repeats the whole file
+    # Whether a partial answer is already complete, so the rest of the
+    # generation can be cancelled. Schema formats end with their JSON.
+    complete: Optional[Callable[[str], bool]] = None
+
+
+EDIT_FORMATS: Dict[str, EditFormat] = {}
+
+
+def register_edit_format(edit_format: EditFormat) -> EditFormat:
+    EDIT_FORMATS[edit_format.name] = edit_format
+    return edit_format
+
+
+def get_edit_format(name: str) -> EditFormat:
+    try:
+        return EDIT_FORMATS[name]
+    except KeyError:
+        raise ValueError(f"Unknown edit format '{name}'. Choose from: {', '.join(EDIT_FORMATS)}") from None
+
+
+def available_formats(filename: str) -> List[str]:
+    """
+    Names of the formats that can edit `filename`.
+    """
+    is_python = filename.endswith(".py")
+    return [name for name, edit_format in EDIT_FORMATS.items() if is_python or not edit_format.python_only]
+
+
+def edit_token_limit(edit_format: EditFormat, content: str) -> int:
+    """
+    num_predict for an edit of `content`: a rewrite needs the whole file
+    plus some slack, while targeted edits never need more than a diff
+    that touches every line.
+    """
+    file_tokens = estimate_tokens(content)
+    if edit_format.rewrites_file:
+        return max(int(file_tokens * 1.25) + 128, MIN_EDIT_TOKENS)
+    return min(max(file_tokens * 2, MIN_EDIT_TOKENS), MAX_TARGETED_EDIT_TOKENS)
+
+
+def parse_json_response(raw_response: str):
+    """
+    Decodes a structured-output response. Tolerates a stray code fence or
+    text around the JSON object from models that ignore `format`.
+    """
+    text = raw_response.strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            pass
+    raise PatchError("Response is not valid JSON.")
+
+
+def _edit_ops(raw_response: str) -> list:
+    """
+    The edit operations of a structured-output response, given either as
+    {"edits": [...]} or as a bare list.
+    """
+    data = parse_json_response(raw_response)
+    ops = data.get("edits") if isinstance(data, dict) else data
+    if ops is None:
+        return []
+    if not isinstance(ops, list):
+        raise PatchError("Response does not hold a list of edits.")
+    return ops
+
+
+def _text_field(op, name: str) -> str:
+    """
+    A string field of one edit operation, empty when missing or null.
+    Models that ignore `format` answer in any shape, so anything else
+    raises PatchError.
+    """
+    if not isinstance(op, dict):
+        raise PatchError(f"Edit is not an object: {str(op)[:60]!r}")
+    value = op.get(name)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise PatchError(f"Edit field '{name}' is not a string.")
+    return value
+
+
+# --- Unified diff -----------------------------------------------------------
+
+def apply_unified_diff(content: str, raw_response: str) -> str:
+    clean_text = extract_patch_text(raw_response)
+    if not clean_text:
+        return content
+    return apply_patch_dry_run(content, clean_text)
+
+
+DIFF = register_edit_format(EditFormat(
+    name="diff",
+    instructions=(
+        "You are strictly forbidden from outputting conversational text.\n"
+        "You must ONLY output a valid UNIFIED DIFF to solve the user task.\n"
+        "CRITICAL: Do NOT include any commentary, headers like 'This file is generated', or terminal UI characters.\n"
+        "CRITICAL: The context lines in your diff MUST EXACTLY MATCH the file content provided above.\n"
+    ),
+    reminder="Output ONLY the unified diff.",
+    apply=apply_unified_diff,
+    complete=fenced_block_closed,
+))
+
+
+# --- Whole-file rewrite -----------------------------------------------------
+
+def apply_whole_file(content: str, raw_response: str) -> str:
+    new_content = extract_patch_text(raw_response)
+    if not new_content or new_content == content.strip():
+        return content
+    return new_content + ("\n" if content.endswith("\n") else "")
+
+
+WHOLE = register_edit_format(EditFormat(
+    name="whole",
+    instructions=(
+        "You are strictly forbidden from outputting conversational text.\n"
+        "You must output the COMPLETE updated content of the file above, with the user task applied.\n"
+        "Keep every line that does not need to change exactly as it is.\n"
+    ),
+    reminder="Output ONLY the complete updated file inside a single code block.",
+    apply=apply_whole_file,
+    rewrites_file=True,
+    complete=fenced_block_closed,
+))
+
+
+# --- Search/replace operations (structured output) --------------------------
+
+SEARCH_REPLACE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "edits": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "anchor": {"type": "string"},
+                    "search": {"type": "string"},
+                    "replace": {"type": "string"},
+                },
+                "required": ["anchor", "search", "replace"],
+            },
+        },
+    },
+    "required": ["edits"],
+}
+
+
+def _find_line(lines: List[str], needle: str, start: int = 0) -> int:
+    needle = needle.strip()
+    if not needle:
+        return -1
+    for i in range(start, len(lines)):
+        if lines[i].strip() == needle:
+            return i
+    for i in range(start, len(lines)):
+        if needle in lines[i]:
+            return i
+    return -1
+
+
+def _find_block(lines: List[str], block: List[str], start: int) -> int:
+    """
+    Index of the first line of `block` in `lines` at or after `start`,
+    comparing lines with surrounding whitespace ignored.
+    """
+    wanted = [l.strip() for l in block]
+    n = len(wanted)
+    for i in range(start, len(lines) - n + 1):
+        if [l.strip() for l in lines[i : i + n]] == wanted:
+            return i
+    return -1
+
+
+def apply_search_replace(content: str, ops: List[dict]) -> str:
+    """
+    Applies {anchor, search, replace} operations in order. `anchor` is a
+    line at or before the change that disambiguates repeated code; an
+    empty `search` inserts `replace` right after the anchor line.
+    """
+    if not ops:
+        return content
+
+    lines = content.splitlines()
+    for op in ops:
+        anchor = _text_field(op, "anchor")
+        search = _text_field(op, "search").strip("\n").splitlines()
+        replace = _text_field(op, "replace").strip("\n").splitlines()
+
+        anchor_index = _find_line(lines, anchor)
+        if not search:
+            if anchor_index == -1:
+                raise PatchError(f"Anchor not found: {anchor!r}")
+            lines[anchor_index + 1 : anchor_index + 1] = replace
+            continue
+
+        start = _find_block(lines, search, max(anchor_index, 0))
+        if start == -1:
+            start = _find_block(lines, search, 0)
+        if start == -1:
+            raise PatchError(f"Search text not found: {search[0]!r}")
+        lines[start : start + len(search)] = replace
+
+    return "\n".join(lines) + ("\n" if content.endswith("\n") else "")
+
+
+def _apply_search_replace_response(content: str, raw_response: str) -> str:
+    return apply_search_replace(content, _edit_ops(raw_response))
+
+
+SEARCH_REPLACE = register_edit_format(EditFormat(
+    name="search-replace",
+    instructions=(
+        "Answer ONLY with JSON.\n"
+        "Express the change as a list of edits. Each edit has:\n"
+        '- "anchor": one line copied from the file at or just above the change (used to locate it)\n'
+        '- "search": the exact lines to replace, copied from the file (empty to insert after the anchor)\n'
+        '- "replace": the new lines\n'
+        "Keep each search block as short as possible while still unique.\n"
+    ),
+    reminder='Output ONLY the JSON object {"edits": [...]}.',
+    apply=_apply_search_replace_response,
+    schema=SEARCH_REPLACE_SCHEMA,
+))
+
+
+# --- Line-addressed replacements on a numbered view -------------------------
+
+LINE_TAG_LENGTH = 3
+
+
+def line_tags(lines: List[str]) -> List[str]:
+    """
+    Short hash shown next to each line number. Each tag hashes its line
+    together with the tag above it, so it covers every line up to its own.
+    An edit must quote the tags of its first and last line: a change
+    anywhere in the range (or above it) changes the last tag, and edits
+    computed against stale or misremembered line numbers are rejected
+    instead of misapplied.
+    """
+    tags, tag = [], ""
+    for line in lines:
+        tag = hashlib.sha1(f"{tag}\n{line.strip()}".encode("utf-8")).hexdigest()[:LINE_TAG_LENGTH]
+        tags.append(tag)
+    return tags
+
+
+def number_lines(content: str) -> str:
+    """
+    Renders `content` as '  12 3fa| code' lines for line-addressed edits.
+    """
+    lines = content.splitlines()
+    return "\n".join(f"{i:4} {tag}| {line}" for i, (tag, line) in enumerate(zip(line_tags(lines), lines), 1))
+
+
+LINES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "edits": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "start": {"type": "integer"},
+                    "end": {"type": "integer"},
+                    "start_tag": {"type": "string"},
+                    "end_tag": {"type": "string"},
+                    "replace": {"type": "string"},
+                },
+                "required": ["start", "end", "start_tag", "end_tag", "replace"],
+            },
+        },
+    },
+    "required": ["edits"],
+}
+
+
+def apply_line_edits(content: str, ops: List[dict]) -> str:
+    """
+    Replaces lines start..end (1-based, inclusive) with `replace` for each
+    operation. Operations are applied bottom-up so earlier line numbers
+    stay valid; overlapping or stale ranges raise PatchError.
+    """
+    if not ops:
+        return content
+
+    lines = content.splitlines()
+    tags = line_tags(lines)
+    try:
+        ranges = sorted(((int(op["start"]), int(op["end"]), op) for op in ops), key=lambda r: r[0], reverse=True)
+    except (KeyError, TypeError, ValueError):
+        raise PatchError("Line edit without a valid start/end.") from None
+
+    previous_start = len(lines) + 1
+    for start, end, op in ranges:
+        if not 1 <= start <= end <= len(lines):
+            raise PatchError(f"Line range {start}-{end} is outside the file (1-{len(lines)}).")
+        if end >= previous_start:
+            raise PatchError(f"Line range {start}-{end} overlaps another edit.")
+        if op.get("start_tag") != tags[start - 1] or op.get("end_tag") != tags[end - 1]:
+            raise PatchError(f"Lines {start}-{end} do not match their tags; the line numbers are stale.")
+        lines[start - 1 : end] = _text_field(op, "replace").strip("\n").splitlines()
+        previous_start = start
+
+    return "\n".join(lines) + ("\n" if content.endswith("\n") else "")
+
+
+def _apply_line_edits_response(content: str, raw_response: str) -> str:
+    return apply_line_edits(content, _edit_ops(raw_response))
+
+
+LINES = register_edit_format(EditFormat(
+    name="lines",
+    instructions=(
+        "Answer ONLY with JSON.\n"
+        "The file is shown with a line number and a 3-character tag before each line ('  12 3fa| code').\n"
+        "Express the change as a list of edits, each replacing a range of lines:\n"
+        '- "start", "end": first and last line number to replace (inclusive)\n'
+        '- "start_tag", "end_tag": the tags shown on those two lines\n'
+        '- "replace": the new lines, without numbers or tags (empty to delete)\n'
+        "To insert code, replace a neighbouring line with itself plus the new lines.\n"
+    ),
+    reminder='Output ONLY the JSON object {"edits": [...]}.',
+    apply=_apply_line_edits_response,
+    schema=LINES_SCHEMA,
+    view=number_lines,
+))
+
+
+# --- Whole-symbol replacements located with ast -----------------------------
+
+SYMBOL_INDENT = 4  # Indentation of members added to a class
+
+SYMBOL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "edits": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "symbol": {"type": "string"},
+                    "code": {"type": "string"},
+                },
+                "required": ["symbol", "code"],
+            },
+        },
+    },
+    "required": ["edits"],
+}
+
+
+def _reindent(code: str, indent: int) -> List[str]:
+    return textwrap.indent(textwrap.dedent(code.strip("\n")), " " * indent).splitlines()
+
+
+def apply_symbol_edits(content: str, ops: List[dict]) -> str:
+    """
+    Replaces each named symbol ('name' or 'ClassName.method') with `code`,
+    using the line ranges from the file's ast. A symbol that does not exist
+    yet is appended to its class, or to the end of the file.
+    """
+    if not ops:
+        return content
+
+    try:
+        symbols = get_symbol_ranges(ast.parse(content))
+    except SyntaxError as e:
+        raise PatchError(f"Cannot locate symbols, the file does not parse: {e}") from None
+
+    lines = content.splitlines()
+    splices = []  # (first index, end index, op number, new lines), 0-based half-open
+    for op in ops:
+        name, code = _text_field(op, "symbol").strip(), _text_field(op, "code")
+        if not name or not code.strip():
+            raise PatchError("Symbol edit without a symbol name or code.")
+        if name in symbols:
+            symbol = symbols[name]
+            splices.append((symbol.start - 1, symbol.end, len(splices), _reindent(code, symbol.indent)))
+            continue
+        parent = name.rpartition(".")[0]
+        owner = symbols.get(parent)
+        if not parent:
+            splices.append((len(lines), len(lines), len(splices), ["", ""] + _reindent(code, 0)))
+        elif owner and owner.kind == "class":
+            splices.append((owner.end, owner.end, len(splices), [""] + _reindent(code, owner.indent + SYMBOL_INDENT)))
+        else:
+            raise PatchError(f"Symbol not found: {name}")
+
+    # Bottom-up, so the earlier ranges stay valid. Symbols appended at the
+    # same place are inserted last one first, which keeps them in order.
+    splices.sort(key=lambda s: s[:3], reverse=True)
+    previous_start = len(lines) + 1
+    for first, end, _, new_lines in splices:
+        if end > previous_start:
+            raise PatchError("Symbol edits overlap.")
+        lines[first:end] = new_lines
+        previous_start = first
+
+    return "\n".join(lines) + ("\n" if content.endswith("\n") else "")
+
+
+def _apply_symbol_edits_response(content: str, raw_response: str) -> str:
+    return apply_symbol_edits(content, _edit_ops(raw_response))
+
+
+SYMBOL = register_edit_format(EditFormat(
+    name="symbol",
+    instructions=(
+        "Answer ONLY with JSON.\n"
+        "Express the change as a list of edits, each rewriting one whole function, method or class:\n"
+        '- "symbol": its name, e.g. "parse" for a top-level function or "Parser.parse" for a method\n'
+        '- "code": its complete new source, including decorators and the def/class line\n'
+        "A symbol that does not exist yet is added to its class, or to the end of the file.\n"
+        "Only include the symbols you change.\n"
+    ),
+    reminder='Output ONLY the JSON object {"edits": [...]}.',
+    apply=_apply_symbol_edits_response,
+    schema=SYMBOL_SCHEMA,
+    python_only=True,
+))
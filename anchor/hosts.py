@@ -0,0 +1,229 @@
+"""
+Load balancing across several Ollama servers.
+
+OLLAMA_HOST may list several comma-separated URLs. Each request goes to the
+healthy host with the fewest outstanding requests, preferring hosts that
+already have the requested model loaded. Hosts that keep failing are
+ejected for a while and only re-admitted after a successful health check.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set
+
+import requests
+
+from anchor.backends import Backend, OllamaBackend, select_backend, split_scheme
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+
+EJECT_AFTER_FAILURES = 3
+EJECT_SECONDS = 30.0
+LOADED_MODELS_TTL = 10.0  # How long a loaded-models answer (/api/ps) is trusted
+HEALTH_TIMEOUT = 2.0
+LATENCY_SMOOTHING = 0.3  # Weight of the newest sample in the moving average
+# A host without the model loaded has to swap it in first, which costs about
+# as much as waiting behind this many requests on a host that has it.
+UNLOADED_PENALTY = 2
+
+
+def parse_hosts(value: str) -> List[str]:
+    """
+    Splits a comma-separated OLLAMA_HOST value into base URLs.
+    """
+    hosts = []
+    for host in value.split(","):
+        host = split_scheme(host.strip())[1].rstrip("/")  # Drop a backend prefix ('openai+http://')
+        if not host:
+            continue
+        if "://" not in host:
+            host = f"http://{host}"
+        hosts.append(host)
+    return hosts
+
+
+def normalize_model(name: str) -> str:
+    return name if ":" in name else f"{name}:latest"
+
+
+@dataclass
+class HostState:
+    """Live bookkeeping for one Ollama server."""
+
+    url: str
+    outstanding: int = 0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    latency_ms: Optional[float] = None
+    loaded_models: Set[str] = field(default_factory=set)
+    model_info: Dict[str, dict] = field(default_factory=dict)  # /api/ps entry per loaded model
+    models_checked_at: float = 0.0
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until > time.monotonic()
+
+
+class HostPool:
+    """
+    Thread-safe selection of the least busy healthy host.
+    """
+
+    def __init__(self, urls: Sequence[str], session: requests.Session = None, backend: Backend = None):
+        self.hosts = [HostState(url=url) for url in urls]
+        self.session = session or requests.Session()
+        self.backend = backend or OllamaBackend()  # Every host in a pool speaks the same API
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.hosts)
+
+    def refresh_loaded_models(self, host: HostState):
+        """
+        Asks the host which models it currently holds in memory, and how
+        much memory each one uses.
+        """
+        try:
+            response = self.session.get(f"{host.url}{self.backend.models_path}", timeout=HEALTH_TIMEOUT)
+            response.raise_for_status()
+            loaded = self.backend.parse_models(response.json())
+            host.model_info = {normalize_model(name): info for name, info in loaded.items()}
+        except (requests.exceptions.RequestException, ValueError):
+            host.model_info = {}
+        host.loaded_models = set(host.model_info)
+        host.models_checked_at = time.monotonic()
+
+    def check_health(self, host: HostState) -> bool:
+        """
+        Probes the host and re-admits or ejects it accordingly.
+        """
+        started = time.monotonic()
+        try:
+            self.session.get(f"{host.url}{self.backend.health_path}", timeout=HEALTH_TIMEOUT).raise_for_status()
+        except requests.exceptions.RequestException:
+            with self._lock:
+                host.ejected_until = time.monotonic() + EJECT_SECONDS
+            return False
+        with self._lock:
+            host.consecutive_failures = 0
+            host.ejected_until = 0.0
+            self._record_latency(host, (time.monotonic() - started) * 1000)
+        return True
+
+    def _candidates(self, exclude: Sequence[HostState]) -> List[HostState]:
+        hosts = [h for h in self.hosts if h not in exclude] or self.hosts
+        healthy = [h for h in hosts if not h.ejected]
+        if healthy:
+            return healthy
+        # Everything is ejected: give the hosts whose ejection ran out a
+        # chance, but only after they pass a health check.
+        recovered = [h for h in hosts if self.check_health(h)]
+        return recovered or hosts
+
+    def _probe(self, exclude: Sequence[HostState]) -> List[HostState]:
+        """
+        The hosts a request may go to, after the blocking HTTP probes:
+        health checks of ejected hosts and stale loaded-model lists.
+        """
+        if len(self.hosts) == 1:
+            return self.hosts
+        candidates = self._candidates(exclude)
+        now = time.monotonic()
+        for host in candidates:
+            if now - host.models_checked_at > LOADED_MODELS_TTL:
+                self.refresh_loaded_models(host)
+        return candidates
+
+    def _take(self, model: str, candidates: List[HostState]) -> HostState:
+        wanted = normalize_model(model)
+        host = min(
+            candidates,
+            key=lambda h: (
+                h.outstanding + (0 if wanted in h.loaded_models else UNLOADED_PENALTY),
+                h.latency_ms if h.latency_ms is not None else 0.0,
+            ),
+        )
+        with self._lock:
+            host.outstanding += 1
+            host.requests += 1
+        return host
+
+    def acquire(self, model: str, exclude: Sequence[HostState] = ()) -> HostState:
+        """
+        Picks a host for a request and counts it as outstanding until
+        release() is called.
+        """
+        return self._take(model, self._probe(exclude))
+
+    async def aacquire(self, model: str, exclude: Sequence[HostState] = ()) -> HostState:
+        """
+        acquire() for the event loop: the probes run in a worker thread, so
+        other requests keep streaming while a host is being checked.
+        """
+        candidates = self.hosts if len(self.hosts) == 1 else await asyncio.to_thread(self._probe, exclude)
+        return self._take(model, candidates)
+
+    def release(self, host: HostState, ok: bool = True, latency_ms: float = None, model: str = None):
+        """
+        Marks a request as finished. `latency_ms` is the time until the
+        host started responding. Failures count towards ejection.
+        """
+        with self._lock:
+            host.outstanding = max(host.outstanding - 1, 0)
+            if ok:
+                host.consecutive_failures = 0
+                if model:
+                    # Serving the request loaded the model there
+                    host.loaded_models.add(normalize_model(model))
+                if latency_ms is not None:
+                    self._record_latency(host, latency_ms)
+            else:
+                host.failures += 1
+                host.consecutive_failures += 1
+                if host.consecutive_failures >= EJECT_AFTER_FAILURES and len(self.hosts) > 1:
+                    host.ejected_until = time.monotonic() + EJECT_SECONDS
+
+    @staticmethod
+    def _record_latency(host: HostState, latency_ms: float):
+        if host.latency_ms is None:
+            host.latency_ms = latency_ms
+        else:
+            host.latency_ms += LATENCY_SMOOTHING * (latency_ms - host.latency_ms)
+
+    def report(self) -> List[Dict]:
+        """
+        Per-host status rows for display.
+        """
+        return [
+            {
+                "url": h.url,
+                "healthy": not h.ejected,
+                "outstanding": h.outstanding,
+                "requests": h.requests,
+                "failures": h.failures,
+                "latency_ms": h.latency_ms,
+                "loaded_models": sorted(h.loaded_models),
+            }
+            for h in self.hosts
+        ]
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_host_pool(session: requests.Session = None) -> HostPool:
+    """
+    The process-wide pool for OLLAMA_HOST, shared so every client sees the
+    same outstanding-request counts.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HostPool(parse_hosts(OLLAMA_HOST), session=session, backend=select_backend(OLLAMA_HOST))
+        return _default_pool
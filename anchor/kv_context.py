@@ -0,0 +1,40 @@
+"""
+Persistence for Ollama KV `context` arrays.
+
+/api/generate returns the token ids it evaluated as `context`. Sending them
+back with a later request lets Ollama match the prefix it already holds in
+its KV cache instead of re-tokenizing and re-prefilling it. Anchor stores
+the context of each long, stable prompt prefix (instructions, repo map and
+file) so retries and follow-up edits to the same file start decoding sooner.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+from anchor.cache import CACHE_TTL, ResponseCache
+
+KV_DIR = Path(".anchor/kv")
+KV_MAX_BYTES = int(float(os.getenv("ANCHOR_KV_MAX_MB", "64")) * 1024 * 1024)
+
+
+class ContextStore(ResponseCache):
+    """
+    Prefix-hash -> {context, prefill_ms, hits, saved_ms} entries, stored with
+    the same LRU/TTL policy as the response cache.
+    """
+
+    def __init__(self, cache_dir: Path = KV_DIR, max_bytes: int = KV_MAX_BYTES, ttl: float = CACHE_TTL):
+        super().__init__(cache_dir=cache_dir, max_bytes=max_bytes, ttl=ttl)
+
+    def prefix_key(self, model: str, prefix: str, num_ctx: int) -> str:
+        return self.make_key("prefix", {"model": model, "prompt": prefix, "num_ctx": num_ctx})
+
+    def lookup(self, key: str) -> Optional[dict]:
+        entry = self.get(key)
+        return entry if isinstance(entry, dict) and entry.get("context") else None
+
+    def record_hit(self, key: str, entry: dict, saved_ms: float):
+        entry["hits"] = entry.get("hits", 0) + 1
+        entry["saved_ms"] = entry.get("saved_ms", 0.0) + saved_ms
+        self.put(key, entry)
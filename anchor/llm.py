@@ -1,108 +1,740 @@
 import requests
-import json
 import os
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from anchor.budget import context_window_for, estimate_tokens
+from anchor.hosts import OLLAMA_HOST, HostPool, get_host_pool
+from anchor.profiles import ProfileStore
+
+# Connection pool defaults. Overridable per client or through the environment.
+POOL_SIZE = int(os.getenv("ANCHOR_POOL_SIZE", "4"))
+MAX_RETRIES = int(os.getenv("ANCHOR_MAX_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("ANCHOR_RETRY_BACKOFF", "0.3"))
+HTTP_KEEP_ALIVE = os.getenv("ANCHOR_HTTP_KEEP_ALIVE", "1") != "0"
+
+# How long Ollama keeps the model in memory after a request ("5m", "1h",
+# "-1" to pin it, "0" to unload immediately). None uses the server default.
+KEEP_ALIVE = os.getenv("ANCHOR_KEEP_ALIVE") or None
+
+# A model that keeps going after its answer would start a new turn with the
+# prompt's own marker (mostly with raw prompts, which have no chat template)
+GENERATE_STOP = ["\nUser Task:"]
+
+# Output budget for generations that continue past num_predict (see
+# stream_generate), counted over the first request and all continuations
+MAX_OUTPUT_TOKENS = int(os.getenv("ANCHOR_MAX_OUTPUT_TOKENS", "16384"))
+# Times a dropped stream is resumed from its partial output before giving up
+MAX_RESUMES = int(os.getenv("ANCHOR_MAX_RESUMES", "3"))
+
+# Request lifecycle, in seconds. The idle timeout is the longest silence
+# tolerated while waiting for data, which includes model load and prefill
+# before the first token. The request timeout is a deadline for a whole
+# request; 0 disables it.
+CONNECT_TIMEOUT = float(os.getenv("ANCHOR_CONNECT_TIMEOUT", "5"))
+IDLE_TIMEOUT = float(os.getenv("ANCHOR_IDLE_TIMEOUT", "300"))
+REQUEST_TIMEOUT = float(os.getenv("ANCHOR_REQUEST_TIMEOUT", "900"))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(
+    pool_size: int = POOL_SIZE,
+    max_retries: int = MAX_RETRIES,
+    backoff_factor: float = RETRY_BACKOFF,
+    http_keep_alive: bool = HTTP_KEEP_ALIVE,
+) -> requests.Session:
+    """
+    Returns the process-wide HTTP session for the given pool settings.
+    Clients created with the same settings share one connection pool, so
+    consecutive calls reuse an open TCP connection instead of reconnecting.
+    """
+    key = (pool_size, max_retries, backoff_factor, http_keep_alive)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            # Only retry failures that happen before Ollama starts generating:
+            # connection errors and "server busy" statuses. Never retry reads,
+            # otherwise a half-streamed response would be generated twice.
+            retry = Retry(
+                total=max_retries,
+                connect=max_retries,
+                read=0,
+                status=max_retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=None,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                max_retries=retry,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            if not http_keep_alive:
+                session.headers["Connection"] = "close"
+            _sessions[key] = session
+        return session
+
+
+def _parse_keep_alive(value):
+    """
+    Ollama accepts durations ("10m") or plain numbers of seconds; numbers
+    must be sent as JSON numbers, so "-1" and "0" are converted.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _raise_for_ollama_error(response: requests.Response, label: str = "Ollama"):
+    """
+    Turns a non-200 Ollama response into a RuntimeError with a helpful hint.
+    Other backends' errors ({"error": {"message": ...}}) are handled too.
+    """
+    if response.status_code == 200:
+        return
+    try:
+        error_msg = response.json().get("error", "Unknown error")
+        if isinstance(error_msg, dict):
+            error_msg = error_msg.get("message", "Unknown error")
+    except Exception:
+        error_msg = response.text
+
+    hint = ""
+    if "memory" in error_msg.lower():
+        hint = "\nHint: Your system may not have enough RAM for this model. Try a smaller model like 'deepseek-coder:1.3b'."
+
+    raise RuntimeError(f"{label} Error: {error_msg}{hint}")
+
+
+class RequestTimeout(RuntimeError):
+    """A request missed its deadline or the server went silent."""
+
+
+class ConnectionLost(RuntimeError):
+    """No host could be reached, or the connection dropped mid-stream."""
+
+
+def _is_read_timeout(error: Exception) -> bool:
+    # requests reports a read timeout in the middle of a stream as a ConnectionError
+    if isinstance(error, requests.exceptions.ReadTimeout):
+        return True
+    return any(isinstance(arg, ReadTimeoutError) for arg in error.args)
 
-OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 
 class LLMClient:
-    def __init__(self, model="codellama"):
+    def __init__(
+        self,
+        model="codellama",
+        session: requests.Session = None,
+        pool_size: int = POOL_SIZE,
+        max_retries: int = MAX_RETRIES,
+        http_keep_alive: bool = HTTP_KEEP_ALIVE,
+        cache=None,
+        keep_alive: str = KEEP_ALIVE,
+        unload_on_close: bool = False,
+        context_store=None,
+        hosts: HostPool = None,
+        profiles: ProfileStore = None,
+        use_profile: bool = True,
+        timeout: float = REQUEST_TIMEOUT,
+        idle_timeout: float = IDLE_TIMEOUT,
+        connect_timeout: float = CONNECT_TIMEOUT,
+    ):
         self.model = model
-        self.api_url = f"{OLLAMA_HOST}/api/generate"
-        self.chat_url = f"{OLLAMA_HOST}/api/chat"
+        self.cache = cache  # Optional ResponseCache
+        self.context_store = context_store  # Optional ContextStore
+        self.keep_alive = keep_alive
+        self.unload_on_close = unload_on_close
+        self.last_metrics = {}  # Timings and counts of the last completed request
+        self.prefill_saved_ms = 0.0  # Prefill time skipped by reusing KV context
+        self.session = session or get_session(
+            pool_size=pool_size,
+            max_retries=max_retries,
+            http_keep_alive=http_keep_alive,
+        )
+        self.hosts = hosts or get_host_pool(self.session)
+        # Runner options from `anchor tune`, looked up per request because
+        # the model can be swapped after construction
+        self.profiles = (profiles or ProfileStore()) if use_profile else None
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+
+    @property
+    def backend(self):
+        return self.hosts.backend
+
+    @property
+    def _reuses_context(self) -> bool:
+        return self.context_store is not None and self.backend.supports_context
 
-    def stream_generate(self, system_prompt: str, user_prompt: str):
+    def _deadline(self):
+        return time.monotonic() + self.timeout if self.timeout else None
+
+    def _read_timeout(self, stream: bool, deadline):
         """
-        Generates a streaming response from the local Ollama instance.
-        Yields tokens as they arrive.
+        Socket read timeout: the idle timeout for streams, the time left
+        until the deadline for everything else (whichever is shorter).
+        """
+        limit = self.idle_timeout if stream else None
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0.001)
+            limit = remaining if limit is None else min(limit, remaining)
+        return limit
+
+    def _timeout_error(self, host, seconds: float) -> RequestTimeout:
+        return RequestTimeout(f"{self.backend.label} at {host.url} did not respond within {seconds:.0f}s.")
+
+    def _send(self, endpoint: str, payload: dict, stream: bool = False, deadline=None):
+        """
+        Sends a "generate" or "chat" request to the best available host,
+        failing over to the next one on connection errors. Returns
+        (host, response, latency_ms); the caller must release the host
+        once the response is consumed.
+        """
+        path, body = self.backend.request(endpoint, payload)
+        tried = []
+        while True:
+            host = self.hosts.acquire(self.model, exclude=tried)
+            started = time.monotonic()
+            read_timeout = self._read_timeout(stream, deadline)
+            try:
+                response = self.session.post(
+                    f"{host.url}{path}", json=body, stream=stream, timeout=(self.connect_timeout, read_timeout)
+                )
+                return host, response, (time.monotonic() - started) * 1000
+            except requests.exceptions.RequestException as e:
+                self.hosts.release(host, ok=False)
+                if _is_read_timeout(e):
+                    # Connected but wedged: another host would only repeat the wait
+                    raise self._timeout_error(host, read_timeout) from e
+                tried.append(host)
+                if len(tried) >= len(self.hosts):
+                    raise ConnectionLost(f"Failed to connect to {self.backend.label} at {host.url}. Is it running?") from e
+
+    def _post(self, endpoint: str, payload: dict) -> dict:
+        """
+        Sends a non-streaming request and returns the normalized response.
+        """
+        host, response, latency_ms = self._send(endpoint, payload, deadline=self._deadline())
+        self.hosts.release(host, ok=response.status_code < 500, latency_ms=latency_ms, model=self.model)
+        _raise_for_ollama_error(response, self.backend.label)
+        return self.backend.parse(endpoint, response.json())
+
+    def _stream(self, endpoint: str, payload: dict):
+        """
+        Yields normalized chunks from a streaming request and closes the
+        response once the stream ends, the consumer stops (including on
+        Ctrl-C) or the deadline passes. Closing the connection is what makes
+        the server stop decoding.
         """
+        deadline = self._deadline()
+        host, response, latency_ms = self._send(endpoint, payload, stream=True, deadline=deadline)
+        parser = self.backend.stream_parser(endpoint)
+        dropped = False
+
+        def chunks():
+            for line in response.iter_lines():
+                yield from parser.feed(line)
+            yield from parser.close()
+
+        try:
+            _raise_for_ollama_error(response, self.backend.label)
+
+            for chunk in chunks():
+                yield chunk
+                if chunk.get("done"):
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    raise RequestTimeout(f"Request to {host.url} exceeded its {self.timeout:.0f}s deadline.")
+        except requests.exceptions.RequestException as e:
+            dropped = True
+            if _is_read_timeout(e):
+                raise self._timeout_error(host, self.idle_timeout) from e
+            raise ConnectionLost(f"Failed to connect to {self.backend.label} at {host.url}. Is it running?") from e
+        finally:
+            response.close()
+            ok = not dropped and response.status_code < 500
+            self.hosts.release(host, ok=ok, latency_ms=latency_ms, model=self.model)
+
+    def _with_keep_alive(self, payload: dict) -> dict:
+        if self.keep_alive is not None:
+            payload["keep_alive"] = _parse_keep_alive(self.keep_alive)
+        return payload
+
+    def _profile_options(self) -> dict:
+        return self.profiles.options(self.model) if self.profiles is not None else {}
+
+    def _generate_payload(
+        self, system_prompt: str, user_prompt: str, stream: bool, options: dict = None, format: dict = None
+    ) -> dict:
+        prompt = f"{system_prompt}\n\nUser Task: {user_prompt}"
+        request_options = {
+            "temperature": 0.2, # Low temperature for more deterministic code
+            "num_predict": 4096, # Higher limit for full file generation
+            "stop": GENERATE_STOP,
+        }
+        request_options.update(self._profile_options())
+        request_options.update(options or {})
+        # Size the context window to the prompt so Ollama never truncates it
+        request_options.setdefault(
+            "num_ctx", context_window_for(estimate_tokens(prompt) + request_options["num_predict"])
+        )
         payload = {
             "model": self.model,
-            "prompt": f"{system_prompt}\n\nUser Task: {user_prompt}",
-            "stream": True,
-            "options": {
-                "temperature": 0.2,
-                "num_predict": 4096
-            }
+            "prompt": prompt,
+            "stream": stream,
+            "options": request_options,
         }
+        if format is not None:
+            # JSON schema for Ollama's structured outputs
+            payload["format"] = format
+        return self._with_keep_alive(payload)
 
-        try:
-            response = requests.post(self.api_url, json=payload, stream=True)
-            if response.status_code != 200:
-                raise RuntimeError(f"Ollama Error: {response.text}")
+    def _chat_payload(self, messages: list, stream: bool, options: dict = None, format: dict = None) -> dict:
+        request_options = {
+            "temperature": 0.7, # Slightly higher for discussion
+            "num_predict": 2048
+        }
+        request_options.update(self._profile_options())
+        request_options.update(options or {})
+        # A few extra tokens per message for the chat template's role markers
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) + 4 for m in messages)
+        request_options.setdefault(
+            "num_ctx", context_window_for(prompt_tokens + request_options["num_predict"])
+        )
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": stream,
+            "options": request_options,
+        }
+        if format is not None:
+            payload["format"] = format
+        return self._with_keep_alive(payload)
 
-            for line in response.iter_lines():
-                if line:
-                    chunk = json.loads(line)
-                    if "response" in chunk:
-                        yield chunk["response"]
-                    if chunk.get("done"):
-                        break
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Failed to connect to Ollama at {OLLAMA_HOST}. Is it running?") from e
+    def _cache_key(self, endpoint: str, payload: dict):
+        if self.cache is None:
+            return None
+        return self.cache.make_key(endpoint, payload)
 
-    def generate(self, system_prompt: str, user_prompt: str) -> str:
+    def _cached_stream(self, key, deltas, cache_if=None):
         """
-        Generates a response from the local Ollama instance (legacy generate endpoint).
+        Serves a stream from the cache when possible, otherwise passes the
+        deltas through and stores the full text once the stream completes
+        (and cache_if, if given, accepts it).
         """
-        payload = {
-            "model": self.model,
-            "prompt": f"{system_prompt}\n\nUser Task: {user_prompt}",
-            "stream": False,
-            "options": {
-                "temperature": 0.2, # Low temperature for more deterministic code
-                "num_predict": 4096 # Higher limit for full file generation
-            }
+        if key is None:
+            yield from deltas
+            return
+
+        cached = self.cache.get(key, cache_if)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        for delta in deltas:
+            parts.append(delta)
+            yield delta
+        # Only reached when the stream ran to completion.
+        text = "".join(parts)
+        if cache_if is None or cache_if(text):
+            self.cache.put(key, text)
+
+    def _record_metrics(self, data: dict):
+        self.last_metrics = {
+            k: v for k, v in data.items() if k not in ("response", "context", "message")
         }
-        
+
+    @property
+    def last_load_seconds(self) -> float:
+        """
+        Time the last request spent waiting for Ollama to load the model.
+        """
+        return self.last_metrics.get("load_duration", 0) / 1e9
+
+    def loaded_models(self) -> dict:
+        """
+        Models currently in memory on any host (per /api/ps), by name, with
+        their size, VRAM use and the host holding them.
+        """
+        models = {}
+        for host in self.hosts.hosts:
+            self.hosts.refresh_loaded_models(host)
+            for name, info in host.model_info.items():
+                models.setdefault(name, dict(info, host=host.url))
+        return models
+
+    def _prefix_request(self, payload: dict, system_prompt: str):
+        """
+        Rewrites a raw generate payload to send only the task, with the
+        system prompt supplied as a stored KV context. The first time a
+        prefix is seen it is prefilled once and its context saved.
+        Returns the payload to send and the (key, entry) that was reused.
+        """
+        prefix = f"{system_prompt}\n\n"
+        key = self.context_store.prefix_key(self.model, prefix, payload["options"]["num_ctx"])
+        entry = self.context_store.lookup(key)
+
+        if entry is None:
+            prefill = self._with_keep_alive({
+                "model": self.model,
+                "prompt": prefix,
+                "raw": True,
+                "stream": False,
+                "options": {**payload["options"], "num_predict": 1},
+            })
+            data = self._post("generate", prefill)
+            context = data.get("context")
+            if not context:
+                return payload, None
+            # Drop the token generated by the prefill request itself
+            entry = {
+                "context": context[: len(context) - data.get("eval_count", 0)],
+                "prefill_ms": data.get("prompt_eval_duration", 0) / 1e6,
+                "hits": 0,
+                "saved_ms": 0.0,
+            }
+            self.context_store.put(key, entry)
+            entry = dict(entry, fresh=True)
+
+        request = dict(payload, prompt=payload["prompt"][len(prefix):], context=entry["context"])
+        return request, (key, entry)
+
+    def _account_prefix_reuse(self, reuse, request: dict, data: dict):
+        """
+        Estimates the prefill time a reused context saved, from how many
+        prompt tokens Ollama actually had to evaluate.
+        """
+        if reuse is None:
+            return
+        key, entry = reuse
+        if entry.pop("fresh", False):
+            return  # We just paid for this prefix ourselves
+        if "prompt_eval_count" not in data:
+            return  # No server timings, e.g. a stream stopped early by until
+        prefix_tokens = len(entry["context"])
+        total_tokens = prefix_tokens + estimate_tokens(request["prompt"])
+        skipped = min(prefix_tokens, max(total_tokens - data.get("prompt_eval_count", total_tokens), 0))
+        saved_ms = skipped * entry.get("prefill_ms", 0.0) / max(prefix_tokens, 1)
+        self.prefill_saved_ms += saved_ms
+        self.context_store.record_hit(key, entry, saved_ms)
+
+    def _collect(self, endpoint: str, payload: dict, until):
+        """
+        Streams a request and stops reading as soon as until(text) holds,
+        which closes the connection so the server stops decoding tokens
+        that would be thrown away. `until` is checked whenever a line
+        completes. Returns (text, final chunk); an early stop gets a final
+        chunk with the timings measured here.
+        """
+        parts = []
+        started = time.monotonic()
+        chunks = self._stream(endpoint, dict(payload, stream=True))
         try:
-            response = requests.post(self.api_url, json=payload)
-            if response.status_code != 200:
+            for chunk in chunks:
+                delta = chunk.get("response") if endpoint == "generate" else chunk.get("message", {}).get("content")
+                if delta:
+                    parts.append(delta)
+                if chunk.get("done"):
+                    return "".join(parts), chunk
+                if delta and "\n" in delta and until("".join(parts)):
+                    return "".join(parts), {
+                        "done": True,
+                        "done_reason": "until",
+                        "eval_count": len(parts),
+                        "total_duration": int((time.monotonic() - started) * 1e9),
+                    }
+        finally:
+            chunks.close()
+        return "".join(parts), {}
+
+    def _continuation_tokens(self, payload: dict, request: dict, text: str, remaining: int) -> int:
+        """
+        num_predict for a continuation: the budget left, limited to the room
+        the prompt and the text so far leave in the context window (a longer
+        request would make Ollama cut the start of the prompt). 0 when full.
+        """
+        options = request["options"]
+        room = options["num_ctx"] - estimate_tokens(payload["prompt"]) - estimate_tokens(text)
+        return max(min(options["num_predict"], remaining, room), 0)
+
+    def _continues(self, request: dict) -> bool:
+        """
+        Whether an answer to `request` can be continued: a raw prompt can
+        always be extended, a partial assistant message only on backends
+        that finish it (OpenAI-compatible servers start a new reply).
+        """
+        return bool(request.get("raw")) or self.backend.continues_messages
+
+    def _continuation(self, payload: dict, request: dict, text: str, remaining: int):
+        """
+        (endpoint, request) that continues a generation cut off at
+        num_predict after producing `text`, or None when the backend cannot
+        continue it or the context window has no room left. A raw prompt is
+        simply extended, otherwise the text becomes a partial assistant
+        message for the model to finish. Either way the server finds the
+        prompt and the text so far in its KV cache and only decodes what is
+        new.
+        """
+        num_predict = self._continuation_tokens(payload, request, text, remaining)
+        if not num_predict or not self._continues(request):
+            return None
+        options = dict(request["options"], num_predict=num_predict)
+        if request.get("raw"):
+            return "generate", dict(request, prompt=request["prompt"] + text, options=options)
+        return "chat", self._with_keep_alive({
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": payload["prompt"]},
+                {"role": "assistant", "content": text},
+            ],
+            "stream": True,
+            "options": options,
+        })
+
+    @property
+    def truncated(self) -> bool:
+        """
+        Whether the last response stopped at the token limit.
+        """
+        return self.last_metrics.get("done_reason") == "length"
+
+    def stream_generate(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: dict = None,
+        format: dict = None,
+        max_total_tokens: int = None,
+        resume_from: str = "",
+        cache_if=None,
+    ):
+        """
+        Generates a streaming response from the local Ollama instance.
+        Yields tokens as they arrive. `options` overrides Ollama options
+        such as num_predict or num_ctx for this request.
+        With `max_total_tokens`, a response cut off at num_predict is
+        continued (and stitched into the same stream) until it finishes or
+        the budget is spent, or the prompt and output fill the context
+        window; `truncated` tells whether it finished.
+        A stream whose connection drops is resumed from the text received
+        so far. Both need a backend that can continue an answer. `resume_from` does the same for output saved by an earlier
+        process: it is sent back as the start of the answer and only the
+        rest is yielded. `cache_if(text)` decides whether the finished
+        response may be cached.
+        """
+        payload = self._generate_payload(system_prompt, user_prompt, stream=True, options=options, format=format)
+        if self._reuses_context:
+            payload["raw"] = True
+        if max_total_tokens:
+            prompt_tokens = estimate_tokens(payload["prompt"])
+            if "num_ctx" not in (options or {}):
+                # Room for every continuation, so they never resize (and reload) the context
+                payload["options"]["num_ctx"] = context_window_for(prompt_tokens + max_total_tokens)
+            # ... as far as the window goes: the prompt and all output must fit in it
+            max_total_tokens = max(min(max_total_tokens, payload["options"]["num_ctx"] - prompt_tokens), 1)
+            payload["options"]["num_predict"] = min(payload["options"]["num_predict"], max_total_tokens)
+
+        def deltas():
+            base, reuse = payload, None
+            if self._reuses_context:
+                base, reuse = self._prefix_request(payload, system_prompt)
+            budget = max_total_tokens or payload["options"]["num_predict"]
+            endpoint, request = "generate", base
+            parts, total, continuations, resumes = [], 0, 0, 0
+            if resume_from:
+                if not self._continues(base):
+                    raise RuntimeError(f"{self.backend.label} cannot continue a saved answer; it would start a new reply.")
+                parts.append(resume_from)
+                continuation = self._continuation(payload, base, resume_from, budget)
+                if continuation is None:
+                    # The saved text already fills the context window
+                    self._record_metrics({"done": True, "done_reason": "length", "eval_count": 0})
+                    return
+                endpoint, request = continuation
+            while True:
+                final, produced = {}, 0
                 try:
-                    error_msg = response.json().get("error", "Unknown error")
-                except Exception:
-                    error_msg = response.text
-                
-                hint = ""
-                if "memory" in error_msg.lower():
-                    hint = "\nHint: Your system may not have enough RAM for this model. Try a smaller model like 'deepseek-coder:1.3b'."
-                
-                raise RuntimeError(f"Ollama Error: {error_msg}{hint}")
-
-            response.raise_for_status()
-            return response.json().get("response", "")
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Failed to connect to Ollama at {OLLAMA_HOST}. Is it running?") from e
+                    for chunk in self._stream(endpoint, request):
+                        delta = chunk.get("response") if endpoint == "generate" else chunk.get("message", {}).get("content")
+                        if delta:
+                            produced += 1
+                            parts.append(delta)
+                            yield delta
+                        if chunk.get("done"):
+                            final = chunk
+                except ConnectionLost:
+                    # JSON output cannot be resumed: the schema applies from its first token
+                    if not parts or format is not None or resumes >= MAX_RESUMES:
+                        raise
+                    resumes += 1
+                    total += produced
+                    continuation = self._continuation(payload, base, "".join(parts), max(budget - total, 1))
+                    if continuation is None:
+                        raise
+                    time.sleep(RETRY_BACKOFF * 2 ** resumes)  # Give a restarting server a moment
+                    endpoint, request = continuation
+                    continue
+                total += final.get("eval_count", produced)
+                if continuations == 0 and not resumes:
+                    self._account_prefix_reuse(reuse, base, final)
+                if final.get("done_reason") != "length" or not max_total_tokens or not produced or total >= max_total_tokens:
+                    break
+                continuation = self._continuation(payload, base, "".join(parts), max_total_tokens - total)
+                if continuation is None:
+                    break  # No room left in the context window: reported as truncated
+                continuations += 1
+                endpoint, request = continuation
+            if final:
+                self._record_metrics(dict(final, eval_count=total, continuations=continuations, resumes=resumes))
+
+        # A resumed answer is only the tail of the real one: not worth caching
+        key = None if resume_from else self._cache_key("generate", payload)
+        yield from self._cached_stream(key, deltas(), cache_if)
 
-    def chat(self, messages: list) -> str:
+    def generate(
+        self, system_prompt: str, user_prompt: str, options: dict = None, format: dict = None, until=None, cache_if=None
+    ) -> str:
+        """
+        Generates a response from the local Ollama instance (legacy generate endpoint).
+        With a context_store, the system prompt is sent as a reusable KV context.
+        `format` is an optional JSON schema the response must follow.
+        `until(text)` ends the generation early once the answer is complete.
+        `cache_if(text)` decides whether the response may be cached.
+        """
+        payload = self._generate_payload(system_prompt, user_prompt, stream=False, options=options, format=format)
+        if self._reuses_context:
+            payload["raw"] = True
+
+        def compute():
+            request, reuse = payload, None
+            if self._reuses_context:
+                request, reuse = self._prefix_request(payload, system_prompt)
+            if until is not None:
+                text, data = self._collect("generate", request, until)
+            else:
+                data = self._post("generate", request)
+                text = data.get("response", "")
+            self._record_metrics(data)
+            self._account_prefix_reuse(reuse, request, data)
+            return text
+
+        key = self._cache_key("generate", payload)
+        return compute() if key is None else self.cache.get_or_compute(key, compute, cache_if)
+
+    def chat(self, messages: list, options: dict = None, format: dict = None, until=None, cache_if=None) -> str:
         """
         Sends a list of messages to the Ollama chat endpoint and returns the response.
         Messages should be a list of dictionaries with 'role' and 'content'.
+        `until(text)` ends the generation early once the answer is complete.
+        `cache_if(text)` decides whether the response may be cached.
         """
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "stream": False,
-            "options": {
-                "temperature": 0.7, # Slightly higher for discussion
-                "num_predict": 2048
-            }
-        }
+        payload = self._chat_payload(messages, stream=False, options=options, format=format)
 
-        try:
-            response = requests.post(self.chat_url, json=payload)
-            if response.status_code != 200:
-                try:
-                    error_msg = response.json().get("error", "Unknown error")
-                except Exception:
-                    error_msg = response.text
-                
-                hint = ""
-                if "memory" in error_msg.lower():
-                    hint = "\nHint: Your system may not have enough RAM for this model. Try a smaller model like 'deepseek-coder:1.3b'."
-                
-                raise RuntimeError(f"Ollama Error: {error_msg}{hint}")
-
-            response.raise_for_status()
-            return response.json().get("message", {}).get("content", "")
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Failed to connect to Ollama at {OLLAMA_HOST}. Is it running?") from e
+        def compute():
+            if until is not None:
+                text, data = self._collect("chat", payload, until)
+            else:
+                data = self._post("chat", payload)
+                text = data.get("message", {}).get("content", "")
+            self._record_metrics(data)
+            return text
+
+        key = self._cache_key("chat", payload)
+        return compute() if key is None else self.cache.get_or_compute(key, compute, cache_if)
+
+    def stream_chat(self, messages: list, options: dict = None, format: dict = None):
+        """
+        Streaming counterpart of chat().
+        Yields message content deltas as they arrive.
+        """
+        payload = self._chat_payload(messages, stream=True, options=options, format=format)
+
+        def deltas():
+            for chunk in self._stream("chat", payload):
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    self._record_metrics(chunk)
+
+        yield from self._cached_stream(self._cache_key("chat", payload), deltas())
+
+    def _warm_payload(self, keep_alive=None, num_ctx: int = None):
+        """
+        The empty generate request that loads (or with keep_alive=0
+        unloads) the model; None when the server manages its own model.
+        """
+        if not self.backend.manages_models:
+            return None  # The server loaded its model at startup
+        payload = {"model": self.model, "prompt": "", "stream": False}
+        # Loading with different runner options would force a reload later
+        options = self._profile_options()
+        if num_ctx:
+            options["num_ctx"] = num_ctx
+        if options:
+            payload["options"] = options
+        keep_alive = keep_alive if keep_alive is not None else self.keep_alive
+        if keep_alive is not None:
+            payload["keep_alive"] = _parse_keep_alive(keep_alive)
+        return payload
+
+    def warm(self, keep_alive=None, num_ctx: int = None) -> float:
+        """
+        Loads the model into memory without generating anything.
+        Pass the num_ctx the following requests will use: Ollama reloads
+        the model when it changes. Returns the load time reported by
+        Ollama, in seconds.
+        """
+        payload = self._warm_payload(keep_alive, num_ctx)
+        if payload is None:
+            return 0.0
+        return self._post("generate", payload).get("load_duration", 0) / 1e9
+
+    def warm_in_background(self, num_ctx: int = None) -> threading.Thread:
+        """
+        Starts loading the model on a daemon thread so it overlaps with
+        local work (e.g. building the repo map). Failures are ignored here;
+        the real request will report them.
+        """
+        def run():
+            try:
+                self.warm(num_ctx=num_ctx)
+            except RuntimeError:
+                pass
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def unload(self):
+        """
+        Asks Ollama to free the model's memory right away.
+        """
+        self.warm(keep_alive=0)
+
+    def close(self):
+        """
+        Applies the unload policy. Batch jobs that pinned the model with a
+        long keep_alive should set unload_on_close to release RAM at the end.
+        """
+        if self.unload_on_close:
+            self.unload()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,392 @@
+"""
+In-process inference with llama-cpp-python (optional: pip install llama-cpp-python).
+
+Passing a GGUF file as the model (`--model ./models/qwen2.5-coder-7b.gguf`)
+runs it inside the Anchor process: no server and no HTTP/JSON round trip per
+request. The stable prompt prefix (instructions, repo map and file) is
+prefilled on its own and the llama.cpp state is saved to .anchor/kv_states,
+keyed by a hash of the model file and the prefix text. The next edit to the
+same file content restores that state and only evaluates the task, so even
+a large file starts decoding almost immediately.
+"""
+
+import json
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from anchor.backends import Backend
+from anchor.budget import MAX_CONTEXT
+from anchor.cache import CACHE_TTL, ResponseCache
+from anchor.llm import LLMClient, RequestTimeout
+
+try:
+    import llama_cpp
+except ImportError:  # Optional dependency
+    llama_cpp = None
+
+STATE_DIR = Path(".anchor/kv_states")
+# States hold the KV cache itself (hundreds of MB for a long prompt on a 7B model)
+STATE_MAX_BYTES = int(float(os.getenv("ANCHOR_KV_STATE_MAX_MB", "4096")) * 1024 * 1024)
+# Shorter prefixes prefill faster than their state loads from disk
+SNAPSHOT_MIN_TOKENS = int(os.getenv("ANCHOR_KV_STATE_MIN_TOKENS", "512"))
+
+# Ollama runner option -> llama_cpp.Llama argument
+_RUNNER_ARGS = {"num_thread": "n_threads", "num_batch": "n_batch", "num_gpu": "n_gpu_layers"}
+
+# Loaded models, shared by every client in the process: (path, runner args) -> Llama
+_models: Dict[tuple, object] = {}
+# llama.cpp contexts are not thread-safe
+_llama_lock = threading.RLock()
+
+
+def is_gguf(model: str) -> bool:
+    return model.lower().endswith(".gguf")
+
+
+def _require_llama_cpp():
+    if llama_cpp is None:
+        raise RuntimeError(
+            "In-process inference needs llama-cpp-python.\n"
+            "Hint: pip install llama-cpp-python, or use an Ollama model name instead of a .gguf file."
+        )
+
+
+class StateStore(ResponseCache):
+    """
+    Prefix-hash -> {state, prefill_ms} entries (pickled llama.cpp states),
+    stored with the same LRU/TTL policy as the response cache.
+    """
+
+    suffix = ".state"
+
+    def __init__(self, cache_dir: Path = STATE_DIR, max_bytes: int = STATE_MAX_BYTES, ttl: float = CACHE_TTL):
+        super().__init__(cache_dir=cache_dir, max_bytes=max_bytes, ttl=ttl)
+
+    def prefix_key(self, model_path: str, prefix: str, n_ctx: int) -> str:
+        try:
+            stat = os.stat(model_path)
+            version = [stat.st_size, stat.st_mtime_ns]  # A replaced GGUF invalidates its states
+        except OSError:
+            version = None
+        return self.make_key("state", {"model": model_path, "version": version, "prompt": prefix, "num_ctx": n_ctx})
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path)  # Mark as most recently used
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, entry: dict):
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(dict(entry, created=time.time()), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._evict()
+
+
+class LocalBackend(Backend):
+    """Describes the in-process engine; requests never go over HTTP."""
+
+    name = "llamacpp"
+    label = "llama.cpp"
+    continues_messages = True  # The partial answer is appended to the rendered prompt
+
+
+def _shared_prefix(llm, tokens: List[int]) -> int:
+    """
+    Number of leading `tokens` already evaluated in llm's KV cache.
+    """
+    shared = 0
+    for cached, token in zip(llm.input_ids[: llm.n_tokens], tokens):
+        if cached != token:
+            break
+        shared += 1
+    return shared
+
+
+def _special_text(llm, token_id: int) -> str:
+    if token_id is None or token_id < 0:
+        return ""
+    return llm.detokenize([token_id], special=True).decode("utf-8", errors="ignore")
+
+
+def _split(text: str, prefix: str) -> Tuple[str, str]:
+    """
+    Splits `text` right after the first occurrence of `prefix`; ("", text)
+    when it does not occur.
+    """
+    index = text.find(prefix) if prefix else -1
+    if index < 0:
+        return "", text
+    cut = index + len(prefix)
+    return text[:cut], text[cut:]
+
+
+class LocalLLMClient(LLMClient):
+    """
+    LLMClient that runs a GGUF model in-process. Requests keep the Ollama
+    shape, so caching, metrics and streaming work as with a server.
+    """
+
+    def __init__(self, model: str, snapshots: StateStore = None, n_ctx: int = MAX_CONTEXT, **kwargs):
+        super().__init__(model=model, **kwargs)
+        self.n_ctx = n_ctx
+        # Snapshots follow the response cache (--no-cache disables both)
+        if snapshots is None and self.cache is not None:
+            snapshots = StateStore()
+        self.snapshots = snapshots
+        self._backend = LocalBackend()
+        self._load_seconds = 0.0
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def _reuses_context(self) -> bool:
+        return False  # Prefix reuse is handled by the state snapshots
+
+    def _runner_args(self) -> dict:
+        options = self._profile_options()
+        return {_RUNNER_ARGS[k]: v for k, v in options.items() if k in _RUNNER_ARGS}
+
+    def _model_key(self) -> tuple:
+        return (os.path.abspath(self.model), self.n_ctx, tuple(sorted(self._runner_args().items())))
+
+    def _load(self):
+        """
+        The Llama instance for this model, loaded on first use.
+        """
+        _require_llama_cpp()
+        key = self._model_key()
+        with _llama_lock:
+            llm = _models.get(key)
+            if llm is not None:
+                self._load_seconds = 0.0
+                return llm
+            if not os.path.exists(self.model):
+                raise RuntimeError(f"llama.cpp Error: model file '{self.model}' not found")
+            started = time.monotonic()
+            try:
+                llm = llama_cpp.Llama(model_path=self.model, n_ctx=self.n_ctx, verbose=False, **self._runner_args())
+            except ValueError as e:
+                raise RuntimeError(f"llama.cpp Error: {e}") from e
+            self._load_seconds = time.monotonic() - started
+            _models[key] = llm
+            return llm
+
+    def _generate_payload(self, system_prompt: str, user_prompt: str, stream: bool, options: dict = None, format: dict = None) -> dict:
+        payload = super()._generate_payload(system_prompt, user_prompt, stream, options=options, format=format)
+        payload["system"] = system_prompt  # Marks the snapshot boundary
+        return payload
+
+    def _continuation(self, payload: dict, request: dict, text: str, remaining: int):
+        # The prompt is rendered here, so the partial answer can be appended as is
+        num_predict = self._continuation_tokens(payload, request, text, remaining)
+        if not num_predict:
+            return None
+        options = dict(request["options"], num_predict=num_predict)
+        return "generate", dict(request, options=options, partial=text)
+
+    def _render(self, llm, endpoint: str, payload: dict) -> Tuple[str, str, List[str]]:
+        """
+        (prefix, rest, stop strings) of the text to evaluate. The prefix ends
+        with the system prompt and is what gets snapshotted. A continuation
+        carries the answer so far as `partial`, appended after the rendered
+        prompt.
+        """
+        prefix, rest, stop = self._render_prompt(llm, endpoint, payload)
+        return prefix, rest + payload.get("partial", ""), stop
+
+    def _render_prompt(self, llm, endpoint: str, payload: dict) -> Tuple[str, str, List[str]]:
+        if endpoint == "generate":
+            if payload.get("raw"):
+                prefix, rest = _split(payload["prompt"], payload.get("system", ""))
+                return prefix, rest, []
+            messages = [{"role": "user", "content": payload["prompt"]}]
+            system = payload.get("system", "")
+        else:
+            messages = payload["messages"]
+            first = messages[0] if messages else {}
+            system = first.get("content", "") if first.get("role") == "system" else ""
+
+        template = llm.metadata.get("tokenizer.chat_template")
+        if not template:
+            text = "".join(f"{m['role']}: {m['content']}\n\n" for m in messages) + "assistant: "
+            prefix, rest = _split(text, system)
+            return prefix, rest, []
+
+        from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+
+        bos = _special_text(llm, llm.token_bos())
+        formatter = Jinja2ChatFormatter(
+            template=template, eos_token=_special_text(llm, llm.token_eos()), bos_token=bos
+        )
+        rendered = formatter(messages=messages)
+        text = rendered.prompt
+        if bos and text.startswith(bos):
+            text = text[len(bos):]  # Added by the tokenizer instead
+        stop = rendered.stop if isinstance(rendered.stop, list) else [rendered.stop] if rendered.stop else []
+        prefix, rest = _split(text, system)
+        return prefix, rest, stop
+
+    def _tokenize(self, llm, text: str, bos: bool) -> List[int]:
+        if not text:
+            return []
+        return llm.tokenize(text.encode("utf-8"), add_bos=bos, special=True)
+
+    def _restore_prefix(self, llm, prefix: str, prefix_tokens: List[int]) -> bool:
+        """
+        Makes sure the prefix is in the KV cache: already there from an
+        earlier request, restored from a snapshot, or prefilled and saved.
+        Returns True when a snapshot was restored.
+        """
+        if self.snapshots is None or len(prefix_tokens) < SNAPSHOT_MIN_TOKENS:
+            return False
+        if _shared_prefix(llm, prefix_tokens) == len(prefix_tokens):
+            return False
+        key = self.snapshots.prefix_key(os.path.abspath(self.model), prefix, self.n_ctx)
+        entry = self.snapshots.get(key)
+        if entry is not None:
+            started = time.monotonic()
+            llm.load_state(entry["state"])
+            restore_ms = (time.monotonic() - started) * 1000
+            self.prefill_saved_ms += max(entry.get("prefill_ms", 0.0) - restore_ms, 0.0)
+            return True
+
+        started = time.monotonic()
+        llm.reset()
+        llm.eval(prefix_tokens)
+        prefill_ms = (time.monotonic() - started) * 1000
+        self.snapshots.put(key, {"state": llm.save_state(), "prefill_ms": prefill_ms})
+        return False
+
+    def _complete(self, endpoint: str, payload: dict):
+        """
+        Runs a "generate" or "chat" payload and yields Ollama-shaped chunks,
+        the last one carrying done/done_reason and the timings.
+        """
+        options = payload.get("options") or {}
+        with _llama_lock:
+            llm = self._load()
+            prefix, rest, stop = self._render(llm, endpoint, payload)
+            prefix_tokens = self._tokenize(llm, prefix, bos=True)
+            # Tokenized separately so the prefix tokens match its snapshot
+            tokens = prefix_tokens + self._tokenize(llm, rest, bos=not prefix_tokens)
+            started = time.monotonic()
+            reused = _shared_prefix(llm, tokens)
+            if self._restore_prefix(llm, prefix, prefix_tokens):
+                reused = _shared_prefix(llm, tokens)
+            # llama.cpp always re-evaluates the last prompt token
+            reused = max(min(reused, len(tokens) - 1), 0)
+
+            grammar = None
+            if payload.get("format") is not None:
+                grammar = llama_cpp.LlamaGrammar.from_json_schema(json.dumps(payload["format"]), verbose=False)
+            stop = stop + list(options.get("stop") or [])
+
+            deadline = self._deadline()
+            first_token_at = None
+            count = 0
+            finish_reason = None
+            try:
+                events = llm.create_completion(
+                    prompt=tokens,
+                    max_tokens=options.get("num_predict", 4096),
+                    temperature=options.get("temperature", 0.8),
+                    top_p=options.get("top_p", 0.95),
+                    seed=options.get("seed"),
+                    stop=stop or None,
+                    grammar=grammar,
+                    stream=True,
+                )
+                for event in events:
+                    choice = event["choices"][0]
+                    if first_token_at is None:
+                        first_token_at = time.monotonic()
+                    text = choice.get("text") or ""
+                    if text:
+                        count += 1
+                        if endpoint == "chat":
+                            yield {"message": {"role": "assistant", "content": text}, "done": False}
+                        else:
+                            yield {"response": text, "done": False}
+                    finish_reason = choice.get("finish_reason") or finish_reason
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise RequestTimeout(f"Generation exceeded its {self.timeout:.0f}s deadline.")
+            except ValueError as e:  # e.g. the prompt does not fit n_ctx
+                raise RuntimeError(f"llama.cpp Error: {e}") from e
+
+        ended = time.monotonic()
+        first_token_at = first_token_at or ended
+        final = {"message": {"role": "assistant", "content": ""}} if endpoint == "chat" else {"response": ""}
+        final.update({
+            "done": True,
+            "done_reason": "length" if finish_reason == "length" else "stop",
+            "prompt_eval_count": len(tokens) - reused,
+            "prompt_eval_duration": int((first_token_at - started) * 1e9),
+            "eval_count": count,
+            "eval_duration": int((ended - first_token_at) * 1e9),
+            "load_duration": int(self._load_seconds * 1e9),
+        })
+        yield final
+
+    def _post(self, endpoint: str, payload: dict) -> dict:
+        parts = []
+        for chunk in self._complete(endpoint, payload):
+            if chunk.get("done"):
+                text = "".join(parts)
+                if endpoint == "chat":
+                    chunk["message"]["content"] = text
+                else:
+                    chunk["response"] = text
+                return chunk
+            parts.append(chunk["message"]["content"] if endpoint == "chat" else chunk["response"])
+        return {}
+
+    def _stream(self, endpoint: str, payload: dict):
+        yield from self._complete(endpoint, payload)
+
+    def loaded_models(self) -> dict:
+        if self._model_key() not in _models:
+            return {}
+        return {self.model: {"size": os.path.getsize(self.model), "host": "in-process"}}
+
+    def warm(self, keep_alive=None, num_ctx: int = None) -> float:
+        """
+        Loads the model file (its n_ctx is fixed at construction). Returns
+        the load time in seconds.
+        """
+        self._load()
+        return self._load_seconds
+
+    def unload(self):
+        with _llama_lock:
+            _models.pop(self._model_key(), None)
+
+
+def create_client(model: str = "codellama", **kwargs) -> LLMClient:
+    """
+    LLMClient for an Ollama (or OpenAI-compatible) model, or a
+    LocalLLMClient when `model` is a path to a GGUF file.
+    """
+    if is_gguf(model):
+        return LocalLLMClient(model=model, **kwargs)
+    return LLMClient(model=model, **kwargs)
@@ -0,0 +1,103 @@
+"""
+Model residency.
+
+Switching Ollama to a model that is not in memory costs seconds of load
+time and evicts whatever was loaded. Before the first request Anchor checks
+/api/ps; if the requested model is not loaded but an equivalent one is (per
+the user's alias map), that one is used instead, otherwise the user is
+warned about the swap.
+
+Aliases come from .anchor/aliases.json ({"codellama": ["qwen2.5-coder:7b"]})
+and ANCHOR_MODEL_ALIASES ("codellama=qwen2.5-coder:7b|deepseek-coder,...").
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from anchor.hosts import normalize_model
+
+ALIASES_FILE = Path(".anchor/aliases.json")
+MODEL_ALIASES = os.getenv("ANCHOR_MODEL_ALIASES", "")
+# Load times above this are reported to the user
+SLOW_LOAD_SECONDS = 1.0
+
+
+def parse_aliases(value: str) -> Dict[str, List[str]]:
+    """
+    Parses 'model=alt1|alt2,other=alt3' into {model: [alternatives]}.
+    """
+    aliases = {}
+    for pair in value.split(","):
+        model, _, alternatives = pair.partition("=")
+        if model.strip() and alternatives.strip():
+            aliases[model.strip()] = [a.strip() for a in alternatives.split("|") if a.strip()]
+    return aliases
+
+
+def load_aliases(path: Path = ALIASES_FILE, env_value: str = None) -> Dict[str, List[str]]:
+    """
+    The alias map from the aliases file, with the environment taking precedence.
+    """
+    aliases = {}
+    if path.exists():
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            aliases.update({k: [v] if isinstance(v, str) else list(v) for k, v in data.items()})
+        except (OSError, json.JSONDecodeError, AttributeError):
+            pass
+    aliases.update(parse_aliases(MODEL_ALIASES if env_value is None else env_value))
+    return aliases
+
+
+@dataclass
+class ModelPlan:
+    """Which model to use, given what is already loaded."""
+
+    requested: str
+    model: str
+    loaded: Dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def substituted(self) -> bool:
+        return self.model != self.requested
+
+    @property
+    def needs_load(self) -> bool:
+        return normalize_model(self.model) not in self.loaded
+
+    @property
+    def resident_bytes(self) -> int:
+        """Memory held by the models that are loaded right now."""
+        return sum(info.get("size", 0) for info in self.loaded.values())
+
+
+def plan_model(requested: str, loaded: Dict[str, dict], aliases: Dict[str, List[str]]) -> ModelPlan:
+    """
+    Keeps `requested` if it is loaded (or nothing is), otherwise the first
+    of its aliases that is loaded.
+    """
+    if normalize_model(requested) in loaded or not loaded:
+        return ModelPlan(requested, requested, loaded)
+    wanted = normalize_model(requested)
+    for model, alternatives in aliases.items():
+        if normalize_model(model) != wanted:
+            continue
+        for alternative in alternatives:
+            if normalize_model(alternative) in loaded:
+                return ModelPlan(requested, alternative, loaded)
+    return ModelPlan(requested, requested, loaded)
+
+
+def model_cascade(models: Optional[str], strongest: str) -> List[str]:
+    """
+    Models to try in order: the comma-separated `models`, then `strongest`
+    unless it is already listed. A cheap model can go first and the
+    strongest one is only used when the earlier ones fail.
+    """
+    cascade = [m.strip() for m in (models or "").split(",") if m.strip()]
+    if strongest not in cascade:
+        cascade.append(strongest)
+    return cascade
@@ -1,3 +1,4 @@
+import re
 import whatthepatch
 import patch_ng
 from typing import Optional
@@ -5,6 +6,47 @@ from typing import Optional
 class PatchError(Exception):
     pass
 
+def extract_patch_text(raw_response: str) -> str:
+    """
+    Pulls the code or diff out of a raw LLM response, dropping markdown
+    fences and any chatter around them.
+    """
+    clean_text = raw_response
+    if "```" in clean_text:
+        # Priority 1: Look for explicit diff/patch/python block
+        match = re.search(r"```(?:diff|patch|python|txt)?\n(.*?)(?:```|$)", clean_text, re.DOTALL)
+        if match:
+            clean_text = match.group(1)
+        else:
+            # Priority 2: Look for first generic block
+            match = re.search(r"```(?:\w+)?\n(.*?)(?:```|$)", clean_text, re.DOTALL)
+            if match:
+                clean_text = match.group(1)
+
+    # FINAL CLEANUP: If it looks like a diff, try to find the start and end of it
+    if "--- " in clean_text and "+++ " in clean_text:
+        # Extract from first --- to end of last hunk
+        match = re.search(r"(--- .*?@@.*?\n.*)", clean_text, re.DOTALL)
+        if match:
+            clean_text = match.group(1)
+
+    return clean_text.strip()
+
+def fenced_block_closed(text: str) -> bool:
+    """
+    True once `text` holds a complete fenced code block: an opening fence
+    line followed by a closing one, both ended by a newline. Everything
+    after it is chatter that extract_patch_text would drop anyway.
+    """
+    is_open = False
+    for line in text[: text.rfind("\n") + 1].splitlines():
+        stripped = line.strip()
+        if not is_open and stripped.startswith("```"):
+            is_open = True
+        elif is_open and stripped == "```":
+            return True
+    return False
+
 def apply_patch_dry_run(original_content: str, diff_text: str) -> str:
     """
     Applies a unified diff to a string in memory.
@@ -0,0 +1,58 @@
+"""
+Per-model inference profiles written by `anchor tune`.
+
+A profile holds the runner options (num_thread, num_batch, ...) that gave
+the best measured throughput on this machine. LLMClient merges them into
+every request; options passed explicitly still win.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from anchor.hosts import normalize_model
+
+PROFILES_FILE = Path(".anchor/profiles.json")
+
+# Options that describe the hardware setup. Anything else in a profile file
+# (temperature, num_predict, num_ctx) is chosen per request and ignored.
+TUNABLE_OPTIONS = ("num_thread", "num_batch", "num_gpu")
+
+
+class ProfileStore:
+    """
+    model -> {"options": {...}, "prefill_tps": float, "decode_tps": float}
+    """
+
+    def __init__(self, path: Path = PROFILES_FILE):
+        self.path = Path(path)
+        self.profiles: Dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                self.profiles = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                self.profiles = {}
+
+    def get(self, model: str) -> Optional[dict]:
+        return self.profiles.get(normalize_model(model))
+
+    def options(self, model: str) -> dict:
+        profile = self.get(model) or {}
+        return {k: v for k, v in profile.get("options", {}).items() if k in TUNABLE_OPTIONS}
+
+    def save(self, model: str, profile: dict):
+        self.profiles[normalize_model(model)] = profile
+        self._write()
+
+    def remove(self, model: str) -> bool:
+        removed = self.profiles.pop(normalize_model(model), None) is not None
+        if removed:
+            self._write()
+        return removed
+
+    def _write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.profiles, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
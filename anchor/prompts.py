@@ -0,0 +1,54 @@
+"""
+Prompt assembly.
+
+Ollama skips prefill for the leading part of a prompt that matches what it
+already holds in its KV cache. Every prompt is therefore built in the same
+order, from most to least stable:
+
+    base instructions -> repo map -> focused file -> phase/format instructions -> task
+
+The first three form the prefix, which is byte-identical across the phases
+of `modify` and across tasks on the same file, so only the short tail has
+to be prefilled.
+"""
+
+from typing import Dict, List, Optional
+
+BASE_INSTRUCTIONS = (
+    "You are Anchor, an expert coding assistant working on a local repository.\n"
+    "The project context comes first; the instructions for the current step follow it.\n"
+)
+
+NEW_FILE_INSTRUCTIONS = (
+    "The user wants to create a NEW file.\n"
+    "You must output the FULL CONTENT of the file, starting with all necessary IMPORTS.\n"
+    "The code must be complete and runnable. Do NOT output snippets.\n"
+    "Do NOT use diffs. Output the raw code inside a single code block."
+)
+
+
+def build_prefix(repo_map: str, file_name: Optional[str] = None, file_view: str = "") -> str:
+    """
+    The stable part of every prompt: instructions, repo map and the file
+    being worked on (as the edit format renders it).
+    """
+    prefix = f"{BASE_INSTRUCTIONS}\nHere is the repository structure:\n{repo_map}\n"
+    if file_name and file_view:
+        prefix += f"\nHere is the content of the file {file_name}:\n```python\n{file_view}\n```\n"
+    return prefix
+
+
+def build_system_prompt(prefix: str, *instructions: str) -> str:
+    """
+    Appends step-specific instructions to the shared prefix. The task itself
+    is sent after this, as the user prompt.
+    """
+    return "\n".join([prefix, *instructions])
+
+
+def prefixed_messages(prefix: str, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Chat messages that all start with the same system message, so every
+    phase of a conversation shares the prefix.
+    """
+    return [{"role": "system", "content": prefix}, *messages]
@@ -1,6 +1,38 @@
 import sys
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional
+
+from anchor.syntax_watch import GenerationAborted, SyntaxWatch
+
+
+def close_stream(token_stream: Iterable[str]):
+    """
+    Closes a generator-based token stream so its HTTP response is closed
+    right away (stopping the server) instead of whenever it is collected.
+    """
+    close = getattr(token_stream, "close", None)
+    if close is not None:
+        close()
+
+
+def stream_to_buffer(token_stream: Iterable[str], quiet: bool = True) -> str:
+    """
+    Consumes a token stream into memory, mirroring it to the terminal as it
+    arrives unless quiet. Used when the output must be validated before
+    anything is written to disk.
+    """
+    parts = []
+    try:
+        for token in token_stream:
+            parts.append(token)
+            if not quiet:
+                sys.stdout.write(token)
+                sys.stdout.flush()
+    finally:
+        close_stream(token_stream)
+    if not quiet:
+        sys.stdout.write("\n")
+    return "".join(parts)
 
 class LiveCodeWriter:
     """
@@ -13,25 +45,34 @@ class LiveCodeWriter:
         self.quiet = quiet
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
         
-    def write_stream(self, token_stream: Iterable[str]):
+    def write_stream(self, token_stream: Iterable[str], watch: Optional[SyntaxWatch] = None):
         """
         Consumes a token stream, writing each token to the file.
         Strips markdown code blocks and file headers.
+        With a `watch`, raises GenerationAborted (and stops the stream) as
+        soon as the output can no longer become valid code.
         """
         buffer = ""
         with open(self.file_path, "w", encoding="utf-8") as f:
-            for token in token_stream:
-                # 1. Strip markdown code block markers
-                clean_token = token.replace("```python", "").replace("```", "")
-                
-                # 2. Write to file
-                f.write(clean_token)
-                f.flush()
-                
-                # 3. Mirror to terminal ONLY if not quiet
-                if not self.quiet:
-                    sys.stdout.write(clean_token)
-                    sys.stdout.flush()
-        
+            try:
+                for token in token_stream:
+                    # 1. Strip markdown code block markers
+                    clean_token = token.replace("```python", "").replace("```", "")
+
+                    # 2. Write to file
+                    f.write(clean_token)
+                    f.flush()
+
+                    # 3. Mirror to terminal ONLY if not quiet
+                    if not self.quiet:
+                        sys.stdout.write(clean_token)
+                        sys.stdout.flush()
+
+                    # 4. Give up on hopeless output instead of finishing it
+                    if watch is not None and watch.feed(clean_token):
+                        raise GenerationAborted(watch.problem, watch.tokens)
+            finally:
+                close_stream(token_stream)
+
         from rich import print as rprint
         rprint(f"\n\n[bold green]Success![/bold green] Content written to {self.file_path.name}")
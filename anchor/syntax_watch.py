@@ -0,0 +1,158 @@
+"""
+Syntax checks on code while it is being generated.
+
+Python output is checked one top-level block at a time. A block is complete
+once a later line starts at column 0 outside any bracket or string (tokenize
+tells which), and complete blocks are parsed with ast.parse. Nothing the
+model writes afterwards can repair a complete block that does not parse
+(prose instead of code, a stray closing bracket), nor a bracket that is
+still open when a statement such as `def` or `import` starts at column 0.
+In these cases the generation is stopped right away instead of at its end.
+"""
+
+import ast
+import io
+import re
+import tokenize
+from typing import List, Optional, Tuple
+
+CHECK_EVERY_LINES = 20  # Long blocks are tokenized this often for stray brackets
+
+_OPENERS = {"(": ")", "[": "]", "{": "}"}
+# Column-0 lines that continue the statement above instead of starting one
+_CONTINUES_BLOCK = re.compile(r"(else|elif|except|finally)\b")
+# Statements that cannot appear inside brackets: an unclosed bracket before
+# one of them is never going to close
+_STATEMENT = re.compile(r"(async\s+def|def|class|import|from\s+[\w.]+\s+import|return|raise|pass|try|while|with)\b")
+
+
+class GenerationAborted(RuntimeError):
+    """The output so far cannot become valid code; generation was stopped."""
+
+    def __init__(self, reason: str, tokens: int):
+        super().__init__(reason)
+        self.tokens = tokens
+
+
+_LAYOUT_TOKENS = {
+    tokenize.NL, tokenize.NEWLINE, tokenize.COMMENT, tokenize.INDENT,
+    tokenize.DEDENT, tokenize.ENDMARKER,
+}
+
+
+def _scan(text: str) -> Tuple[str, Optional[int], str]:
+    """
+    Tokenizes complete lines. Returns (state, line, message) with state
+    'complete', 'decorated' (ends with a decorator, so the statement goes
+    on), 'open' (bracket or backslash continuation, line of the outermost
+    open bracket if any), 'string' (unterminated triple-quoted string
+    starting on `line`) or 'error'.
+    """
+    stack: List[Tuple[str, int]] = []
+    statement_start = None  # First token of the last logical line
+    at_start = True
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(text).readline):
+            if token.type == tokenize.NEWLINE:
+                at_start = True
+            elif token.type not in _LAYOUT_TOKENS and at_start:
+                statement_start, at_start = token.string, False
+            if token.type != tokenize.OP:
+                continue
+            if token.string in _OPENERS:
+                stack.append((token.string, token.start[0]))
+            elif token.string in _OPENERS.values():
+                if not stack or _OPENERS[stack[-1][0]] != token.string:
+                    return "error", token.start[0], f"unmatched '{token.string}'"
+                stack.pop()
+    except tokenize.TokenError as e:
+        message, (line, _) = e.args
+        if "string" in message:
+            return "string", line, message
+        return "open", stack[0][1] if stack else None, message
+    except SyntaxError as e:
+        return "error", e.lineno, e.msg
+    if statement_start == "@":
+        return "decorated", None, ""
+    return "complete", None, ""
+
+
+def _starts_statement(line: str) -> bool:
+    return bool(line) and not line[0].isspace() and not line.startswith("#") and not _CONTINUES_BLOCK.match(line)
+
+
+class SyntaxWatch:
+    """
+    Incremental checker for a stream of Python source. feed() every token;
+    it returns why the output is hopeless, or None while it may still
+    become valid.
+    """
+
+    def __init__(self, check_every: int = CHECK_EVERY_LINES):
+        self.check_every = check_every
+        self.tokens = 0
+        self.problem: Optional[str] = None
+        self._lines: List[str] = []  # Complete lines after the last block that parsed
+        self._partial = ""  # The line being written
+        self._first_line = 1  # Line number of self._lines[0]
+        self._unchecked = 0  # Lines since the whole pending block was tokenized
+
+    def feed(self, token: str) -> Optional[str]:
+        self.tokens += 1
+        if self.problem is None:
+            self._partial += token
+            if "\n" in token:
+                *complete, self._partial = self._partial.split("\n")
+                start = len(self._lines)
+                self._lines.extend(line + "\n" for line in complete)
+                self._check(start)
+        return self.problem
+
+    def _check(self, start: int):
+        index = max(start, 1)
+        while index < len(self._lines) and self.problem is None:
+            if _starts_statement(self._lines[index]) and self._end_block(index):
+                index = 0  # The block was committed; its end is the new start
+            index += 1
+
+        # Long blocks are rescanned less often, which keeps the total work
+        # linear in the length of the output
+        self._unchecked += len(self._lines) - start
+        if self.problem is None and self._unchecked >= max(self.check_every, len(self._lines) // 4):
+            self._unchecked = 0
+            state, line, message = _scan("".join(self._lines))
+            if state == "error":
+                self._fail(line, message)
+
+    def _end_block(self, index: int) -> bool:
+        """
+        Parses the pending lines before `index` if they form complete
+        statements. True when they parsed and were committed.
+        """
+        lines = self._lines
+        block = "".join(lines[:index])
+        state, line, message = _scan(block)
+        if state == "open" and line is not None and _STATEMENT.match(lines[index]):
+            self.problem = (
+                f"a bracket opened on line {self._first_line + line - 1} is still open "
+                f"at line {self._first_line + index}: {lines[index].strip()[:60]!r}"
+            )
+            return False
+        if state in ("open", "string", "decorated"):
+            return False  # The column-0 line is inside a bracket or string, or decorated
+        if state == "complete":
+            try:
+                ast.parse(block)
+            except SyntaxError as e:
+                line, message = e.lineno, e.msg
+            else:
+                del self._lines[:index]
+                self._first_line += index
+                return True
+        self._fail(line, message)
+        return False
+
+    def _fail(self, line: Optional[int], message: str):
+        line = line or 1
+        text = self._lines[line - 1].strip() if line <= len(self._lines) else ""
+        self.problem = f"line {self._first_line + line - 1} is not valid Python ({message}): {text[:60]!r}"
@@ -0,0 +1,146 @@
+"""
+Inference option tuning for this machine (`anchor tune`).
+
+Short generations are run against the local Ollama with different runner
+options. Prefill and decode speed come from Ollama's own prompt_eval and
+eval timings, so model load time and HTTP overhead are not counted. The
+settings are ranked by the time a typical edit would take: a long prompt
+followed by a short reply.
+"""
+
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from anchor.llm import LLMClient
+
+# Shape of a typical `anchor edit` request, used to rank settings
+TYPICAL_PROMPT_TOKENS = 3000
+TYPICAL_REPLY_TOKENS = 300
+
+BENCH_NUM_PREDICT = 64
+BENCH_NUM_CTX = 4096
+BENCH_SNIPPET = '''def merge(left, right):
+    result = []
+    while left and right:
+        result.append(left.pop(0) if left[0] <= right[0] else right.pop(0))
+    return result + left + right
+'''
+BENCH_TASK = "Write a short docstring for each function above."
+
+# Larger prompt batches need more memory for the compute buffers
+LARGE_BATCH_MIN_RAM = 16 * 1024 ** 3
+
+
+def total_ram() -> Optional[int]:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def candidate_settings(cpu_count: Optional[int] = None, ram_bytes: Optional[int] = None) -> List[Dict[str, int]]:
+    """
+    Option sets worth trying on this machine. The first one is empty, i.e.
+    Ollama's own defaults, so a profile is only saved if it beats them.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 4
+    threads = sorted({max(cpu_count // 2, 1), max(cpu_count - 1, 1), cpu_count})
+    batches = [256, 512]
+    if ram_bytes is None or ram_bytes >= LARGE_BATCH_MIN_RAM:
+        batches.append(1024)
+    settings = [{}]
+    for num_thread in threads:
+        for num_batch in batches:
+            settings.append({"num_thread": num_thread, "num_batch": num_batch})
+    return settings
+
+
+@dataclass
+class TuningResult:
+    """Measured throughput of one option set."""
+
+    options: Dict[str, int]
+    prefill_tps: float = 0.0
+    decode_tps: float = 0.0
+    error: Optional[str] = None
+    samples: List[dict] = field(default_factory=list)
+
+    @property
+    def edit_seconds(self) -> float:
+        """Estimated time of a typical edit with these options."""
+        if not self.prefill_tps or not self.decode_tps:
+            return float("inf")
+        return TYPICAL_PROMPT_TOKENS / self.prefill_tps + TYPICAL_REPLY_TOKENS / self.decode_tps
+
+
+def _tokens_per_second(count: int, duration_ns: int) -> float:
+    return count / (duration_ns / 1e9) if count and duration_ns else 0.0
+
+
+def measure(client: LLMClient, options: Dict[str, int], runs: int = 2, repeat: int = 12) -> TuningResult:
+    """
+    Runs `runs` short generations with `options` and averages their speed.
+    A unique marker starts each prompt so Ollama's prompt cache cannot skip
+    the prefill being measured.
+    """
+    result = TuningResult(options=options)
+    prefill, decode = [], []
+    try:
+        # Changed runner options reload the model; keep that out of the samples
+        client.generate("", "Hi", options={**options, "num_ctx": BENCH_NUM_CTX, "num_predict": 1})
+    except RuntimeError as e:
+        result.error = str(e)
+        return result
+    for _ in range(runs):
+        system_prompt = f"# run {uuid.uuid4().hex}\n" + BENCH_SNIPPET * repeat
+        request_options = {
+            **options,
+            "num_ctx": BENCH_NUM_CTX,
+            "num_predict": BENCH_NUM_PREDICT,
+            "temperature": 0,
+        }
+        try:
+            client.generate(system_prompt, BENCH_TASK, options=request_options)
+        except RuntimeError as e:
+            result.error = str(e)
+            return result
+        metrics = client.last_metrics
+        result.samples.append(metrics)
+        prefill.append(_tokens_per_second(metrics.get("prompt_eval_count", 0), metrics.get("prompt_eval_duration", 0)))
+        decode.append(_tokens_per_second(metrics.get("eval_count", 0), metrics.get("eval_duration", 0)))
+    result.prefill_tps = sum(prefill) / len(prefill)
+    result.decode_tps = sum(decode) / len(decode)
+    return result
+
+
+def tune(
+    model: str,
+    settings: List[Dict[str, int]],
+    runs: int = 2,
+    on_result: Callable[[TuningResult], None] = None,
+) -> List[TuningResult]:
+    """
+    Measures every option set (each one reloads the model) and returns the
+    results, fastest first.
+    """
+    # No cache, no stored profile: every request runs with exactly `options`
+    client = LLMClient(model=model, use_profile=False)
+    results = []
+    for options in settings:
+        result = measure(client, options, runs=runs)
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return sorted(results, key=lambda r: r.edit_seconds)
+
+
+def profile_from(result: TuningResult) -> dict:
+    return {
+        "options": result.options,
+        "prefill_tps": round(result.prefill_tps, 1),
+        "decode_tps": round(result.decode_tps, 1),
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
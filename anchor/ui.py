@@ -3,6 +3,13 @@ from rich.panel import Panel
 from rich.text import Text
 from rich.table import Table
 from rich.box import ROUNDED, MINIMAL
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.spinner import Spinner
+from typing import Iterable
+import time
+
+from anchor.streaming import close_stream
 
 def print_banner(console: Console):
     """
@@ -71,6 +78,133 @@ def print_banner(console: Console):
 
     console.print(grid)
 
+def stream_panel(
+    console: Console,
+    token_stream: Iterable[str],
+    title: str,
+    border_style: str = "blue",
+    refresh_per_second: float = 8,
+) -> str:
+    """
+    Renders a streamed LLM reply into a Markdown panel as tokens arrive.
+    Re-rendering Markdown on every token is expensive, so the panel is only
+    rebuilt a few times per second. Returns the full reply text.
+    """
+    text = ""
+    interval = 1 / refresh_per_second
+    last_render = 0.0
+    waiting = Panel(Spinner("dots", text="Waiting for first token..."), title=title, border_style=border_style)
+
+    with Live(waiting, console=console, refresh_per_second=refresh_per_second) as live:
+        try:
+            for token in token_stream:
+                text += token
+                now = time.monotonic()
+                if now - last_render >= interval:
+                    live.update(Panel(Markdown(text), title=title, border_style=border_style))
+                    last_render = now
+        finally:
+            # Ctrl-C while rendering must still stop the generation
+            close_stream(token_stream)
+        live.update(Panel(Markdown(text), title=title, border_style=border_style))
+
+    return text
+
+def print_token_report(console: Console, budget, num_ctx: int) -> None:
+    """
+    Prints the per-section token breakdown of a fitted TokenBudget and the
+    num_ctx the request is sent with.
+    """
+    table = Table(title="Prompt token budget", box=MINIMAL, title_style="bold", title_justify="left")
+    table.add_column("Section", style="cyan")
+    table.add_column("Tokens", justify="right")
+    table.add_column("After fitting", justify="right")
+
+    for name, before, after in budget.report():
+        style = "yellow" if after < before else None
+        table.add_row(name, str(before), str(after), style=style)
+    table.add_row("total", "", str(budget.prompt_tokens), style="bold")
+
+    console.print(table)
+    console.print(
+        f"[dim]Prompt budget {budget.prompt_budget} tokens, "
+        f"num_predict {budget.num_predict}, num_ctx {num_ctx}[/dim]"
+    )
+
+def print_host_report(console: Console, rows) -> None:
+    """
+    Prints HostPool.report() rows as a table.
+    """
+    table = Table(title="Ollama hosts", box=MINIMAL, title_style="bold", title_justify="left")
+    table.add_column("Host", style="cyan")
+    table.add_column("Status")
+    table.add_column("Latency", justify="right")
+    table.add_column("Requests", justify="right")
+    table.add_column("Failures", justify="right")
+    table.add_column("Loaded models")
+
+    for row in rows:
+        status = "[green]healthy[/green]" if row["healthy"] else "[red]ejected[/red]"
+        latency = f"{row['latency_ms']:.0f} ms" if row["latency_ms"] is not None else "-"
+        table.add_row(
+            row["url"],
+            status,
+            latency,
+            str(row["requests"]),
+            str(row["failures"]),
+            ", ".join(row["loaded_models"]) or "-",
+        )
+
+    console.print(table)
+
+def print_edit_stats(console: Console, rows) -> None:
+    """
+    Prints EditStats.report() rows as a table.
+    """
+    table = Table(title="Edit formats", box=MINIMAL, title_style="bold", title_justify="left")
+    table.add_column("Model", style="cyan")
+    table.add_column("File size")
+    table.add_column("Format")
+    table.add_column("Attempts", justify="right")
+    table.add_column("Valid", justify="right")
+    table.add_column("Avg time", justify="right")
+
+    for row in rows:
+        table.add_row(
+            row["model"],
+            row["bucket"],
+            row["format"],
+            str(row["attempts"]),
+            f"{row['success_rate']:.0%}",
+            f"{row['avg_seconds']:.1f} s",
+        )
+
+    console.print(table)
+
+def print_tuning_report(console: Console, results) -> None:
+    """
+    Prints tuning results (fastest first) as a table.
+    """
+    table = Table(title="Inference settings", box=MINIMAL, title_style="bold", title_justify="left")
+    table.add_column("Options", style="cyan")
+    table.add_column("Prefill", justify="right")
+    table.add_column("Decode", justify="right")
+    table.add_column("Typical edit", justify="right")
+
+    for result in results:
+        options = ", ".join(f"{k}={v}" for k, v in result.options.items()) or "Ollama defaults"
+        if result.error:
+            table.add_row(options, "-", "-", f"[red]{result.error}[/red]")
+            continue
+        table.add_row(
+            options,
+            f"{result.prefill_tps:.0f} tok/s",
+            f"{result.decode_tps:.1f} tok/s",
+            f"{result.edit_seconds:.1f} s",
+        )
+
+    console.print(table)
+
 def print_welcome_screen():
     console = Console()
     print_banner(console)
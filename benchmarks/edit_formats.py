@@ -0,0 +1,105 @@
+"""
+Compares edit formats against a running Ollama server: output tokens,
+end-to-end latency (request to validated new content) and how often the
+answer applies cleanly.
+
+Every format gets the same file and tasks; the response cache is bypassed.
+
+Usage: python -m benchmarks.edit_formats [--model codellama] [--runs 3]
+"""
+
+import argparse
+import time
+
+from anchor.budget import MAX_CONTEXT
+from anchor.edits import EDIT_FORMATS, EditFormat, edit_token_limit
+from anchor.llm import LLMClient
+from anchor.patch import PatchError, validate_syntax
+from anchor.prompts import build_prefix, build_system_prompt
+
+SAMPLE_FILE = '''import math
+
+
+class Circle:
+    def __init__(self, radius):
+        self.radius = radius
+
+    def area(self):
+        return math.pi * self.radius ** 2
+
+    def perimeter(self):
+        return 2 * math.pi * self.radius
+
+
+class Square:
+    def __init__(self, side):
+        self.side = side
+
+    def area(self):
+        return self.side ** 2
+
+    def perimeter(self):
+        return 4 * self.side
+
+
+def describe(shape):
+    return f"{type(shape).__name__} with area {shape.area():.2f}"
+'''
+
+TASKS = (
+    "Add a docstring to the Square class.",
+    "Make describe() also report the perimeter.",
+    "Raise ValueError in Circle.__init__ when the radius is negative.",
+)
+
+
+def build_prompt(edit_format: EditFormat) -> str:
+    prefix = build_prefix("- shapes.py", "shapes.py", edit_format.view(SAMPLE_FILE))
+    return build_system_prompt(prefix, edit_format.instructions, edit_format.reminder)
+
+
+def run(client: LLMClient, edit_format: EditFormat, runs: int) -> dict:
+    system_prompt = build_prompt(edit_format)
+    tokens, seconds, applied, attempts = 0, 0.0, 0, 0
+    for _ in range(runs):
+        for task in TASKS:
+            attempts += 1
+            start = time.perf_counter()
+            response = client.generate(
+                system_prompt, task,
+                options={"num_predict": edit_token_limit(edit_format, SAMPLE_FILE), "num_ctx": MAX_CONTEXT},
+                format=edit_format.schema,
+                until=edit_format.complete,
+            )
+            try:
+                new_content = edit_format.apply(SAMPLE_FILE, response)
+                if new_content != SAMPLE_FILE and validate_syntax(new_content, "shapes.py"):
+                    applied += 1
+            except PatchError:
+                pass
+            seconds += time.perf_counter() - start
+            tokens += client.last_metrics.get("eval_count", 0)
+    return {
+        "tokens": tokens / attempts,
+        "ms": seconds / attempts * 1000,
+        "applied": applied / attempts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default="codellama")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    client = LLMClient(model=args.model)
+    client.warm(num_ctx=MAX_CONTEXT)  # Same num_ctx as the runs, or the first one reloads
+    results = {name: run(client, edit_format, args.runs) for name, edit_format in EDIT_FORMATS.items()}
+
+    print(f"{'format':>16} {'out tokens':>11} {'latency':>11} {'applied':>8}")
+    for name, r in results.items():
+        print(f"{name:>16} {r['tokens']:>11.0f} {r['ms']:>8.0f} ms {r['applied']:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measures the per-request HTTP overhead of LLMClient with and without the
+shared connection pool.
+
+A tiny in-process server stands in for Ollama and answers instantly, so the
+timings isolate connection setup and request handling from generation time.
+
+Usage: python -m benchmarks.http_pool [--requests 200]
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from anchor.hosts import HostPool
+from anchor.llm import LLMClient
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = json.dumps({"response": "ok", "message": {"content": "ok"}, "done": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnpooledClient(LLMClient):
+    """The pre-pooling behaviour: a bare requests.post per call."""
+
+    def _send(self, endpoint, payload, stream=False, deadline=None):
+        path, body = self.backend.request(endpoint, payload)
+        host = self.hosts.acquire(self.model)
+        timeout = (self.connect_timeout, self._read_timeout(stream, deadline))
+        return host, requests.post(f"{host.url}{path}", json=body, stream=stream, timeout=timeout), None
+
+
+def run(client: LLMClient, n: int) -> float:
+    client.generate("system", "task")  # warm-up
+    start = time.perf_counter()
+    for _ in range(n):
+        client.generate("system", "task")
+    return (time.perf_counter() - start) / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    hosts = HostPool([base_url])
+    results = {}
+    for name, client in (("bare requests.post", UnpooledClient(hosts=hosts)), ("pooled session", LLMClient(hosts=hosts))):
+        results[name] = run(client, args.requests)
+
+    server.shutdown()
+    for name, ms in results.items():
+        print(f"{name:>20}: {ms:.3f} ms/request")
+    before, after = results["bare requests.post"], results["pooled session"]
+    print(f"{'saved':>20}: {before - after:.3f} ms/request ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import unittest
+
+import httpx
+
+from anchor.async_llm import AsyncLLMClient
+from anchor.llm import ConnectionLost
+
+
+class TestAsyncLLMClient(unittest.TestCase):
+    def test_generate_many_respects_concurrency(self):
+        in_flight = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            prompt = json.loads(request.content)["prompt"]
+            return httpx.Response(200, json={"response": prompt[-1]})
+
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with AsyncLLMClient(concurrency=2, client=httpx.AsyncClient(transport=transport)) as client:
+                return await client.generate_many([("s", str(i)) for i in range(6)])
+
+        self.assertEqual(asyncio.run(run()), [str(i) for i in range(6)])
+        self.assertEqual(peak, 2)
+
+    def test_stream_chat_yields_deltas(self):
+        body = "\n".join(json.dumps(c) for c in [
+            {"message": {"content": "a"}, "done": False},
+            {"message": {"content": "b"}, "done": True},
+        ])
+
+        async def run():
+            transport = httpx.MockTransport(lambda request: httpx.Response(200, text=body))
+            async with AsyncLLMClient(client=httpx.AsyncClient(transport=transport)) as client:
+                return [delta async for delta in client.stream_chat([])]
+
+        self.assertEqual(asyncio.run(run()), ["a", "b"])
+
+    def test_warm_and_unload_on_close(self):
+        requests = []
+
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return httpx.Response(200, json={"response": "", "load_duration": 2_000_000_000})
+
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with AsyncLLMClient(client=httpx.AsyncClient(transport=transport), unload_on_close=True) as client:
+                return await client.warm(num_ctx=8192)
+
+        self.assertEqual(asyncio.run(run()), 2.0)
+        self.assertEqual(requests[0]["options"]["num_ctx"], 8192)
+        self.assertEqual(requests[-1]["keep_alive"], 0)
+
+    def test_error_is_runtime_error(self):
+        async def run():
+            transport = httpx.MockTransport(lambda request: httpx.Response(500, json={"error": "boom"}))
+            async with AsyncLLMClient(client=httpx.AsyncClient(transport=transport)) as client:
+                await client.generate("s", "u")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run())
+
+    def test_unreachable_server_raises_connection_lost(self):
+        def handler(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        async def generate():
+            transport = httpx.MockTransport(handler)
+            async with AsyncLLMClient(client=httpx.AsyncClient(transport=transport)) as client:
+                await client.generate("s", "u")
+
+        async def stream():
+            transport = httpx.MockTransport(handler)
+            async with AsyncLLMClient(client=httpx.AsyncClient(transport=transport)) as client:
+                return [delta async for delta in client.stream_chat([])]
+
+        class DroppedStream(httpx.AsyncByteStream):
+            async def __aiter__(self):
+                yield json.dumps({"message": {"content": "a"}, "done": False}).encode() + b"\n"
+                raise httpx.ReadError("connection reset")
+
+        async def dropped():
+            transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=DroppedStream()))
+            async with AsyncLLMClient(client=httpx.AsyncClient(transport=transport)) as client:
+                return [delta async for delta in client.stream_chat([])]
+
+        for run in (generate, stream, dropped):
+            with self.assertRaises(ConnectionLost):
+                asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import unittest
+from unittest import mock
+
+from anchor.backends import OllamaBackend, OpenAIBackend, select_backend
+from anchor.hosts import HostPool, parse_hosts
+from anchor.llm import LLMClient
+
+SSE_LINES = [
+    'data: {"choices": [{"delta": {"content": "he"}, "finish_reason": null}]}',
+    "",
+    'data: {"choices": [{"delta": {"content": "llo"}, "finish_reason": "length"}]}',
+    'data: {"choices": [], "usage": {"prompt_tokens": 12, "completion_tokens": 2}}',
+    "data: [DONE]",
+]
+
+
+class TestBackends(unittest.TestCase):
+    def test_selection_by_scheme_and_config(self):
+        self.assertIsInstance(select_backend("openai+http://box:8080", name=""), OpenAIBackend)
+        self.assertIsInstance(select_backend("http://box:11434", name=""), OllamaBackend)
+        self.assertIsInstance(select_backend("http://box:8080", name="openai"), OpenAIBackend)
+        self.assertEqual(parse_hosts("openai+http://a:8080,openai+http://b:8080"), ["http://a:8080", "http://b:8080"])
+        with self.assertRaises(ValueError):
+            select_backend("http://box", name="nope")
+
+    def test_openai_request_translation(self):
+        payload = {
+            "model": "m", "prompt": "hi", "stream": True, "keep_alive": "5m",
+            "options": {"temperature": 0.2, "num_predict": 100, "num_ctx": 4096},
+            "format": {"type": "object"},
+        }
+        path, body = OpenAIBackend().request("generate", payload)
+        self.assertEqual(path, "/v1/chat/completions")
+        self.assertEqual(body["messages"], [{"role": "user", "content": "hi"}])
+        self.assertEqual(body["max_tokens"], 100)
+        self.assertNotIn("num_ctx", body)
+        self.assertEqual(body["response_format"]["json_schema"]["schema"], {"type": "object"})
+        self.assertTrue(body["stream_options"]["include_usage"])
+
+        path, body = OpenAIBackend().request("generate", dict(payload, raw=True))
+        self.assertEqual((path, body["prompt"]), ("/v1/completions", "hi"))
+
+    def test_openai_stream_normalized_like_ollama(self):
+        parser = OpenAIBackend().stream_parser("chat")
+        chunks = [c for line in SSE_LINES for c in parser.feed(line)] + parser.close()
+        self.assertEqual("".join(c["message"]["content"] for c in chunks), "hello")
+        final = chunks[-1]
+        self.assertTrue(final["done"])
+        self.assertEqual(final["done_reason"], "length")
+        self.assertEqual((final["prompt_eval_count"], final["eval_count"]), (12, 2))
+        self.assertEqual(len([c for c in chunks if c["done"]]), 1)
+
+    def test_client_streams_from_openai_server(self):
+        response = mock.Mock(status_code=200)
+        response.iter_lines.return_value = [line.encode() for line in SSE_LINES]
+        session = mock.Mock()
+        session.post.return_value = response
+        client = LLMClient(session=session, hosts=HostPool(["http://box:8080"], session, OpenAIBackend()))
+
+        self.assertEqual("".join(client.stream_generate("system", "task")), "hello")
+        self.assertEqual(session.post.call_args.args[0], "http://box:8080/v1/chat/completions")
+        self.assertEqual(client.last_metrics["eval_count"], 2)
+        self.assertEqual(client.warm(), 0.0)  # Nothing to load on a server that has its model
+        response.close.assert_called_once()
+
+    def test_openai_answers_are_not_continued_as_new_replies(self):
+        response = mock.Mock(status_code=200)
+        response.iter_lines.return_value = [line.encode() for line in SSE_LINES]
+        session = mock.Mock()
+        session.post.return_value = response
+        client = LLMClient(session=session, hosts=HostPool(["http://box:8080"], session, OpenAIBackend()))
+
+        self.assertEqual("".join(client.stream_generate("system", "task", max_total_tokens=1000)), "hello")
+        self.assertEqual(session.post.call_count, 1)
+        self.assertTrue(client.truncated)
+        with self.assertRaises(RuntimeError):
+            list(client.stream_generate("system", "task", resume_from="he"))
+
+    def test_openai_non_streaming_parse(self):
+        data = {"choices": [{"message": {"content": "ok"}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 1},
+                "timings": {"prompt_ms": 20.0, "predicted_ms": 10.0}}
+        result = OpenAIBackend().parse("generate", json.loads(json.dumps(data)))
+        self.assertEqual(result["response"], "ok")
+        self.assertEqual(result["prompt_eval_duration"], 20_000_000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from anchor.budget import (
+    PromptSection,
+    TokenBudget,
+    context_window_for,
+    estimate_tokens,
+    shrink_middle,
+    shrink_repo_map,
+)
+
+
+class TestBudget(unittest.TestCase):
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("def foo():"), 5)
+        self.assertGreater(estimate_tokens("a_very_long_identifier_name"), 1)
+
+    def test_context_window_uses_buckets(self):
+        self.assertEqual(context_window_for(100, max_context=8192), 2048)
+        self.assertEqual(context_window_for(5000, max_context=8192), 8192)
+        self.assertEqual(context_window_for(50000, max_context=8192), 8192)
+
+    def test_shrink_repo_map_drops_definitions_first(self):
+        repo_map = "- a.py\n  def foo\n  def bar\n- b.py\n  class Baz"
+        shrunk = shrink_repo_map(repo_map, estimate_tokens("- a.py\n- b.py"))
+        self.assertEqual(shrunk, "- a.py\n- b.py")
+
+    def test_shrink_middle_keeps_head_and_tail(self):
+        text = "\n".join(f"line {i}" for i in range(200))
+        shrunk = shrink_middle(text, 60)
+        self.assertTrue(shrunk.startswith("line 0\n"))
+        self.assertTrue(shrunk.endswith("line 199"))
+        self.assertIn("lines omitted", shrunk)
+        self.assertLessEqual(estimate_tokens(shrunk), 60)
+
+    def test_fit_shrinks_lowest_priority_first(self):
+        budget = TokenBudget(num_predict=100, max_context=400)
+        repo = PromptSection("repo map", "\n".join(f"- f{i}.py" for i in range(200)), priority=0, shrink=shrink_repo_map)
+        body = PromptSection("file", "x = 1\n" * 20, priority=1, shrink=shrink_middle)
+        task = PromptSection("task", "add a function")
+        budget.fit([repo, body, task])
+
+        self.assertLessEqual(budget.prompt_tokens, budget.prompt_budget)
+        self.assertEqual(body.text, "x = 1\n" * 20)
+        self.assertLess(repo.tokens, repo.original_tokens)
+        self.assertEqual([row[0] for row in budget.report()], ["repo map", "file", "task"])
+
+
+if __name__ == '__main__':
+    unittest.main()
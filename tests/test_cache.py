@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from anchor.cache import ResponseCache
+from anchor.llm import LLMClient
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache = ResponseCache(cache_dir=self.test_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_key_ignores_stream_flag(self):
+        payload = {"model": "m", "prompt": "p", "options": {"temperature": 0.2}}
+        self.assertEqual(
+            ResponseCache.make_key("generate", {**payload, "stream": True}),
+            ResponseCache.make_key("generate", {**payload, "stream": False}),
+        )
+        self.assertNotEqual(
+            ResponseCache.make_key("generate", payload),
+            ResponseCache.make_key("generate", {**payload, "model": "other"}),
+        )
+
+    def test_ttl_expires_entries(self):
+        self.cache.put("k", "value")
+        self.assertEqual(self.cache.get("k"), "value")
+        self.cache.ttl = -1
+        self.assertIsNone(self.cache.get("k"))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put("old", "x" * 100)
+        self.cache.put("new", "x" * 100)
+        past = time.time() - 60
+        os.utime(self.cache._path("old"), (past, past))
+        os.utime(self.cache._path("new"), (past + 1, past + 1))
+        self.cache.get("old")  # Touch: "new" is now the LRU entry
+
+        self.cache.max_bytes = self.cache._path("old").stat().st_size * 2 + 10
+        self.cache.put("third", "x" * 100)
+
+        self.assertIsNotNone(self.cache.get("old"))
+        self.assertIsNone(self.cache.get("new"))
+
+    def test_rejected_responses_are_not_cached(self):
+        valid = lambda text: text == "good"
+        self.assertEqual(self.cache.get_or_compute("k", lambda: "bad", cache_if=valid), "bad")
+        self.assertIsNone(self.cache.get("k"))
+        self.assertEqual(self.cache.get_or_compute("k", lambda: "good", cache_if=valid), "good")
+        self.assertEqual(self.cache.get("k"), "good")
+
+    def test_rejected_entry_is_dropped(self):
+        self.cache.put("k", "bad")
+        self.assertIsNone(self.cache.get("k", cache_if=lambda text: text == "good"))
+        self.assertFalse(self.cache._path("k").exists())
+
+    def test_concurrent_requests_share_one_computation(self):
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return "result"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get_or_compute("k", compute))) for _ in range(4)]
+        threads[0].start()
+        started.wait()
+        for t in threads[1:]:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, ["result"] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_client_serves_stream_from_cache(self):
+        session = mock.Mock()
+        session.post.return_value.status_code = 200
+        session.post.return_value.json.return_value = {"response": "cached text"}
+        client = LLMClient(session=session, cache=self.cache)
+
+        self.assertEqual(client.generate("s", "u"), "cached text")
+        self.assertEqual(list(client.stream_generate("s", "u")), ["cached text"])
+        self.assertEqual(session.post.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
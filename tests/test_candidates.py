@@ -0,0 +1,78 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from anchor.candidates import apply_candidate, candidate_specs, generate_first_valid
+from anchor.patch import PatchError
+
+ORIGINAL = "def hello():\n    print('world')\n"
+GOOD_DIFF = """```diff
+--- a.py
++++ a.py
+@@ -1,2 +1,2 @@
+ def hello():
+-    print('world')
++    print('anchor')
+```"""
+BAD_DIFF = "Sorry, I cannot help with that."
+
+
+class TestCandidates(unittest.TestCase):
+    def test_specs_spread_temperatures_and_models(self):
+        self.assertEqual(
+            candidate_specs(3, ["a", "b"]),
+            [("a", 0.2), ("b", 0.2), ("a", 0.45)],
+        )
+
+    def test_apply_candidate(self):
+        self.assertIn("anchor", apply_candidate(ORIGINAL, GOOD_DIFF, "a.py"))
+        with self.assertRaises(PatchError):
+            apply_candidate(ORIGINAL, BAD_DIFF, "a.py")
+        with self.assertRaises(PatchError):
+            apply_candidate("", "def broken(:", "a.py", is_new_file=True)
+
+    def test_first_valid_candidate_wins_and_rest_are_cancelled(self):
+        cancelled = []
+
+        async def fake_generate(self, system_prompt, task, options=None, format=None, until=None, cache_if=None):
+            temperature = options["temperature"]
+            try:
+                if temperature == 0.2:
+                    return BAD_DIFF  # Fastest, but unusable
+                if temperature == 0.45:
+                    await asyncio.sleep(0.01)
+                    return GOOD_DIFF
+                await asyncio.sleep(5)
+                return GOOD_DIFF
+            except asyncio.CancelledError:
+                cancelled.append(temperature)
+                raise
+
+        with mock.patch("anchor.candidates.AsyncLLMClient.generate", fake_generate):
+            winner, tried = generate_first_valid(
+                "system", "task", ORIGINAL, "a.py", candidate_specs(3, ["m"])
+            )
+
+        self.assertEqual(winner.temperature, 0.45)
+        self.assertIn("anchor", winner.new_content)
+        self.assertIsNotNone(tried[0].error)
+        self.assertEqual(cancelled, [0.7])
+
+    def test_unexpected_candidate_error_does_not_end_the_race(self):
+        async def fake_generate(self, system_prompt, task, options=None, format=None, until=None, cache_if=None):
+            if options["temperature"] == 0.2:
+                raise ValueError("unexpected")
+            await asyncio.sleep(0.01)
+            return GOOD_DIFF
+
+        with mock.patch("anchor.candidates.AsyncLLMClient.generate", fake_generate):
+            winner, tried = generate_first_valid(
+                "system", "task", ORIGINAL, "a.py", candidate_specs(2, ["m"])
+            )
+
+        self.assertEqual(winner.temperature, 0.45)
+        self.assertEqual(tried[0].error, "unexpected")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from anchor.checkpoints import CheckpointStore, checkpointed
+
+
+class TestCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = CheckpointStore(Path(self.tmp.name) / "checkpoints")
+        self.target = Path(self.tmp.name) / "app.py"
+
+    def test_store_round_trip(self):
+        self.assertIsNone(self.store.load(self.target))
+        self.store.save(self.target, "task", "codellama", "import os\n")
+        self.assertEqual(self.store.load(self.target)["text"], "import os\n")
+        self.store.clear(self.target)
+        self.assertIsNone(self.store.load(self.target))
+
+    def test_partial_output_is_saved_when_the_stream_fails(self):
+        def tokens():
+            yield "import "
+            yield "os\n"
+            raise RuntimeError("connection dropped")
+
+        saved = []
+        with self.assertRaises(RuntimeError):
+            for _ in checkpointed(tokens(), saved.append, interval=3600):
+                pass
+        self.assertEqual(saved, ["import os\n"])
+
+    def test_completed_stream_only_saves_periodically(self):
+        saved = []
+        self.assertEqual(list(checkpointed(iter(["a", "b"]), saved.append, interval=3600)), ["a", "b"])
+        self.assertEqual(saved, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
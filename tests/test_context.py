@@ -3,7 +3,8 @@ import tempfile
 import shutil
 import os
 from pathlib import Path
-from anchor.context import generate_repo_map
+import ast
+from anchor.context import generate_repo_map, get_symbol_ranges
 
 class TestContext(unittest.TestCase):
     def setUp(self):
@@ -33,5 +34,12 @@ class TestContext(unittest.TestCase):
         
         self.assertNotIn("__pycache__", repo_map)
 
+    def test_symbol_ranges_include_decorators(self):
+        source = "@decorator\nclass A:\n    def f(self):\n        pass\n\ndef g():\n    pass\n"
+        symbols = get_symbol_ranges(ast.parse(source))
+        self.assertEqual(list(symbols), ["A", "A.f", "g"])
+        self.assertEqual((symbols["A"].start, symbols["A"].end), (1, 4))
+        self.assertEqual((symbols["A.f"].start, symbols["A.f"].indent), (3, 4))
+
 if __name__ == '__main__':
     unittest.main()
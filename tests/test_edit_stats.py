@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from anchor.edit_stats import EditStats, size_bucket
+from anchor.edits import available_formats
+
+TINY_FILE = "x = 1\n"
+LARGE_FILE = "value = compute(first, second) + offset\n" * 400
+
+
+class TestEditStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "edit_stats.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_priors_prefer_whole_file_for_tiny_files(self):
+        stats = EditStats(self.path)
+        formats = available_formats("a.py")
+        self.assertEqual(stats.choose("m", TINY_FILE, formats), "whole")
+        self.assertNotEqual(stats.choose("m", LARGE_FILE, formats), "whole")
+
+    def test_measurements_override_priors(self):
+        stats = EditStats(self.path)
+        for _ in range(5):
+            stats.record("m", LARGE_FILE, "lines", ok=False, seconds=10)
+            stats.record("m", LARGE_FILE, "diff", ok=True, seconds=3)
+        self.assertEqual(stats.choose("m", LARGE_FILE, ["lines", "diff"]), "diff")
+        # Other models and buckets are unaffected
+        self.assertEqual(stats.choose("other", LARGE_FILE, ["lines", "diff"]), "lines")
+
+    def test_persisted_report(self):
+        EditStats(self.path).record("m", TINY_FILE, "whole", ok=True, seconds=2)
+        rows = EditStats(self.path).report()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["bucket"], size_bucket(TINY_FILE))
+        self.assertEqual(rows[0]["success_rate"], 1.0)
+        self.assertEqual(rows[0]["avg_seconds"], 2)
+
+    def test_symbol_format_only_for_python(self):
+        self.assertIn("symbol", available_formats("a.py"))
+        self.assertNotIn("symbol", available_formats("a.js"))
+
+
+if __name__ == '__main__':
+    unittest.main()
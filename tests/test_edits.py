@@ -0,0 +1,160 @@
+import json
+import unittest
+
+from anchor.edits import (
+    DIFF,
+    LINES,
+    SEARCH_REPLACE,
+    SYMBOL,
+    WHOLE,
+    edit_token_limit,
+    get_edit_format,
+    line_tags,
+    number_lines,
+    parse_json_response,
+)
+from anchor.patch import PatchError
+
+ORIGINAL = """def hello():
+    print('world')
+
+
+def goodbye():
+    print('world')
+"""
+
+
+class TestEditFormats(unittest.TestCase):
+    def test_registry(self):
+        self.assertIs(get_edit_format("search-replace"), SEARCH_REPLACE)
+        self.assertIsNone(DIFF.schema)
+        with self.assertRaises(ValueError):
+            get_edit_format("nope")
+
+    def test_search_replace_uses_anchor_to_disambiguate(self):
+        response = json.dumps({"edits": [
+            {"anchor": "def goodbye():", "search": "    print('world')", "replace": "    print('bye')"},
+        ]})
+        result = SEARCH_REPLACE.apply(ORIGINAL, response)
+        self.assertIn("def hello():\n    print('world')", result)
+        self.assertIn("def goodbye():\n    print('bye')", result)
+        self.assertTrue(result.endswith("\n"))
+
+    def test_search_replace_insert_after_anchor(self):
+        response = json.dumps({"edits": [
+            {"anchor": "def hello():", "search": "", "replace": "    \"\"\"Greets.\"\"\""},
+        ]})
+        result = SEARCH_REPLACE.apply(ORIGINAL, response)
+        self.assertTrue(result.startswith('def hello():\n    """Greets."""\n    print'))
+
+    def test_search_replace_missing_text(self):
+        response = json.dumps({"edits": [{"anchor": "", "search": "nothing here", "replace": "x"}]})
+        with self.assertRaises(PatchError):
+            SEARCH_REPLACE.apply(ORIGINAL, response)
+
+    def test_malformed_edits_raise_patch_error(self):
+        for response in ('{"edits": ["x"]}', '{"edits": "abc"}', '"abc"',
+                         '{"edits": [{"anchor": "", "search": null, "replace": 1}]}'):
+            with self.assertRaises(PatchError):
+                SEARCH_REPLACE.apply(ORIGINAL, response)
+
+    def test_no_edits_leaves_content_unchanged(self):
+        self.assertEqual(SEARCH_REPLACE.apply(ORIGINAL, '{"edits": []}'), ORIGINAL)
+        self.assertEqual(DIFF.apply(ORIGINAL, ""), ORIGINAL)
+
+    def test_parse_json_response_tolerates_fences(self):
+        self.assertEqual(parse_json_response('```json\n{"edits": []}\n```'), {"edits": []})
+        with self.assertRaises(PatchError):
+            parse_json_response("not json")
+
+    def test_whole_file(self):
+        self.assertEqual(WHOLE.apply("a = 1\n", "```python\na = 2\n```"), "a = 2\n")
+        self.assertEqual(WHOLE.apply("a = 1\n", "```python\na = 1\n```"), "a = 1\n")
+
+    def test_number_lines(self):
+        view = number_lines(ORIGINAL).splitlines()
+        self.assertEqual(view[0], f"   1 {line_tags(['def hello():'])[0]}| def hello():")
+        self.assertEqual(len(view), len(ORIGINAL.splitlines()))
+
+    def test_line_edits_apply_bottom_up(self):
+        tags = line_tags(ORIGINAL.splitlines())
+        response = json.dumps({"edits": [
+            {"start": 2, "end": 2, "start_tag": tags[1], "end_tag": tags[1],
+             "replace": "    print('hi')\n    return 1"},
+            {"start": 5, "end": 6, "start_tag": tags[4], "end_tag": tags[5],
+             "replace": "def goodbye():\n    pass"},
+        ]})
+        result = LINES.apply(ORIGINAL, response)
+        self.assertEqual(result, "def hello():\n    print('hi')\n    return 1\n\n\ndef goodbye():\n    pass\n")
+
+    def test_line_edits_reject_stale_and_overlapping_ranges(self):
+        stale = {"start": 2, "end": 2, "start_tag": "zzz", "end_tag": "zzz", "replace": "x"}
+        with self.assertRaises(PatchError):
+            LINES.apply(ORIGINAL, json.dumps({"edits": [stale]}))
+        tags = line_tags(ORIGINAL.splitlines())
+        overlapping = [
+            {"start": 1, "end": 2, "start_tag": tags[0], "end_tag": tags[1], "replace": ""},
+            {"start": 2, "end": 2, "start_tag": tags[1], "end_tag": tags[1], "replace": ""},
+        ]
+        with self.assertRaises(PatchError):
+            LINES.apply(ORIGINAL, json.dumps({"edits": overlapping}))
+
+    def test_line_edits_reject_ranges_changed_in_the_middle(self):
+        content = "a = 1\nb = 2\nc = 3\n"
+        tags = line_tags(content.splitlines())
+        edit = {"start": 1, "end": 3, "start_tag": tags[0], "end_tag": tags[2], "replace": "x = 0"}
+        self.assertEqual(LINES.apply(content, json.dumps({"edits": [edit]})), "x = 0\n")
+        with self.assertRaises(PatchError):
+            LINES.apply("a = 1\nb = 22\nc = 3\n", json.dumps({"edits": [edit]}))
+
+    def test_symbol_edits_replace_and_add(self):
+        original = (
+            "import functools\n\n\n"
+            "class Greeter:\n"
+            "    @functools.lru_cache\n"
+            "    def hello(self):\n"
+            "        return 'world'\n\n\n"
+            "def goodbye():\n"
+            "    return 'world'\n"
+        )
+        response = json.dumps({"edits": [
+            {"symbol": "Greeter.hello", "code": "def hello(self):\n    return 'anchor'"},
+            {"symbol": "Greeter.wave", "code": "def wave(self):\n    return 'o/'"},
+            {"symbol": "goodbye", "code": "def goodbye():\n    return 'bye'"},
+            {"symbol": "main", "code": "def main():\n    pass"},
+        ]})
+        result = SYMBOL.apply(original, response)
+        self.assertNotIn("lru_cache\n", result)
+        self.assertIn("class Greeter:\n    def hello(self):\n        return 'anchor'\n\n    def wave(self):", result)
+        self.assertIn("def goodbye():\n    return 'bye'\n\n\ndef main():\n    pass\n", result)
+
+    def test_symbol_edits_reject_unknown_parent_and_overlap(self):
+        with self.assertRaises(PatchError):
+            SYMBOL.apply(ORIGINAL, json.dumps({"edits": [{"symbol": "Missing.run", "code": "def run(): pass"}]}))
+        overlapping = [
+            {"symbol": "hello", "code": "def hello(): pass"},
+            {"symbol": "hello", "code": "def hello(): return 1"},
+        ]
+        with self.assertRaises(PatchError):
+            SYMBOL.apply(ORIGINAL, json.dumps({"edits": overlapping}))
+        with self.assertRaises(PatchError):
+            SYMBOL.apply(ORIGINAL, json.dumps({"edits": [{"symbol": None, "code": "x = 1"}]}))
+
+    def test_new_symbols_keep_their_order(self):
+        response = json.dumps({"edits": [
+            {"symbol": "Base", "code": "class Base:\n    pass"},
+            {"symbol": "Child", "code": "class Child(Base):\n    pass"},
+        ]})
+        result = SYMBOL.apply(ORIGINAL, response)
+        self.assertLess(result.index("class Base:"), result.index("class Child(Base):"))
+        exec(compile(result, "calc.py", "exec"), {})
+
+    def test_edit_token_limit(self):
+        small, large = "x = 1\n", "x = 1\n" * 2000
+        self.assertEqual(edit_token_limit(DIFF, small), 512)
+        self.assertEqual(edit_token_limit(LINES, large), 4096)
+        self.assertGreater(edit_token_limit(WHOLE, large), 4096)  # Must fit the whole file
+
+
+if __name__ == '__main__':
+    unittest.main()
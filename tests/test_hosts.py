@@ -0,0 +1,83 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from anchor.hosts import EJECT_AFTER_FAILURES, HostPool, parse_hosts
+from anchor.llm import LLMClient
+
+
+class TestHostPool(unittest.TestCase):
+    def setUp(self):
+        self.session = mock.Mock()
+        self.pool = HostPool(["http://a", "http://b"], session=self.session)
+        self.a, self.b = self.pool.hosts
+        for host in self.pool.hosts:
+            host.models_checked_at = float("inf")  # Skip /api/ps lookups
+
+    def test_parse_hosts(self):
+        self.assertEqual(
+            parse_hosts("http://a:11434/, b:11434 ,"),
+            ["http://a:11434", "http://b:11434"],
+        )
+
+    def test_routes_to_least_busy_host(self):
+        first = self.pool.acquire("m")
+        second = self.pool.acquire("m")
+        self.assertIsNot(first, second)
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire("m"), first)
+
+    def test_prefers_host_with_model_loaded(self):
+        self.b.loaded_models = {"codellama:latest"}
+        self.assertIs(self.pool.acquire("codellama"), self.b)
+        self.assertIs(self.pool.acquire("codellama"), self.b)
+        # Two requests deep, swapping the model in on "a" is now cheaper
+        self.assertIs(self.pool.acquire("codellama"), self.a)
+
+    def test_ejects_failing_host(self):
+        for _ in range(EJECT_AFTER_FAILURES):
+            self.pool.release(self.pool.acquire("m", exclude=[self.b]), ok=False)
+        self.assertTrue(self.a.ejected)
+        self.assertIs(self.pool.acquire("m"), self.b)
+        self.assertFalse(self.pool.report()[0]["healthy"])
+
+    def test_async_acquire_probes_off_the_event_loop(self):
+        def slow_get(url, timeout):
+            time.sleep(0.2)
+            raise requests.exceptions.ConnectionError()
+
+        self.session.get.side_effect = slow_get
+        self.a.models_checked_at = 0.0  # Stale: needs a /api/ps lookup
+        ticks = []
+
+        async def tick():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def run():
+            _, host = await asyncio.gather(tick(), self.pool.aacquire("m"))
+            return host
+
+        self.assertIn(asyncio.run(run()), self.pool.hosts)
+        self.assertEqual(len(ticks), 5)
+        self.assertLess(ticks[-1] - ticks[0], 0.15)
+
+    def test_client_fails_over_to_next_host(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"response": "ok"}
+        session = mock.Mock()
+        session.post.side_effect = [requests.exceptions.ConnectionError(), response]
+        client = LLMClient(session=session, hosts=self.pool)
+
+        self.assertEqual(client.generate("s", "u"), "ok")
+        urls = [c.args[0] for c in session.post.call_args_list]
+        self.assertNotEqual(urls[0], urls[1])
+        self.assertEqual(self.a.outstanding + self.b.outstanding, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
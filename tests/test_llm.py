@@ -0,0 +1,267 @@
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from anchor.budget import estimate_tokens
+from anchor.kv_context import ContextStore
+from anchor.llm import LLMClient, RequestTimeout, get_session
+
+
+def fake_response(status_code=200, payload=None, chunks=()):
+    response = mock.Mock()
+    response.status_code = status_code
+    response.json.return_value = payload or {}
+    response.text = str(payload)
+    response.iter_lines.return_value = [json.dumps(c).encode() for c in chunks]
+    return response
+
+
+class TestLLMClient(unittest.TestCase):
+    def test_clients_share_connection_pool(self):
+        self.assertIs(LLMClient().session, LLMClient(model="other").session)
+        self.assertIs(get_session(pool_size=2), get_session(pool_size=2))
+        self.assertIsNot(get_session(pool_size=2), get_session(pool_size=3))
+
+    def test_generate_and_chat_use_session(self):
+        session = mock.Mock()
+        session.post.side_effect = [
+            fake_response(payload={"response": "diff"}),
+            fake_response(payload={"message": {"content": "hello"}}),
+        ]
+        client = LLMClient(session=session)
+
+        self.assertEqual(client.generate("system", "task"), "diff")
+        self.assertEqual(client.chat([{"role": "user", "content": "hi"}]), "hello")
+        self.assertEqual(session.post.call_count, 2)
+
+    def test_stream_chat_yields_deltas(self):
+        session = mock.Mock()
+        session.post.return_value = fake_response(chunks=[
+            {"message": {"content": "Hel"}, "done": False},
+            {"message": {"content": "lo"}, "done": False},
+            {"message": {"content": ""}, "done": True},
+        ])
+        client = LLMClient(session=session)
+
+        self.assertEqual(list(client.stream_chat([])), ["Hel", "lo"])
+        self.assertTrue(session.post.call_args.kwargs["json"]["stream"])
+        session.post.return_value.close.assert_called_once()
+
+    def test_keep_alive_and_unload(self):
+        session = mock.Mock()
+        session.post.return_value = fake_response(payload={"response": "", "load_duration": 2_500_000_000})
+        client = LLMClient(session=session, keep_alive="-1", unload_on_close=True)
+
+        self.assertEqual(client.warm(), 2.5)
+        self.assertEqual(session.post.call_args.kwargs["json"]["keep_alive"], -1)
+        client.generate("system", "task")
+        self.assertEqual(session.post.call_args.kwargs["json"]["keep_alive"], -1)
+
+        client.close()
+        self.assertEqual(session.post.call_args.kwargs["json"], {"model": "codellama", "prompt": "", "stream": False, "keep_alive": 0})
+
+    def test_warm_loads_with_the_requests_num_ctx(self):
+        session = mock.Mock()
+        session.post.return_value = fake_response(payload={"response": ""})
+        client = LLMClient(session=session, use_profile=False)
+
+        client.warm(num_ctx=8192)
+        warm_options = session.post.call_args.kwargs["json"]["options"]
+        client.generate("system", "task", options={"num_ctx": 8192})
+        self.assertEqual(warm_options["num_ctx"], session.post.call_args.kwargs["json"]["options"]["num_ctx"])
+
+    def test_reuses_prefix_context(self):
+        store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, store_dir)
+        session = mock.Mock()
+        session.post.side_effect = [
+            # Prefill of the system prompt: 4 prompt tokens + 1 generated
+            fake_response(payload={"context": [1, 2, 3, 4, 99], "eval_count": 1, "prompt_eval_duration": 40_000_000}),
+            fake_response(payload={"response": "first"}),
+            fake_response(payload={"response": "second", "prompt_eval_count": 3}),
+        ]
+        client = LLMClient(session=session, context_store=ContextStore(cache_dir=store_dir))
+
+        self.assertEqual(client.generate("system", "task one"), "first")
+        sent = session.post.call_args.kwargs["json"]
+        self.assertEqual(sent["context"], [1, 2, 3, 4])
+        self.assertEqual(sent["prompt"], "User Task: task one")
+        self.assertTrue(sent["raw"])
+
+        self.assertEqual(client.generate("system", "task two"), "second")
+        self.assertEqual(session.post.call_count, 3)  # No second prefill
+        self.assertGreater(client.prefill_saved_ms, 0)
+
+    def test_early_stop_records_no_prefix_hit(self):
+        store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, store_dir)
+        session = mock.Mock()
+        session.post.side_effect = [
+            fake_response(payload={"context": [1, 2, 3, 4, 99], "eval_count": 1, "prompt_eval_duration": 40_000_000}),
+            fake_response(payload={"response": "first"}),
+            fake_response(chunks=[{"response": "done\n", "done": False}, {"response": "more", "done": False}]),
+        ]
+        store = ContextStore(cache_dir=store_dir)
+        client = LLMClient(session=session, context_store=store)
+
+        client.generate("system", "task one")
+        self.assertEqual(client.generate("system", "task two", until=lambda t: t.endswith("\n")), "done\n")
+        self.assertEqual(client.last_metrics["done_reason"], "until")
+        self.assertEqual(client.prefill_saved_ms, 0)
+        num_ctx = session.post.call_args_list[0].kwargs["json"]["options"]["num_ctx"]
+        key = store.prefix_key(client.model, "system\n\n", num_ctx)
+        self.assertEqual(store.lookup(key)["hits"], 0)
+
+    def test_error_includes_memory_hint(self):
+        session = mock.Mock()
+        session.post.return_value = fake_response(500, {"error": "out of memory"})
+        client = LLMClient(session=session)
+
+        with self.assertRaises(RuntimeError) as ctx:
+            client.generate("system", "task")
+        self.assertIn("Hint", str(ctx.exception))
+
+    def test_requests_carry_timeouts(self):
+        session = mock.Mock()
+        session.post.return_value = fake_response(payload={"response": "diff"})
+        client = LLMClient(session=session, timeout=60, idle_timeout=10, connect_timeout=2)
+
+        client.generate("system", "task")
+        connect, read = session.post.call_args.kwargs["timeout"]
+        self.assertEqual(connect, 2)
+        self.assertTrue(50 < read <= 60)  # Time left until the deadline
+
+        session.post.return_value = fake_response(chunks=[{"response": "x", "done": True}])
+        list(client.stream_generate("system", "task"))
+        self.assertEqual(session.post.call_args.kwargs["timeout"], (2, 10))
+
+    def test_wedged_server_raises_timeout(self):
+        session = mock.Mock()
+        session.post.side_effect = requests.exceptions.ReadTimeout()
+        client = LLMClient(session=session)
+
+        with self.assertRaises(RequestTimeout):
+            client.generate("system", "task")
+
+    def test_deadline_closes_stream(self):
+        session = mock.Mock()
+        session.post.return_value = fake_response(chunks=[
+            {"response": "a", "done": False},
+            {"response": "b", "done": False},
+            {"response": "", "done": True},
+        ])
+        client = LLMClient(session=session, timeout=1e-6)
+
+        stream = client.stream_generate("system", "task")
+        with self.assertRaises(RequestTimeout):
+            list(stream)
+        session.post.return_value.close.assert_called_once()
+
+    def test_until_stops_reading_once_answer_is_complete(self):
+        session = mock.Mock()
+        session.post.return_value = fake_response(chunks=[
+            {"response": "```diff\n", "done": False},
+            {"response": "+x\n", "done": False},
+            {"response": "```\n", "done": False},
+            {"response": "Explanation...", "done": False},
+            {"response": "", "done": True, "eval_count": 4},
+        ])
+        client = LLMClient(session=session)
+
+        text = client.generate("system", "task", until=lambda t: t.endswith("```\n"))
+        self.assertEqual(text, "```diff\n+x\n```\n")
+        self.assertEqual(client.last_metrics["done_reason"], "until")
+        self.assertTrue(session.post.call_args.kwargs["json"]["stream"])
+        session.post.return_value.close.assert_called_once()
+
+    def test_continues_generation_cut_off_at_num_predict(self):
+        session = mock.Mock()
+        session.post.side_effect = [
+            fake_response(chunks=[{"response": "def f():\n", "done": False},
+                                  {"response": "", "done": True, "done_reason": "length", "eval_count": 5}]),
+            fake_response(chunks=[{"message": {"content": "    return 1\n"}, "done": False},
+                                  {"message": {"content": ""}, "done": True, "done_reason": "stop", "eval_count": 4}]),
+        ]
+        client = LLMClient(session=session)
+
+        text = "".join(client.stream_generate("system", "task", max_total_tokens=100))
+        self.assertEqual(text, "def f():\n    return 1\n")
+        first, second = (c.kwargs["json"] for c in session.post.call_args_list)
+        self.assertEqual(second["messages"][-1], {"role": "assistant", "content": "def f():\n"})
+        self.assertEqual(first["options"]["num_ctx"], second["options"]["num_ctx"])
+        self.assertFalse(client.truncated)
+        self.assertEqual(client.last_metrics["eval_count"], 9)
+        self.assertEqual(client.last_metrics["continuations"], 1)
+
+    def test_continuation_budget_is_capped(self):
+        session = mock.Mock()
+        session.post.return_value = fake_response(chunks=[
+            {"response": "x", "done": False},
+            {"response": "", "done": True, "done_reason": "length", "eval_count": 50},
+        ])
+        client = LLMClient(session=session)
+
+        "".join(client.stream_generate("system", "task", max_total_tokens=100))
+        self.assertEqual(session.post.call_count, 2)
+        self.assertTrue(client.truncated)
+
+    def test_continuations_stay_within_the_context_window(self):
+        first_reply = "y\n" * 2500  # ~5000 tokens
+        session = mock.Mock()
+        session.post.side_effect = [
+            fake_response(chunks=[{"response": first_reply, "done": False},
+                                  {"response": "", "done": True, "done_reason": "length", "eval_count": 5000}]),
+            fake_response(chunks=[{"message": {"content": "z\n" * 100}, "done": False},
+                                  {"message": {"content": ""}, "done": True, "done_reason": "length", "eval_count": 200}]),
+        ]
+        client = LLMClient(session=session)
+
+        "".join(client.stream_generate("word " * 3000, "task", max_total_tokens=16384))
+        first, second = (c.kwargs["json"] for c in session.post.call_args_list)
+        self.assertEqual(first["options"]["num_ctx"], 8192)
+        self.assertLessEqual(3000 + first["options"]["num_predict"], 8192)
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in second["messages"])
+        self.assertGreater(prompt_tokens, 8000)
+        self.assertLessEqual(prompt_tokens + second["options"]["num_predict"], 8192)
+        self.assertTrue(client.truncated)
+
+    def test_dropped_stream_resumes_from_partial_output(self):
+        def dropping_lines():
+            yield json.dumps({"response": "def f():\n", "done": False}).encode()
+            raise requests.exceptions.ChunkedEncodingError("connection reset")
+
+        dropped = fake_response()
+        dropped.iter_lines.return_value = dropping_lines()
+        session = mock.Mock()
+        session.post.side_effect = [
+            dropped,
+            fake_response(chunks=[{"message": {"content": "    pass\n"}, "done": False},
+                                  {"message": {"content": ""}, "done": True, "eval_count": 2}]),
+        ]
+        client = LLMClient(session=session)
+
+        with mock.patch("anchor.llm.time.sleep"):
+            text = "".join(client.stream_generate("system", "task"))
+        self.assertEqual(text, "def f():\n    pass\n")
+        resumed = session.post.call_args.kwargs["json"]
+        self.assertEqual(resumed["messages"][-1]["content"], "def f():\n")
+        self.assertEqual(client.last_metrics["resumes"], 1)
+
+    def test_resume_from_saved_output_yields_only_the_rest(self):
+        session = mock.Mock()
+        session.post.return_value = fake_response(chunks=[
+            {"message": {"content": "rest"}, "done": False},
+            {"message": {"content": ""}, "done": True},
+        ])
+        client = LLMClient(session=session)
+
+        self.assertEqual("".join(client.stream_generate("system", "task", resume_from="start ")), "rest")
+        self.assertEqual(session.post.call_args.kwargs["json"]["messages"][-1]["content"], "start ")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from anchor import local_llm
+from anchor.llm import LLMClient
+from anchor.local_llm import LocalLLMClient, StateStore, create_client
+
+
+class FakeLlama:
+    """One token per character; counts how many tokens were evaluated."""
+
+    def __init__(self, model_path, n_ctx, verbose=False, **kwargs):
+        self.metadata = {}
+        self.input_ids = []
+        self.n_tokens = 0
+        self.evaluated = 0
+
+    def tokenize(self, text, add_bos=True, special=False):
+        return ([1] if add_bos else []) + [ord(c) for c in text.decode("utf-8")]
+
+    def reset(self):
+        self.n_tokens = 0
+
+    def eval(self, tokens):
+        self.input_ids = self.input_ids[: self.n_tokens] + list(tokens)
+        self.n_tokens = len(self.input_ids)
+        self.evaluated += len(tokens)
+
+    def save_state(self):
+        return list(self.input_ids[: self.n_tokens])
+
+    def load_state(self, state):
+        self.input_ids = list(state)
+        self.n_tokens = len(state)
+
+    def create_completion(self, prompt, stream, **kwargs):
+        shared = min(local_llm._shared_prefix(self, prompt), len(prompt) - 1)
+        self.n_tokens = shared
+        self.eval(prompt[shared:])
+        yield {"choices": [{"text": "ok", "finish_reason": None}]}
+        yield {"choices": [{"text": "", "finish_reason": "stop"}]}
+
+
+class TestLocalLLM(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model = str(Path(self.tmp.name) / "coder.gguf")
+        Path(self.model).write_bytes(b"GGUF")
+        patches = [
+            mock.patch.object(local_llm, "llama_cpp", types.SimpleNamespace(Llama=FakeLlama)),
+            mock.patch.object(local_llm, "SNAPSHOT_MIN_TOKENS", 10),
+            mock.patch.dict(local_llm._models, clear=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def client(self):
+        store = StateStore(cache_dir=Path(self.tmp.name) / "states")
+        return LocalLLMClient(model=self.model, snapshots=store, use_profile=False)
+
+    def test_create_client_picks_engine_by_model(self):
+        self.assertIsInstance(create_client(self.model, use_profile=False), LocalLLMClient)
+        self.assertNotIsInstance(create_client("codellama"), LocalLLMClient)
+        self.assertIsInstance(create_client("codellama"), LLMClient)
+
+    def test_missing_dependency_is_explained(self):
+        with mock.patch.object(local_llm, "llama_cpp", None):
+            with self.assertRaisesRegex(RuntimeError, "llama-cpp-python"):
+                self.client().generate("system", "task")
+
+    def test_prefix_snapshot_is_restored_by_a_new_process(self):
+        system = "Repo map and file " * 10
+        first = self.client()
+        self.assertEqual(first.generate(system, "add a docstring"), "ok")
+        self.assertEqual(len(list((Path(self.tmp.name) / "states").glob("*.state"))), 1)
+
+        local_llm._models.clear()  # As if Anchor was started again
+        second = self.client()
+        self.assertEqual(second.generate(system, "rename a variable"), "ok")
+        llm = next(iter(local_llm._models.values()))
+        # Only the task (and the last prompt token) had to be evaluated
+        self.assertLess(llm.evaluated, len(system))
+        self.assertEqual(second.last_metrics["prompt_eval_count"], llm.evaluated)
+        self.assertEqual(second.last_metrics["eval_count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from anchor.hosts import HostPool
+from anchor.llm import LLMClient
+from anchor.models import load_aliases, model_cascade, parse_aliases, plan_model
+
+LOADED = {"qwen2.5-coder:7b": {"size": 5_000_000_000}}
+
+
+class TestModels(unittest.TestCase):
+    def test_parse_aliases(self):
+        self.assertEqual(
+            parse_aliases("codellama=qwen2.5-coder:7b|deepseek-coder, llama3=llama3.1"),
+            {"codellama": ["qwen2.5-coder:7b", "deepseek-coder"], "llama3": ["llama3.1"]},
+        )
+
+    def test_env_aliases_override_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "aliases.json"
+            path.write_text(json.dumps({"codellama": "a", "llama3": ["b"]}))
+            aliases = load_aliases(path, env_value="codellama=c")
+        self.assertEqual(aliases, {"codellama": ["c"], "llama3": ["b"]})
+
+    def test_substitutes_loaded_alias(self):
+        plan = plan_model("codellama", LOADED, {"codellama": ["deepseek-coder", "qwen2.5-coder:7b"]})
+        self.assertTrue(plan.substituted)
+        self.assertEqual(plan.model, "qwen2.5-coder:7b")
+        self.assertFalse(plan.needs_load)
+
+    def test_warns_about_swap_without_alias(self):
+        plan = plan_model("codellama", LOADED, {})
+        self.assertFalse(plan.substituted)
+        self.assertTrue(plan.needs_load)
+        self.assertEqual(plan.resident_bytes, 5_000_000_000)
+        # Nothing loaded: a cold start, not a swap
+        self.assertFalse(plan_model("codellama", {}, {}).loaded)
+
+    def test_model_cascade_ends_with_strongest(self):
+        self.assertEqual(model_cascade(None, "big"), ["big"])
+        self.assertEqual(model_cascade("tiny, small", "big"), ["tiny", "small", "big"])
+        self.assertEqual(model_cascade("big,tiny", "big"), ["big", "tiny"])
+
+    def test_client_reports_loaded_models_and_load_time(self):
+        session = mock.Mock()
+        ps = mock.Mock()
+        ps.json.return_value = {"models": [{"name": "codellama", "size": 3, "size_vram": 3}]}
+        session.get.return_value = ps
+        client = LLMClient(session=session, hosts=HostPool(["http://a:11434"], session))
+        self.assertEqual(client.loaded_models()["codellama:latest"]["host"], "http://a:11434")
+
+        client._record_metrics({"load_duration": 2_500_000_000})
+        self.assertEqual(client.last_load_seconds, 2.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
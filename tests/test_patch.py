@@ -1,5 +1,5 @@
 import unittest
-from anchor.patch import apply_patch_dry_run, validate_syntax, PatchError
+from anchor.patch import apply_patch_dry_run, fenced_block_closed, validate_syntax, PatchError
 
 class TestPatch(unittest.TestCase):
     def test_apply_patch_success(self):
@@ -29,5 +29,12 @@ class TestPatch(unittest.TestCase):
         code = "def foo(): return @"
         self.assertFalse(validate_syntax(code, "test.py"))
 
+    def test_fenced_block_closed(self):
+        self.assertFalse(fenced_block_closed("Here it is:\n```diff\n--- a.py\n"))
+        self.assertFalse(fenced_block_closed("```diff\n--- a.py\n```"))  # Closing line not finished yet
+        self.assertTrue(fenced_block_closed("```diff\n--- a.py\n```\nThis change"))
+        self.assertFalse(fenced_block_closed("```\n```python"))
+
+
 if __name__ == '__main__':
     unittest.main()
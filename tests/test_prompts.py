@@ -0,0 +1,30 @@
+import unittest
+
+from anchor.conversation import create_analysis_prompt, create_planning_prompt
+from anchor.edits import DIFF, LINES
+from anchor.prompts import build_prefix, build_system_prompt, prefixed_messages
+
+REPO_MAP = "- a.py\n  def f"
+FILE = "def f():\n    pass\n"
+
+
+class TestPrompts(unittest.TestCase):
+    def test_edit_prompts_share_the_prefix(self):
+        prefix = build_prefix(REPO_MAP, "a.py", FILE)
+        diff_prompt = build_system_prompt(prefix, DIFF.instructions, DIFF.reminder)
+        self.assertTrue(diff_prompt.startswith(prefix))
+        self.assertTrue(diff_prompt.endswith(DIFF.reminder))
+        self.assertLess(prefix.index(REPO_MAP), prefix.index(FILE))
+
+    def test_phases_start_with_the_same_system_message(self):
+        prefix = build_prefix(REPO_MAP, "a.py", LINES.view(FILE))
+        analysis = prefixed_messages(prefix, [{"role": "user", "content": create_analysis_prompt("task")}])
+        planning = prefixed_messages(prefix, [{"role": "user", "content": create_planning_prompt("task", "")}])
+        self.assertEqual(analysis[0], planning[0])
+        # The context is only sent once, in the prefix
+        self.assertNotIn(REPO_MAP, analysis[1]["content"] + planning[1]["content"])
+        self.assertTrue(planning[1]["content"].endswith("Task: task"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from anchor.streaming import stream_to_buffer
+
+
+class TestStreaming(unittest.TestCase):
+    def test_stream_to_buffer_tees_tokens(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            text = stream_to_buffer(iter(["def ", "f():", " pass"]), quiet=False)
+        self.assertEqual(text, "def f(): pass")
+        self.assertEqual(out.getvalue(), "def f(): pass\n")
+
+    def test_stream_to_buffer_quiet(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            stream_to_buffer(iter(["x"]))
+        self.assertEqual(out.getvalue(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+
+from anchor.streaming import LiveCodeWriter
+from anchor.syntax_watch import GenerationAborted, SyntaxWatch
+
+VALID = '''"""
+Module docstring
+"""
+import os
+
+
+@decorator
+def f(x):
+    text = """
+column 0 inside a string
+"""
+    return (x +
+1)
+# comment at column 0 inside a function
+    # still inside it
+
+@skip_unless(sys.platform == "linux",
+             "needs Linux")
+# A comment between decorators
+@decorator
+class A:
+    def g(self):
+        try:
+            pass
+        except ValueError:
+            pass
+if True:
+    pass
+else:
+    pass
+'''
+
+
+def feed(watch, text, size=3):
+    for i in range(0, len(text), size):
+        problem = watch.feed(text[i:i + size])
+        if problem:
+            return problem
+    return None
+
+
+class TestSyntaxWatch(unittest.TestCase):
+    def test_valid_code_passes(self):
+        self.assertIsNone(feed(SyntaxWatch(), VALID))
+
+    def test_prose_is_stopped_after_its_block(self):
+        watch = SyntaxWatch()
+        problem = feed(watch, "Here is the code you asked for:\n\nimport os\n" + "x = 1\n" * 100)
+        self.assertIn("line 1", problem)
+        self.assertLess(watch.tokens, 20)
+
+    def test_unmatched_bracket(self):
+        problem = feed(SyntaxWatch(), "import os\nx = f(1))\ny = 2\n")
+        self.assertIn("unmatched ')'", problem)
+        self.assertIn("line 2", problem)
+
+    def test_statement_inside_open_bracket(self):
+        problem = feed(SyntaxWatch(), "x = f(\n    1,\n\ndef g():\n    pass\n")
+        self.assertIn("bracket opened on line 1 is still open at line 4", problem)
+
+    def test_long_literals_are_not_hopeless(self):
+        table = "TABLE = {\n" + "    'key': [\n        1,\n    ],\n" * 300 + "}\n"
+        docstring = 'def f():\n    """\n' + "def example():\n" * 300 + '    """\n'
+        self.assertIsNone(feed(SyntaxWatch(check_every=10), table + docstring + "x = 1\n"))
+
+    def test_problem_is_sticky(self):
+        watch = SyntaxWatch()
+        problem = feed(watch, "not code at all\nx = 1\n")
+        self.assertEqual(watch.feed("y = 2\n"), problem)
+
+
+class TestLiveCodeWriterWatch(unittest.TestCase):
+    def test_aborts_and_closes_stream(self):
+        closed = []
+
+        def tokens():
+            try:
+                yield "Sure, here it is:\n"
+                yield "import os\n"
+                yield "x = 1\n"
+            finally:
+                closed.append(True)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = LiveCodeWriter(os.path.join(tmp, "out.py"))
+            with self.assertRaises(GenerationAborted) as raised:
+                writer.write_stream(tokens(), watch=SyntaxWatch())
+        self.assertEqual(raised.exception.tokens, 2)
+        self.assertEqual(closed, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from anchor.llm import LLMClient
+from anchor.profiles import ProfileStore
+from anchor.tuning import candidate_settings, measure
+
+
+class TestTuning(unittest.TestCase):
+    def test_candidate_settings(self):
+        small = candidate_settings(cpu_count=8, ram_bytes=8 * 1024 ** 3)
+        self.assertEqual(small[0], {})  # Ollama's defaults are always measured
+        self.assertEqual({s["num_thread"] for s in small[1:]}, {4, 7, 8})
+        self.assertNotIn(1024, {s["num_batch"] for s in small[1:]})
+        large = candidate_settings(cpu_count=8, ram_bytes=32 * 1024 ** 3)
+        self.assertIn(1024, {s["num_batch"] for s in large[1:]})
+
+    def test_measure_uses_ollama_timings(self):
+        client = mock.Mock()
+        client.last_metrics = {
+            "prompt_eval_count": 400, "prompt_eval_duration": 2e9,
+            "eval_count": 64, "eval_duration": 4e9,
+        }
+        result = measure(client, {"num_thread": 4}, runs=2)
+        self.assertEqual(client.generate.call_count, 3)  # Warm-up + 2 runs
+        self.assertEqual(result.prefill_tps, 200)
+        self.assertEqual(result.decode_tps, 16)
+        self.assertAlmostEqual(result.edit_seconds, 3000 / 200 + 300 / 16)
+        # Every measured prompt is unique, so none is served from Ollama's prompt cache
+        prompts = [c.args[0] for c in client.generate.call_args_list[1:]]
+        self.assertNotEqual(prompts[0], prompts[1])
+
+    def test_client_applies_saved_profile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "profiles.json"
+            store = ProfileStore(path)
+            store.save("codellama", {"options": {"num_thread": 6, "num_batch": 256, "temperature": 1.0}})
+            self.assertEqual(json.loads(path.read_text())["codellama:latest"]["options"]["num_thread"], 6)
+
+            client = LLMClient(profiles=ProfileStore(path))
+            options = client._generate_payload("system", "task", stream=False, options={"num_batch": 512})["options"]
+            self.assertEqual(options["num_thread"], 6)
+            self.assertEqual(options["num_batch"], 512)  # Explicit options win
+            self.assertEqual(options["temperature"], 0.2)  # Only runner options come from profiles
+
+            untuned = LLMClient(profiles=ProfileStore(path), use_profile=False)
+            self.assertNotIn("num_thread", untuned._chat_payload([], stream=False)["options"])
+
+
+if __name__ == '__main__':
+    unittest.main()